@@ -0,0 +1,114 @@
+"""
+Cache de gabaritos compilados (api.grading.AnswerKey) por prova.
+
+Cada processo guarda os gabaritos compilados mais recentes junto com a
+versão em que foram montados. A versão de cada prova fica no banco
+(api.versions) e é trocada na mesma transação que muda questões ou
+alternativas da prova (sinais em api.signals e a importação de gabarito), de
+modo que a correção só consulta a versão para usar o gabarito em memória, e
+a troca feita por qualquer processo vale para todos.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+from django.db import connection
+
+from students.models import TbAlternatives, TbQuestions
+
+from .grading import AnswerKey
+from .versions import bump_versions, get_versions
+
+
+# Gabaritos mantidos em memória por processo (os usados mais recentemente)
+ANSWER_KEY_CACHE_SIZE = 256
+
+# Provas carregadas por consulta na compilação
+ANSWER_KEY_LOOKUP_CHUNK_SIZE = 500
+
+_compiled = OrderedDict()  # id da prova -> (versão, AnswerKey)
+_compiled_lock = Lock()
+
+
+def answer_key_version_name(exam_id):
+    return f'answer_key:{exam_id}'
+
+
+def invalidate_answer_key(exam_id):
+    """
+    Descarta o gabarito compilado da prova.
+
+    A versão é trocada na transação corrente: a própria transação passa a
+    ver o gabarito novo, e os demais processos no commit. Um gabarito antigo
+    compilado por outro processo durante a transação fica com a versão
+    anterior e é descartado no próximo uso.
+    """
+    with _compiled_lock:
+        _compiled.pop(exam_id, None)
+    bump_versions([answer_key_version_name(exam_id)])
+
+
+def get_answer_key(exam_id):
+    return get_answer_keys([exam_id])[exam_id]
+
+
+def get_answer_keys(exam_ids):
+    """
+    Gabaritos compilados das provas, em dict id da prova -> AnswerKey.
+
+    Só as provas sem gabarito válido em memória são carregadas do banco.
+    Gabaritos compilados dentro de uma transação não entram no cache: um
+    rollback desfaria as questões lidas sem trocar a versão.
+    """
+    exam_ids = list(dict.fromkeys(exam_ids))
+    names = get_versions(answer_key_version_name(exam_id) for exam_id in exam_ids)
+    versions = {exam_id: names[answer_key_version_name(exam_id)] for exam_id in exam_ids}
+
+    keys = {}
+    with _compiled_lock:
+        for exam_id in exam_ids:
+            entry = _compiled.get(exam_id)
+            if entry and entry[0] == versions[exam_id]:
+                _compiled.move_to_end(exam_id)
+                keys[exam_id] = entry[1]
+
+    missing = [exam_id for exam_id in exam_ids if exam_id not in keys]
+    if not missing:
+        return keys
+
+    compiled = compile_answer_keys(missing)
+    keys.update(compiled)
+
+    if not connection.in_atomic_block:
+        with _compiled_lock:
+            for exam_id, key in compiled.items():
+                _compiled[exam_id] = (versions[exam_id], key)
+                _compiled.move_to_end(exam_id)
+            while len(_compiled) > ANSWER_KEY_CACHE_SIZE:
+                _compiled.popitem(last=False)
+
+    return keys
+
+
+def compile_answer_keys(exam_ids):
+    """Carrega questões e alternativas das provas e compila os gabaritos"""
+    questions = {exam_id: [] for exam_id in exam_ids}
+    alternatives = {}  # id da questão -> {ordem: alternativa}
+
+    for start in range(0, len(exam_ids), ANSWER_KEY_LOOKUP_CHUNK_SIZE):
+        chunk = exam_ids[start:start + ANSWER_KEY_LOOKUP_CHUNK_SIZE]
+        for question in TbQuestions.objects.filter(id_exam_id__in=chunk):
+            questions[question.id_exam_id].append(question)
+
+        # Ordem decrescente: com alternativas repetidas, vale a de menor id
+        for alternative in TbAlternatives.objects.filter(
+            id_question__id_exam_id__in=chunk
+        ).order_by('-id'):
+            alternatives.setdefault(alternative.id_question_id, {})[
+                alternative.alternative_order
+            ] = alternative
+
+    return {
+        exam_id: AnswerKey(exam_questions, alternatives)
+        for exam_id, exam_questions in questions.items()
+    }
+
@@ -0,0 +1,192 @@
+"""
+Salvamento automático das respostas da prova online (write-behind).
+
+Durante a prova, cada resposta marcada vai para tb_answer_autosave, uma
+tabela UNLOGGED com uma linha por (aluno, aplicação, questão): salvar de novo
+a mesma questão sobrescreve a linha, então uma prova inteira nunca ocupa mais
+linhas que questões, não importa quantas vezes o aluno troque de alternativa.
+
+flush_answers move o buffer para tb_student_answers em lotes, com uma
+instrução por lote (DELETE ... RETURNING, correção pelas alternativas e
+UPDATE/INSERT das respostas). O resultado não é calculado no flush: enquanto
+a prova não é entregue o aluno não tem resultado (a tela de prova usa isso
+para saber se ele já fez a prova). submit_session faz o flush do aluno e
+calcula resultado, descritores e progresso, como o lançamento em lote.
+"""
+from django.db import connection, transaction
+
+from .item_analysis import invalidate_answer_data
+from .scoring import insert_achievements, upsert_learning_progress, upsert_results
+
+
+# Respostas movidas do buffer por instrução
+AUTOSAVE_FLUSH_BATCH_SIZE = 5000
+
+
+def save_answers(student_id, application_id, answers):
+    """
+    Grava respostas no buffer com um único INSERT ... ON CONFLICT.
+
+    answers é uma lista de dicts com id_question, id_selected_alternative e
+    answer_text (opcional); repetições da mesma questão ficam com a última.
+    Nada é salvo se o aluno já tem resultado na aplicação (prova entregue).
+    Retorna a quantidade de questões salvas.
+    """
+    sheet = {}
+    for answer in answers:
+        sheet[answer['id_question']] = answer
+    if not sheet:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO tb_answer_autosave
+                (id_student, id_exam_application, id_question,
+                 id_selected_alternative, answer_text, saved_at)
+            SELECT %s, %s, a.id_question, a.id_selected_alternative, a.answer_text, clock_timestamp()
+            FROM unnest(%s::integer[], %s::integer[], %s::text[])
+                 AS a(id_question, id_selected_alternative, answer_text)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM tb_exam_results r
+                WHERE r.id_student = %s AND r.id_exam_application = %s
+            )
+            ON CONFLICT (id_student, id_exam_application, id_question) DO UPDATE SET
+                id_selected_alternative = EXCLUDED.id_selected_alternative,
+                answer_text = EXCLUDED.answer_text,
+                saved_at = EXCLUDED.saved_at
+        """, [
+            student_id,
+            application_id,
+            list(sheet),
+            [answer.get('id_selected_alternative') for answer in sheet.values()],
+            [answer.get('answer_text') or '' for answer in sheet.values()],
+            student_id,
+            application_id,
+        ])
+        return cursor.rowcount
+
+
+def _buffer_filter(pairs=None, older_than=None):
+    """Cláusula WHERE (e parâmetros) das linhas do buffer a mover"""
+    if pairs is not None:
+        pairs = list(pairs)
+        return (
+            '(id_student, id_exam_application) IN '
+            '(SELECT * FROM unnest(%s::integer[], %s::integer[]))',
+            [[student_id for student_id, _ in pairs], [application_id for _, application_id in pairs]]
+        )
+    if older_than is not None:
+        return 'saved_at < clock_timestamp() - %s', [older_than]
+    return 'true', []
+
+
+def flush_answers(pairs=None, older_than=None, batch_size=AUTOSAVE_FLUSH_BATCH_SIZE):
+    """
+    Move respostas do buffer para tb_student_answers, lote a lote.
+
+    Sem filtro, move o buffer inteiro; pairs restringe a pares (aluno,
+    aplicação) e older_than (timedelta) às linhas salvas há mais tempo que
+    isso. Cada lote é uma transação: as linhas saem do buffer (SKIP LOCKED,
+    então vários processos podem fazer flush juntos), são corrigidas pela
+    alternativa marcada e atualizam a resposta existente ou viram uma nova.
+    Linhas de alunos, questões ou aplicações que não batem são descartadas,
+    assim como as de provas já entregues (com resultado): a entrega já levou
+    todas as respostas, e gravar depois dela deixaria o resultado defasado.
+
+    Retorna (respostas gravadas, ids das provas afetadas).
+    """
+    where, params = _buffer_filter(pairs, older_than)
+    flushed = 0
+    exam_ids = set()
+
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM tb_answer_autosave
+                    WHERE id IN (
+                        SELECT id FROM tb_answer_autosave
+                        WHERE {where}
+                        ORDER BY id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id_student, id_exam_application, id_question,
+                              id_selected_alternative, answer_text, saved_at
+                ),
+                graded AS (
+                    SELECT m.id_student, m.id_exam_application, m.id_question,
+                           a.id AS id_selected_alternative, m.answer_text, m.saved_at,
+                           COALESCE(a.is_correct, false) AS is_correct, q.id_exam
+                    FROM moved m
+                    JOIN tb_students s ON s.id_student = m.id_student
+                    JOIN tb_questions q ON q.id = m.id_question
+                    JOIN tb_exam_applications ea
+                         ON ea.id = m.id_exam_application AND ea.id_exam = q.id_exam
+                    LEFT JOIN tb_alternatives a
+                           ON a.id = m.id_selected_alternative AND a.id_question = m.id_question
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM tb_exam_results r
+                        WHERE r.id_student = m.id_student
+                          AND r.id_exam_application = m.id_exam_application
+                    )
+                ),
+                updated AS (
+                    UPDATE tb_student_answers sa SET
+                        id_selected_alternative = g.id_selected_alternative,
+                        answer_text = g.answer_text,
+                        is_correct = g.is_correct,
+                        answered_at = g.saved_at
+                    FROM graded g
+                    WHERE sa.id_student = g.id_student
+                      AND sa.id_exam_application = g.id_exam_application
+                      AND sa.id_question = g.id_question
+                    RETURNING sa.id_student, sa.id_exam_application, sa.id_question
+                ),
+                inserted AS (
+                    INSERT INTO tb_student_answers
+                        (id_student, id_exam_application, id_question,
+                         id_selected_alternative, answer_text, is_correct, answered_at)
+                    SELECT g.id_student, g.id_exam_application, g.id_question,
+                           g.id_selected_alternative, g.answer_text, g.is_correct, g.saved_at
+                    FROM graded g
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM updated u
+                        WHERE u.id_student = g.id_student
+                          AND u.id_exam_application = g.id_exam_application
+                          AND u.id_question = g.id_question
+                    )
+                )
+                SELECT (SELECT count(*) FROM moved),
+                       (SELECT count(*) FROM graded),
+                       (SELECT array_agg(DISTINCT id_exam) FROM graded)
+            """, params + [batch_size])
+            moved, saved, exams = cursor.fetchone()
+
+            if exams:
+                exam_ids.update(exams)
+                invalidate_answer_data(exams)
+        flushed += saved
+
+        if moved < batch_size:
+            return flushed, sorted(exam_ids)
+
+
+def submit_session(student_id, application_id, answers=()):
+    """
+    Entrega a prova: salva as últimas respostas, faz o flush do aluno e
+    calcula resultado, conquistas de descritores e progresso (api.scoring).
+
+    Retorna a quantidade de respostas gravadas na entrega.
+    """
+    pairs = [(student_id, application_id)]
+    with transaction.atomic():
+        save_answers(student_id, application_id, answers)
+        flushed, exam_ids = flush_answers(pairs=pairs)
+
+        upsert_results(pairs=pairs)
+        insert_achievements(pairs=pairs)
+        upsert_learning_progress(pairs=pairs)
+        invalidate_answer_data(exam_ids)
+
+    return flushed
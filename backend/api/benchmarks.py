@@ -0,0 +1,206 @@
+"""
+Dados sintéticos e medições usados pelo comando benchmark_imports.
+
+Gera escolas, turmas e professores direto no banco e monta, em memória, os
+arquivos aceitos pelos endpoints de importação (alunos, gabarito e
+respostas). Cada importação roda pelas mesmas rotinas de api.imports e é
+medida em linhas por segundo, consultas SQL e pico de memória do processo.
+"""
+import csv
+import io
+import math
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+
+from students.models import TbCity, TbClass, TbDescriptorsCatalog, TbSchool, TbTeacher
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Faixa de matrículas e códigos reservada para os dados sintéticos
+BENCHMARK_SERIAL_BASE = 1_900_000_000
+BENCHMARK_SERIALS_PER_SEED = 1_000_000
+BENCHMARK_PREFIX = 'BENCH'
+
+# Proporção de questões deixadas em branco nas folhas de resposta
+BENCHMARK_BLANK_RATE = 0.05
+
+
+class BenchmarkScale:
+    """Tamanho da rede sintética a partir do total de respostas desejado"""
+
+    def __init__(self, answers, questions=20, exams=1, class_size=30, classes_per_school=10):
+        self.questions = questions
+        self.exams = exams
+        self.class_size = class_size
+        self.students = max(1, math.ceil(answers / (questions * exams)))
+        self.classes = max(1, math.ceil(self.students / class_size))
+        self.schools = max(1, math.ceil(self.classes / classes_per_school))
+        self.classes_per_school = classes_per_school
+
+    @property
+    def answers(self):
+        return self.students * self.questions * self.exams
+
+
+# ============================================
+# GERADORES
+# ============================================
+
+def create_network(scale, seed):
+    """Cria cidade, escolas, professores e turmas; retorna os IDs das turmas"""
+    tag = f'{BENCHMARK_PREFIX}{seed}'
+    city = TbCity.objects.create(city=f'Cidade {tag}', state='BM')
+    schools = TbSchool.objects.bulk_create([
+        TbSchool(school=f'Escola {tag}-{number}', id_city=city)
+        for number in range(1, scale.schools + 1)
+    ])
+
+    serial_base = BENCHMARK_SERIAL_BASE + seed * BENCHMARK_SERIALS_PER_SEED
+    teachers = TbTeacher.objects.bulk_create([
+        TbTeacher(teacher_serial=serial_base + number, teacher_name=f'Professor {tag}-{number}')
+        for number in range(1, scale.classes + 1)
+    ])
+
+    classes = TbClass.objects.bulk_create([
+        TbClass(
+            class_name=f'Turma {tag}-{number}',
+            id_teacher=teachers[number],
+            id_school=schools[number // scale.classes_per_school],
+            school_year=date.today().year
+        )
+        for number in range(scale.classes)
+    ])
+    return [class_obj.id for class_obj in classes]
+
+
+def create_descriptors(scale, seed):
+    """Descritores do gabarito sintético (um a cada cinco questões)"""
+    codes = [
+        f'{BENCHMARK_PREFIX}{seed}-D{number:02d}'
+        for number in range(1, math.ceil(scale.questions / 5) + 1)
+    ]
+    TbDescriptorsCatalog.objects.bulk_create(
+        [TbDescriptorsCatalog(descriptor_code=code, descriptor_name=code) for code in codes],
+        ignore_conflicts=True
+    )
+    return codes
+
+
+def student_serial(seed, number):
+    return BENCHMARK_SERIAL_BASE + seed * BENCHMARK_SERIALS_PER_SEED + number
+
+
+def exam_code(seed, number):
+    return f'{BENCHMARK_PREFIX}{seed}_PROVA_{number}'
+
+
+def students_rows(scale, seed, class_ids):
+    """Linhas do arquivo do bulk_import"""
+    yield ['nome', 'matricula', 'turma', 'data de matricula', 'status']
+    for number in range(scale.students):
+        yield [
+            f'Aluno {number}',
+            student_serial(seed, number),
+            class_ids[number // scale.class_size],
+            date.today().isoformat(),
+            'ativo'
+        ]
+
+
+def answer_key_rows(scale, seed, descriptor_codes, rng):
+    """Linhas do arquivo do import_answer_key (uma por questão)"""
+    yield [
+        'codigo_prova', 'nome_prova', 'disciplina', 'ano_escolar', 'numero_questao',
+        'resposta_correta', 'codigo_descritor', 'pontos', 'dificuldade', 'enunciado'
+    ]
+    for exam in range(1, scale.exams + 1):
+        for question in range(1, scale.questions + 1):
+            yield [
+                exam_code(seed, exam), f'Prova sintética {exam}', 'Matemática', '5',
+                question, rng.choice('ABCDE'), descriptor_codes[(question - 1) // 5],
+                '1.0', rng.choice(['easy', 'medium', 'hard']), ''
+            ]
+
+
+def answers_rows(scale, seed, class_ids, rng):
+    """Linhas do arquivo do import_student_answers (uma por aluno e prova)"""
+    yield ['codigo_prova', 'id_turma', 'matricula_aluno'] + [
+        f'q{question}' for question in range(1, scale.questions + 1)
+    ]
+    for exam in range(1, scale.exams + 1):
+        for number in range(scale.students):
+            yield [exam_code(seed, exam), class_ids[number // scale.class_size], student_serial(seed, number)] + [
+                '' if rng.random() < BENCHMARK_BLANK_RATE else rng.choice('ABCDE')
+                for _ in range(scale.questions)
+            ]
+
+
+def build_upload(name, rows, file_format='csv'):
+    """Monta o arquivo enviado ao endpoint (CSV ou Excel) em memória"""
+    if file_format == 'xlsx':
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        for row in rows:
+            worksheet.append(row)
+        content = io.BytesIO()
+        workbook.save(content)
+        return SimpleUploadedFile(f'{name}.xlsx', content.getvalue())
+
+    content = io.StringIO()
+    csv.writer(content).writerows(rows)
+    return SimpleUploadedFile(f'{name}.csv', content.getvalue().encode('utf-8'))
+
+
+# ============================================
+# MEDIÇÃO
+# ============================================
+
+def peak_rss_mb():
+    """Pico de memória (RSS) do processo até agora, em MB"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextmanager
+def count_queries():
+    """
+    Conta as consultas da conexão sem guardar o SQL (o CaptureQueriesContext
+    manteria em memória cada INSERT em lote).
+    """
+    counter = {'queries': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def measure(step, rows, run):
+    """Executa run() e devolve as métricas do passo"""
+    with count_queries() as counter:
+        start = time.perf_counter()
+        result = run()
+        seconds = time.perf_counter() - start
+
+    return {
+        'step': step,
+        'rows': rows,
+        'seconds': round(seconds, 2),
+        'rows_per_second': round(rows / seconds) if seconds else None,
+        'queries': counter['queries'],
+        'peak_rss_mb': peak_rss_mb(),
+        'errors': result.get('error_count', 0),
+    }
@@ -0,0 +1,544 @@
+"""
+Importação de respostas em alto volume (rodadas municipais com leitoras
+ópticas).
+
+As linhas do arquivo são convertidas para o formato longo (uma linha por
+célula de resposta) e enviadas com COPY FROM STDIN para uma tabela
+temporária. A partir dela, alunos, questões e alternativas são resolvidos
+com joins, as respostas entram com um único INSERT ... SELECT e os
+resultados e descritores com uma instrução agregada cada.
+
+A correção usa os mesmos gabaritos compilados da importação padrão
+(api.answer_keys): cada gabarito é copiado para outra tabela temporária,
+com uma linha por questão e letra, e as respostas são corrigidas com um join
+nela, sem consultar tb_alternatives.
+"""
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from .answer_keys import get_answer_keys
+from .grading import ANSWER_LETTERS, BLANK
+from .imports import ImportErrorLog, ImportFileError, _no_progress, iter_import_rows
+from .item_analysis import invalidate_answer_data
+from .scoring import upsert_learning_progress
+
+
+VALID_ANSWERS = ('', 'A', 'B', 'C', 'D', 'E')
+
+# Tabelas temporárias usadas pelo pipeline (removidas no fim da transação)
+STAGING_TABLES = (
+    'tmp_answer_import', 'tmp_answer_rows', 'tmp_answer_key', 'tmp_answer_graded', 'tmp_answer_chosen'
+)
+
+
+def run_student_answers_copy_import(file, sheet=None, progress=None):
+    """
+    Importa respostas com COPY e instruções set-based.
+
+    Aplica as mesmas validações e devolve o mesmo corpo de resposta da
+    importação padrão (run_student_answers_import), mas todo o arquivo é
+    gravado em uma única transação.
+    """
+    progress = progress or _no_progress
+
+    stats = {'total_rows': 0}
+    errors = []  # (linha, ordem, mensagem, coluna, código) das validações feitas em Python
+    rows = iter_import_rows(file, sheet=sheet)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _create_staging_table(cursor)
+        cursor.copy_expert(
+            'COPY tmp_answer_import FROM STDIN',
+            _CopyBuffer(_staging_lines(rows, errors, stats))
+        )
+        if stats['total_rows'] == 0:
+            raise ImportFileError('Arquivo vazio')
+        progress(0, len(errors))
+
+        # Tabelas temporárias não passam pelo autovacuum: as estatísticas
+        # são coletadas explicitamente para o planejador escolher os joins
+        cursor.execute('CREATE INDEX ON tmp_answer_import (line)')
+        cursor.execute('ANALYZE tmp_answer_import')
+
+        _resolve_rows(cursor)
+        errors.extend(_row_errors(cursor))
+        errors.sort(key=lambda error: (error[0], error[1]))
+
+        created_applications = _create_applications(cursor)
+        _load_answer_keys(cursor)
+        _grade_answers(cursor)
+        duplicate_errors = _duplicate_errors(cursor)
+
+        processed_students = _insert_answers(cursor)
+        _upsert_results(cursor)
+        _insert_achievements(cursor)
+        _upsert_learning_progress(cursor)
+        _invalidate_item_analysis(cursor)
+
+        students_not_found, exams_not_found = _not_found(cursor)
+
+    all_errors = ImportErrorLog()
+    for line, _, message, column, code in errors:
+        all_errors.add(message, row=line, column=column, code=code)
+    all_errors.extend(duplicate_errors)
+    progress(stats['total_rows'], len(all_errors))
+
+    response_data = {
+        'success': True,
+        'message': f'Respostas de {processed_students} aluno(s) importadas com sucesso',
+        'processed_students': processed_students,
+        'created_applications': created_applications,
+        **all_errors.response_fields('student_answers')
+    }
+
+    if students_not_found:
+        response_data['students_not_found'] = students_not_found
+
+    if exams_not_found:
+        response_data['exams_not_found'] = exams_not_found
+
+    return response_data
+
+
+# ============================================
+# CARGA DA TABELA TEMPORÁRIA
+# ============================================
+
+class _CopyBuffer:
+    """Arquivo somente leitura que gera o conteúdo do COPY sob demanda"""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ''
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            chunks.append(line)
+            length += len(line)
+
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _copy_text(value):
+    """Escapa um valor para o formato texto do COPY"""
+    return (
+        value.replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def _staging_lines(rows, errors, stats):
+    """
+    Converte as linhas do arquivo para o formato longo do COPY.
+
+    As validações de formato (campos obrigatórios e números) são feitas aqui,
+    com as mesmas mensagens da importação padrão; as linhas recusadas não
+    entram na tabela temporária. Uma linha sem colunas q1, q2... entra com
+    uma célula vazia para que ainda seja validada no banco.
+    """
+    for idx, row in enumerate(rows, start=2):
+        stats['total_rows'] += 1
+        try:
+            codigo_prova = str(row.get('codigo_prova', '')).strip()
+            id_turma = row.get('id_turma')
+            matricula_aluno = row.get('matricula_aluno')
+
+            # Validações básicas
+            if not codigo_prova:
+                errors.append((idx, 0, f"Linha {idx}: codigo_prova obrigatório", 'codigo_prova', 'required'))
+                continue
+            if not id_turma:
+                errors.append((idx, 0, f"Linha {idx}: id_turma obrigatório", 'id_turma', 'required'))
+                continue
+            if not matricula_aluno:
+                errors.append((idx, 0, f"Linha {idx}: matricula_aluno obrigatório", 'matricula_aluno', 'required'))
+                continue
+
+            # Converte tipos
+            try:
+                id_turma = int(id_turma)
+                matricula_aluno = int(matricula_aluno)
+            except (ValueError, TypeError):
+                errors.append((idx, 0, f"Linha {idx}: id_turma e matricula_aluno devem ser números", None, 'invalid'))
+                continue
+
+            prefix = f"{idx}\t{_copy_text(codigo_prova)}\t{id_turma}\t{matricula_aluno}\t"
+            lines = []
+            for position, (key, value) in enumerate(row.items()):
+                if key.startswith('q') and key[1:].isdigit():
+                    answer_value = str(value).strip().upper() if value else ''
+                    lines.append(f"{prefix}{position}\t{key}\t{int(key[1:])}\t{_copy_text(answer_value)}\n")
+
+        except Exception as e:
+            errors.append((idx, 0, f"Linha {idx}: {str(e)}", None, 'error'))
+            continue
+
+        if not lines:
+            lines.append(f"{prefix}\\N\t\\N\t\\N\t\\N\n")
+        yield from lines
+
+
+def _create_staging_table(cursor):
+    for table in STAGING_TABLES:
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_answer_import (
+            line integer NOT NULL,
+            exam_code text NOT NULL,
+            class_id bigint NOT NULL,
+            student_serial bigint NOT NULL,
+            position integer,
+            question_key text,
+            question_number bigint,
+            answer text
+        ) ON COMMIT DROP
+    """)
+
+
+# ============================================
+# RESOLUÇÃO E VALIDAÇÃO
+# ============================================
+
+def _resolve_rows(cursor):
+    """Resolve prova, turma e aluno de cada linha do arquivo com joins"""
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_answer_rows ON COMMIT DROP AS
+        SELECT
+            r.line, r.exam_code, r.class_id, r.student_serial,
+            e.id AS id_exam, c.id AS id_class, c.id_teacher,
+            s.id_student, s.student_name, r.has_answers,
+            NULL::integer AS id_application,
+            false AS already_answered
+        FROM (
+            SELECT
+                line, exam_code, class_id, student_serial,
+                bool_or(question_number IS NOT NULL AND answer IN %s) AS has_answers
+            FROM tmp_answer_import
+            GROUP BY line, exam_code, class_id, student_serial
+        ) r
+        LEFT JOIN tb_exams e ON e.exam_code = r.exam_code
+        LEFT JOIN tb_class c ON c.id = r.class_id
+        LEFT JOIN tb_students s
+               ON s.student_serial = r.student_serial AND s.id_class = r.class_id
+    """, [VALID_ANSWERS])
+
+    # Só linhas totalmente resolvidas seguem para a gravação
+    cursor.execute("""
+        UPDATE tmp_answer_rows SET has_answers = false
+        WHERE id_exam IS NULL OR id_class IS NULL OR id_student IS NULL
+    """)
+    cursor.execute('CREATE INDEX ON tmp_answer_rows (line)')
+    cursor.execute('ANALYZE tmp_answer_rows')
+
+
+def _row_errors(cursor):
+    """Erros por linha, na mesma prioridade da importação padrão"""
+    errors = []
+
+    cursor.execute("""
+        SELECT line, exam_code, class_id, student_serial, id_exam IS NULL, id_class IS NULL
+        FROM tmp_answer_rows
+        WHERE id_exam IS NULL OR id_class IS NULL OR id_student IS NULL
+    """)
+    for line, exam_code, class_id, serial, exam_missing, class_missing in cursor.fetchall():
+        if exam_missing:
+            message, column = f"Linha {line}: Prova '{exam_code}' não encontrada", 'codigo_prova'
+        elif class_missing:
+            message, column = f"Linha {line}: Turma ID {class_id} não encontrada", 'id_turma'
+        else:
+            message, column = f"Linha {line}: Aluno matrícula {serial} não encontrado na turma", 'matricula_aluno'
+        errors.append((line, 0, message, column, 'not_found'))
+
+    # Letras inválidas (apenas nas linhas resolvidas)
+    cursor.execute("""
+        SELECT i.line, i.position, i.question_key
+        FROM tmp_answer_import i
+        JOIN tmp_answer_rows r ON r.line = i.line
+        WHERE r.id_student IS NOT NULL AND r.id_exam IS NOT NULL
+          AND i.question_number IS NOT NULL
+          AND i.answer NOT IN %s
+    """, [VALID_ANSWERS])
+    for line, position, key in cursor.fetchall():
+        errors.append((
+            line, position + 1, f"Linha {line}, {key}: Resposta deve ser A, B, C, D, E ou vazio", key, 'invalid'
+        ))
+
+    # Linhas resolvidas sem nenhuma resposta válida
+    cursor.execute("""
+        SELECT line FROM tmp_answer_rows
+        WHERE id_student IS NOT NULL AND id_exam IS NOT NULL AND NOT has_answers
+    """)
+    for (line,) in cursor.fetchall():
+        errors.append((
+            line, float('inf'), f"Linha {line}: Nenhuma resposta encontrada (colunas q1, q2, q3...)", None, 'required'
+        ))
+
+    return errors
+
+
+def _not_found(cursor):
+    cursor.execute("""
+        SELECT DISTINCT student_serial FROM tmp_answer_rows
+        WHERE id_exam IS NOT NULL AND id_class IS NOT NULL AND id_student IS NULL
+    """)
+    students_not_found = [serial for (serial,) in cursor.fetchall()]
+
+    cursor.execute("SELECT DISTINCT exam_code FROM tmp_answer_rows WHERE id_exam IS NULL")
+    exams_not_found = [code for (code,) in cursor.fetchall()]
+
+    return students_not_found, exams_not_found
+
+
+# ============================================
+# APLICAÇÕES, CORREÇÃO E GRAVAÇÃO
+# ============================================
+
+def _create_applications(cursor):
+    """
+    Cria as aplicações (prova + turma) que ainda não existem e associa cada
+    linha à sua aplicação. Retorna as aplicações criadas.
+    """
+    now = datetime.now()
+    cursor.execute("""
+        WITH created AS (
+            INSERT INTO tb_exam_applications
+                (id_exam, id_class, id_teacher, application_date, status, fiscal_year, created_at)
+            SELECT DISTINCT r.id_exam, r.id_class, r.id_teacher, %s, 'completed', %s, now()
+            FROM tmp_answer_rows r
+            WHERE r.has_answers
+              AND NOT EXISTS (
+                  SELECT 1 FROM tb_exam_applications a
+                  WHERE a.id_exam = r.id_exam AND a.id_class = r.id_class
+              )
+            RETURNING id_exam, id_class
+        )
+        SELECT e.exam_name, c.class_name
+        FROM created
+        JOIN tb_exams e ON e.id = created.id_exam
+        JOIN tb_class c ON c.id = created.id_class
+        ORDER BY (
+            SELECT MIN(r.line) FROM tmp_answer_rows r
+            WHERE r.id_exam = created.id_exam AND r.id_class = created.id_class
+        )
+    """, [now.date(), now.year])
+    created_applications = [
+        {'exam': exam_name, 'class': class_name}
+        for exam_name, class_name in cursor.fetchall()
+    ]
+
+    cursor.execute("""
+        UPDATE tmp_answer_rows r
+        SET id_application = a.id
+        FROM (
+            SELECT id_exam, id_class, MIN(id) AS id
+            FROM tb_exam_applications
+            WHERE (id_exam, id_class) IN (
+                SELECT id_exam, id_class FROM tmp_answer_rows WHERE has_answers
+            )
+            GROUP BY id_exam, id_class
+        ) a
+        WHERE r.has_answers AND a.id_exam = r.id_exam AND a.id_class = r.id_class
+    """)
+
+    cursor.execute("""
+        UPDATE tmp_answer_rows r
+        SET already_answered = true
+        WHERE r.has_answers
+          AND EXISTS (
+              SELECT 1 FROM tb_student_answers sa
+              WHERE sa.id_student = r.id_student
+                AND sa.id_exam_application = r.id_application
+          )
+    """)
+    return created_applications
+
+
+def _answer_key_lines(keys):
+    """Linhas do COPY de tmp_answer_key: uma por questão e código de resposta"""
+    for exam_id, key in keys.items():
+        for question_number, column in key.columns.items():
+            question = key.questions[column]
+            descriptor = question.id_descriptor_id or '\\N'
+            prefix = f"{exam_id}\t{question_number}\t{question.id}\t{question.points}\t{descriptor}\t"
+            for code in range(BLANK, len(ANSWER_LETTERS) + 1):
+                alternative = int(key.option_alternative[column, code]) or '\\N'
+                correct = 't' if key.option_correct[column, code] else 'f'
+                yield f"{prefix}{code}\t{alternative}\t{correct}\n"
+
+
+def _load_answer_keys(cursor):
+    """
+    Copia para tmp_answer_key os gabaritos compilados (api.answer_keys) das
+    provas que receberam respostas, com a alternativa e a correção de cada
+    código de resposta (0 = em branco, A=1, B=2...).
+    """
+    cursor.execute('SELECT DISTINCT id_exam FROM tmp_answer_rows WHERE has_answers')
+    keys = get_answer_keys([exam_id for exam_id, in cursor.fetchall()])
+
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_answer_key (
+            id_exam integer NOT NULL,
+            question_number integer NOT NULL,
+            id_question integer NOT NULL,
+            points numeric NOT NULL,
+            id_descriptor integer,
+            code integer NOT NULL,
+            id_alternative integer,
+            is_correct boolean NOT NULL,
+            PRIMARY KEY (id_exam, question_number, code)
+        ) ON COMMIT DROP
+    """)
+    cursor.copy_expert('COPY tmp_answer_key FROM STDIN', _CopyBuffer(_answer_key_lines(keys)))
+    cursor.execute('ANALYZE tmp_answer_key')
+
+
+def _grade_answers(cursor):
+    """
+    Corrige as respostas pelo gabarito compilado: cada célula é ligada à
+    questão (pelo número) e ao código da letra em tmp_answer_key. Questões
+    que não existem na prova são ignoradas, como na importação padrão.
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_answer_graded ON COMMIT DROP AS
+        SELECT DISTINCT ON (r.line, i.question_number)
+            r.line, r.id_student, r.id_application,
+            k.id_question, k.points, k.id_descriptor,
+            k.id_alternative, i.answer, k.is_correct
+        FROM tmp_answer_rows r
+        JOIN tmp_answer_import i ON i.line = r.line
+        JOIN tmp_answer_key k
+          ON k.id_exam = r.id_exam
+         AND k.question_number = i.question_number
+         AND k.code = CASE WHEN i.answer = '' THEN 0 ELSE ascii(i.answer) - ascii('A') + 1 END
+        WHERE r.has_answers AND i.answer IN %s
+        ORDER BY r.line, i.question_number, i.position DESC
+    """, [VALID_ANSWERS])
+
+    # Primeira linha corrigida de cada aluno na aplicação; as seguintes (e as
+    # de alunos que já tinham respostas) são recusadas como duplicadas
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_answer_chosen ON COMMIT DROP AS
+        SELECT r.id_student, r.id_application, MIN(r.line) AS line
+        FROM tmp_answer_rows r
+        WHERE r.has_answers
+          AND NOT r.already_answered
+          AND EXISTS (SELECT 1 FROM tmp_answer_graded g WHERE g.line = r.line)
+        GROUP BY r.id_student, r.id_application
+    """)
+    cursor.execute('CREATE INDEX ON tmp_answer_chosen (line)')
+    cursor.execute('ANALYZE tmp_answer_graded')
+    cursor.execute('ANALYZE tmp_answer_chosen')
+
+
+def _duplicate_errors(cursor):
+    """Alunos recusados por já terem respostas, na ordem das aplicações no arquivo"""
+    cursor.execute("""
+        SELECT line, student_name, student_serial
+        FROM (
+            SELECT
+                r.line, r.student_name, r.student_serial, r.already_answered,
+                c.line AS chosen_line,
+                MIN(r.line) OVER (PARTITION BY r.id_application) AS application_line
+            FROM tmp_answer_rows r
+            LEFT JOIN tmp_answer_chosen c
+                   ON c.id_student = r.id_student AND c.id_application = r.id_application
+            WHERE r.has_answers
+        ) rows
+        WHERE already_answered OR line > chosen_line
+        ORDER BY application_line, line
+    """)
+    errors = ImportErrorLog()
+    for line, name, serial in cursor.fetchall():
+        errors.add(
+            f"Aluno {name} (mat: {serial}) já tem respostas para esta prova",
+            row=line, column='matricula_aluno', code='duplicate'
+        )
+    return errors
+
+
+def _insert_answers(cursor):
+    """Grava as respostas corrigidas com um único INSERT ... SELECT"""
+    cursor.execute("""
+        INSERT INTO tb_student_answers
+            (id_student, id_exam_application, id_question, id_selected_alternative,
+             answer_text, is_correct, answered_at)
+        SELECT g.id_student, g.id_application, g.id_question, g.id_alternative,
+               g.answer, g.is_correct, now()
+        FROM tmp_answer_graded g
+        JOIN tmp_answer_chosen c ON c.line = g.line
+    """)
+    cursor.execute('SELECT COUNT(*) FROM tmp_answer_chosen')
+    return cursor.fetchone()[0]
+
+
+def _upsert_results(cursor):
+    """Deriva tb_exam_results das respostas gravadas com uma instrução agregada"""
+    cursor.execute("""
+        INSERT INTO tb_exam_results
+            (id_student, id_exam_application, total_score, max_score,
+             correct_answers, wrong_answers, blank_answers, created_at)
+        SELECT
+            g.id_student, g.id_application,
+            COALESCE(SUM(g.points) FILTER (WHERE g.is_correct), 0),
+            SUM(g.points),
+            COUNT(*) FILTER (WHERE g.is_correct),
+            COUNT(*) FILTER (WHERE NOT g.is_correct AND g.answer <> ''),
+            COUNT(*) FILTER (WHERE g.answer = ''),
+            now()
+        FROM tmp_answer_graded g
+        JOIN tmp_answer_chosen c ON c.line = g.line
+        GROUP BY g.id_student, g.id_application
+        ON CONFLICT (id_student, id_exam_application) DO UPDATE SET
+            total_score = EXCLUDED.total_score,
+            max_score = EXCLUDED.max_score,
+            correct_answers = EXCLUDED.correct_answers,
+            wrong_answers = EXCLUDED.wrong_answers,
+            blank_answers = EXCLUDED.blank_answers
+    """)
+
+
+def _insert_achievements(cursor):
+    """Descritores das questões corretas; conquistas já existentes são mantidas"""
+    cursor.execute("""
+        INSERT INTO tb_student_descriptor_achievements
+            (id_student, id_descriptor, id_exam_application, achieved_at)
+        SELECT DISTINCT ON (g.id_student, g.id_descriptor)
+            g.id_student, g.id_descriptor, g.id_application, now()
+        FROM tmp_answer_graded g
+        JOIN tmp_answer_chosen c ON c.line = g.line
+        WHERE g.is_correct AND g.id_descriptor IS NOT NULL
+        ORDER BY g.id_student, g.id_descriptor, g.line
+        ON CONFLICT (id_student, id_descriptor) DO NOTHING
+    """)
+
+
+def _upsert_learning_progress(cursor):
+    """Progresso de aprendizagem por descritor das aplicações que receberam respostas"""
+    cursor.execute('SELECT DISTINCT id_application FROM tmp_answer_chosen')
+    application_ids = [application_id for application_id, in cursor.fetchall()]
+    if application_ids:
+        upsert_learning_progress(application_ids=application_ids)
+
+
+def _invalidate_item_analysis(cursor):
+    """Descarta a análise de itens em cache das provas que receberam respostas"""
+    cursor.execute("""
+        SELECT DISTINCT r.id_exam
+        FROM tmp_answer_rows r
+        JOIN tmp_answer_chosen c ON c.line = r.line
+    """)
+    invalidate_answer_data(exam_id for exam_id, in cursor.fetchall())
@@ -0,0 +1,143 @@
+"""
+Motor de correção vetorizado.
+
+O gabarito de uma prova é compilado em arrays NumPy (alternativa correta,
+pontos e descritor de cada questão) e as respostas de uma turma inteira são
+corrigidas de uma vez, como uma matriz alunos × questões.
+
+Códigos da matriz de respostas:
+    -1      questão sem célula para o aluno (não entra na correção)
+     0      questão em branco
+     1..N   alternativa marcada pela ordem (A=1, B=2...)
+     N + 1  alternativa que não pertence à questão
+"""
+from decimal import Decimal
+
+import numpy as np
+
+
+NOT_ANSWERED = -1
+BLANK = 0
+
+# Ordens das alternativas reconhecidas pelas letras das planilhas
+ANSWER_LETTERS = 'ABCDE'
+
+
+class AnswerKey:
+    """
+    Gabarito compilado de uma prova.
+
+    questions é a lista de questões (TbQuestions) e alternatives o mapa
+    id da questão -> {ordem: alternativa}. A alternativa escolhida para cada
+    ordem é a mesma da importação (a de menor id, se houver repetidas).
+    """
+
+    def __init__(self, questions, alternatives):
+        self.questions = sorted(questions, key=lambda question: question.question_number)
+        self.columns = {question.question_number: column for column, question in enumerate(self.questions)}
+        self.question_columns = {question.id: column for column, question in enumerate(self.questions)}
+
+        orders = [order for question in self.questions for order in alternatives.get(question.id, {})]
+        self.options = max([len(ANSWER_LETTERS)] + orders)
+        self.other_option = self.options + 1
+
+        size = len(self.questions)
+        # Pontos em centésimos (DecimalField com 2 casas) para somar sem arredondamento
+        self.points = np.array(
+            [int(question.points * 100) for question in self.questions], dtype=np.int64
+        )
+        # Tabela questão × código da resposta: a resposta está correta?
+        self.option_correct = np.zeros((size, self.other_option + 1), dtype=bool)
+        # Tabela questão × código da resposta: id da alternativa (0 = nenhuma)
+        self.option_alternative = np.zeros((size, self.other_option + 1), dtype=np.int64)
+        self.alternative_options = {}  # id da alternativa -> (coluna, código)
+
+        for column, question in enumerate(self.questions):
+            for order, alternative in alternatives.get(question.id, {}).items():
+                self.option_correct[column, order] = bool(alternative.is_correct)
+                self.option_alternative[column, order] = alternative.id
+                self.alternative_options[alternative.id] = (column, order)
+
+        # Descritor de cada questão (índice em descriptor_ids, -1 = sem descritor)
+        self.descriptor_ids = sorted({
+            question.id_descriptor_id for question in self.questions if question.id_descriptor_id
+        })
+        descriptor_positions = {descriptor_id: position for position, descriptor_id in enumerate(self.descriptor_ids)}
+        self.descriptor_index = np.array(
+            [descriptor_positions.get(question.id_descriptor_id, -1) for question in self.questions],
+            dtype=np.int64
+        )
+
+    def __len__(self):
+        return len(self.questions)
+
+    def encode_letters(self, answer_sheets):
+        """
+        Matriz de respostas a partir de dicts {número da questão: letra}.
+
+        Questões que não existem na prova são ignoradas; '' é resposta em branco.
+        """
+        responses = np.full((len(answer_sheets), len(self.questions)), NOT_ANSWERED, dtype=np.int16)
+        for row, answers in enumerate(answer_sheets):
+            for question_number, letter in answers.items():
+                column = self.columns.get(question_number)
+                if column is not None:
+                    responses[row, column] = ord(letter) - ord('A') + 1 if letter else BLANK
+        return responses
+
+    def encode_alternatives(self, answer_sheets):
+        """
+        Matriz de respostas a partir de dicts {id da questão: id da alternativa}.
+
+        None é resposta em branco; uma alternativa de outra questão conta
+        como resposta errada.
+        """
+        responses = np.full((len(answer_sheets), len(self.questions)), NOT_ANSWERED, dtype=np.int16)
+        for row, answers in enumerate(answer_sheets):
+            for question_id, alternative_id in answers.items():
+                column = self.question_columns.get(question_id)
+                if column is None:
+                    continue
+                if not alternative_id:
+                    responses[row, column] = BLANK
+                    continue
+                alternative_column, order = self.alternative_options.get(int(alternative_id), (None, None))
+                responses[row, column] = order if alternative_column == column else self.other_option
+        return responses
+
+    def grade(self, responses):
+        return GradeResult(self, responses)
+
+
+class GradeResult:
+    """Correção de uma matriz de respostas (alunos × questões) em uma passada"""
+
+    def __init__(self, key, responses):
+        self.key = key
+        self.responses = responses
+
+        columns = np.arange(len(key))
+        codes = np.clip(responses, 0, key.other_option)
+
+        self.present = responses != NOT_ANSWERED
+        self.blank = responses == BLANK
+        self.correct = key.option_correct[columns, codes] & self.present
+        self.selected_alternative = np.where(self.present, key.option_alternative[columns, codes], 0)
+
+        self.correct_count = self.correct.sum(axis=1)
+        self.blank_count = self.blank.sum(axis=1)
+        self.wrong_count = self.present.sum(axis=1) - self.correct_count - self.blank_count
+        self.total_points = (self.correct * key.points).sum(axis=1)
+        self.max_points = (self.present * key.points).sum(axis=1)
+
+    def total_score(self, row):
+        return Decimal(int(self.total_points[row])).scaleb(-2)
+
+    def max_score(self, row):
+        return Decimal(int(self.max_points[row])).scaleb(-2)
+
+    def answer_letter(self, row, column):
+        code = int(self.responses[row, column])
+        if BLANK < code <= len(ANSWER_LETTERS):
+            return ANSWER_LETTERS[code - 1]
+        return ''
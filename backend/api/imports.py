@@ -0,0 +1,1655 @@
+"""
+Componentes compartilhados pelos endpoints de importação (alunos, gabaritos e
+respostas).
+"""
+import codecs
+import csv
+import hashlib
+import io
+import os
+import re
+import uuid
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import django
+import numpy as np
+from django.db import DatabaseError, connection, connections, transaction
+from django.utils import timezone
+
+from students.models import (
+    TbAlternatives, TbClass, TbDescriptorsCatalog, TbExamApplications,
+    TbExamResults, TbExams, TbImportCheckpoint, TbImportError, TbQuestions,
+    TbStudentAnswers, TbStudents,
+)
+from .answer_keys import get_answer_keys, invalidate_answer_key
+from .grading import NOT_ANSWERED
+from .item_analysis import invalidate_answer_data
+from .scoring import insert_achievements, upsert_learning_progress
+
+
+# Quantidade de alunos gravados por lote no bulk_import
+STUDENT_IMPORT_BATCH_SIZE = 1000
+
+# Tamanho do trecho inicial usado para detectar a codificação dos CSVs
+IMPORT_SNIFF_SIZE = 64 * 1024
+
+# Codificação dos CSVs que não são UTF-8 (aceita qualquer sequência de bytes,
+# era o último recurso efetivo da lista de codificações testadas antes)
+CSV_FALLBACK_ENCODING = 'latin-1'
+
+# Quantidade máxima de valores por consulta IN nas buscas em lote
+IMPORT_LOOKUP_CHUNK_SIZE = 1000
+
+# Registros por INSERT nas gravações em lote (questões, respostas...)
+IMPORT_INSERT_BATCH_SIZE = 1000
+
+# Limite de processos paralelos na importação de respostas (workers=N)
+IMPORT_MAX_WORKERS = os.cpu_count() or 1
+
+# Erros devolvidos no corpo da resposta; a lista completa fica no relatório
+IMPORT_ERRORS_IN_RESPONSE = 100
+
+# Dias que os relatórios de erros ficam disponíveis para download
+IMPORT_ERROR_REPORT_DAYS = 30
+
+
+class ImportFileError(Exception):
+    """Arquivo de importação que não pode ser lido (codificação, formato...)"""
+
+
+def _no_progress(processed_rows, error_count):
+    pass
+
+
+def _chunked(values, size=IMPORT_LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# ============================================
+# REGISTRO DE ERROS
+# ============================================
+
+class ImportErrorLog:
+    """
+    Erros de uma importação, guardados como (linha, coluna, código, mensagem).
+
+    A resposta do endpoint traz só a contagem e as primeiras
+    IMPORT_ERRORS_IN_RESPONSE mensagens; a lista completa é gravada em
+    tb_import_error e baixada em CSV pelo error_report_id.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, message, row=None, column=None, code='invalid'):
+        self.entries.append((row, column, code, message))
+
+    def extend(self, other):
+        self.entries.extend(other.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def messages(self, limit=IMPORT_ERRORS_IN_RESPONSE):
+        return [message for _, _, _, message in self.entries[:limit]]
+
+    def save(self, import_type):
+        """Grava o relatório completo e retorna o seu id (None se não há erros)"""
+        if not self.entries:
+            return None
+
+        # Relatórios antigos são descartados a cada relatório novo
+        TbImportError.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=IMPORT_ERROR_REPORT_DAYS)
+        ).delete()
+
+        report_id = uuid.uuid4()
+        for start in range(0, len(self.entries), IMPORT_INSERT_BATCH_SIZE):
+            TbImportError.objects.bulk_create([
+                TbImportError(
+                    report_id=report_id,
+                    import_type=import_type,
+                    position=position,
+                    row_number=row,
+                    column_name=column,
+                    code=code,
+                    message=message
+                )
+                for position, (row, column, code, message) in enumerate(
+                    self.entries[start:start + IMPORT_INSERT_BATCH_SIZE], start=start + 1
+                )
+            ])
+        return str(report_id)
+
+    def response_fields(self, import_type, save=True):
+        """
+        Campos de erro do corpo da resposta (errors, error_count, error_report_id).
+
+        Com save=False (validação sem gravar) o relatório não é gravado nem os
+        antigos são descartados: a resposta traz só as primeiras mensagens.
+        """
+        fields = {
+            'errors': self.messages() or None,
+            'error_count': len(self)
+        }
+        report_id = self.save(import_type) if save else None
+        if report_id:
+            fields['error_report_id'] = report_id
+        return fields
+
+
+# ============================================
+# LEITURA DOS ARQUIVOS
+# ============================================
+
+def file_fingerprint(file, sheet=None):
+    """
+    Hash SHA-256 do conteúdo do arquivo (e da planilha escolhida), usado para
+    reconhecer o reenvio do mesmo arquivo e retomar a importação.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(IMPORT_SNIFF_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    if sheet not in (None, ''):
+        digest.update(f"\0sheet={str(sheet).strip()}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def iter_import_rows(file, normalize_header=None, sheet=None):
+    """
+    Fonte de linhas compartilhada pelos endpoints de importação.
+
+    Gera um dict por linha do arquivo (CSV ou Excel) sem carregar o arquivo
+    inteiro em memória. normalize_header, se informado, é aplicado uma única
+    vez a cada nome de coluna; colunas sem nome são descartadas. sheet escolhe
+    a planilha dos arquivos Excel (nome ou posição a partir de 1).
+    """
+    file_extension = file.name.split('.')[-1].lower()
+    if file_extension == 'csv':
+        return iter_csv_rows(file, normalize_header)
+    return iter_excel_rows(file, normalize_header, sheet)
+
+
+def sniff_encoding(head):
+    """Detecta a codificação do CSV a partir do trecho inicial do arquivo"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False tolera um caractere multibyte cortado no fim do trecho
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return CSV_FALLBACK_ENCODING
+
+
+class _FallbackDecodingStream(io.RawIOBase):
+    """
+    Bytes do CSV recodificados em UTF-8, trecho a trecho.
+
+    Decodifica com a codificação detectada no início do arquivo; se um
+    trecho posterior não for UTF-8 válido (arquivo latin-1 cujo início é só
+    ASCII), o que veio antes do erro é mantido e o restante do arquivo passa
+    a ser lido em CSV_FALLBACK_ENCODING, como acontecia ao ler o arquivo
+    inteiro.
+    """
+
+    def __init__(self, file, encoding):
+        self.file = file
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.pending = b''
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending and not self.finished:
+            chunk = self.file.read(IMPORT_SNIFF_SIZE)
+            self.finished = not chunk
+            self.pending = self._decode(chunk, final=self.finished).encode('utf-8')
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def _decode(self, chunk, final):
+        buffered, _ = self.decoder.getstate()
+        try:
+            return self.decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            data = buffered + chunk
+            try:
+                valid = data.decode('utf-8')
+                data = b''
+            except UnicodeDecodeError as error:
+                valid, data = data[:error.start].decode('utf-8'), data[error.start:]
+            self.decoder = codecs.getincrementaldecoder(CSV_FALLBACK_ENCODING)()
+            return valid + self.decoder.decode(data, final=final)
+
+
+def iter_csv_rows(file, normalize_header=None):
+    """Lê o CSV de forma incremental, decodificando trecho a trecho"""
+    file.seek(0)
+    encoding = sniff_encoding(file.read(IMPORT_SNIFF_SIZE))
+    file.seek(0)
+
+    text = io.TextIOWrapper(
+        io.BufferedReader(_FallbackDecodingStream(file, encoding)), encoding='utf-8', newline=''
+    )
+    reader = csv.DictReader(text)
+    headers = reader.fieldnames
+    if not headers:
+        return
+    reader.fieldnames = _normalize_headers(headers, normalize_header)
+
+    for row in reader:
+        yield {key: value for key, value in row.items() if key}
+
+
+def iter_excel_rows(file, normalize_header=None, sheet=None):
+    """
+    Lê uma planilha Excel em modo somente leitura, linha a linha.
+
+    O modo read_only/values_only do openpyxl não monta o documento inteiro em
+    memória. Linhas totalmente vazias no fim da planilha (comuns em arquivos
+    formatados) são ignoradas; as vazias entre linhas preenchidas continuam
+    sendo entregues para manter a numeração das linhas.
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError('Biblioteca openpyxl não instalada. Use CSV.')
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = _select_worksheet(workbook, sheet)
+        values = worksheet.iter_rows(values_only=True)
+
+        header_row = next(values, None)
+        if header_row is None:
+            return
+        headers = _normalize_headers(header_row, normalize_header)
+        width = len(headers)
+
+        blank_rows = 0
+        for row in values:
+            if all(value is None or value == '' for value in row):
+                # Só entrega linhas vazias se aparecer uma linha preenchida depois
+                blank_rows += 1
+                continue
+
+            while blank_rows:
+                yield {key: None for key in headers if key}
+                blank_rows -= 1
+
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            yield {key: value for key, value in zip(headers, row) if key}
+    finally:
+        workbook.close()
+
+
+def _select_worksheet(workbook, sheet):
+    """Seleciona a planilha pelo nome ou pela posição (1, 2, ...)"""
+    if sheet in (None, ''):
+        return workbook.active
+
+    sheet = str(sheet).strip()
+    if sheet in workbook.sheetnames:
+        return workbook[sheet]
+    if sheet.isdigit() and 1 <= int(sheet) <= len(workbook.sheetnames):
+        return workbook.worksheets[int(sheet) - 1]
+
+    raise ImportFileError(
+        f"Planilha '{sheet}' não encontrada. "
+        f"Planilhas disponíveis: {', '.join(workbook.sheetnames)}"
+    )
+
+
+def _normalize_headers(headers, normalize_header):
+    if normalize_header is None:
+        return list(headers)
+    return [normalize_header(header) for header in headers]
+
+
+# ============================================
+# RESOLUÇÃO DE TURMAS
+# ============================================
+
+class ClassResolver:
+    """
+    Índice em memória das turmas usado pelo bulk_import de alunos.
+
+    Carrega todas as turmas da escola (ou de todas as escolas) com uma única
+    query e resolve os valores da coluna "Turma" por ID, nome exato, nome
+    parcial ou padrão de ano ("5º Ano A"), com as mesmas regras e mensagens
+    da busca feita anteriormente no banco linha a linha.
+    """
+
+    def __init__(self, school_id=None):
+        self.school_id = school_id
+
+        queryset = TbClass.objects.all()
+        if school_id:
+            queryset = queryset.filter(id_school_id=school_id)
+
+        # Mantém a ordenação padrão do modelo para que as mensagens de
+        # ambiguidade listem as turmas na mesma ordem de antes
+        self.classes = list(queryset.only('id', 'class_name', 'grade', 'id_school_id'))
+        self.by_id = {c.id: c for c in self.classes}
+        self._names = [(c, c.class_name.upper()) for c in self.classes]
+        self._grades = [(c, (c.grade or '').upper()) for c in self.classes]
+        self._cache = {}
+
+    def resolve(self, value):
+        """Retorna (turma, erro) para o valor informado no arquivo"""
+        if not value:
+            return None, "Valor da turma não fornecido"
+
+        value = str(value).strip()
+        if value not in self._cache:
+            self._cache[value] = self._resolve(value)
+        return self._cache[value]
+
+    def _resolve(self, value):
+        # Tenta primeiro como ID numérico
+        try:
+            class_obj = self.by_id.get(int(value))
+            if class_obj:
+                return class_obj, None
+        except (ValueError, TypeError):
+            pass  # Não é um número, tenta por nome
+
+        upper_value = value.upper()
+
+        # Nome exato (case insensitive), mesmo comportamento do get()
+        exact = [c for c, name in self._names if name == upper_value]
+        if len(exact) == 1:
+            return exact[0], None
+        if len(exact) > 1:
+            raise TbClass.MultipleObjectsReturned(
+                f"get() returned more than one TbClass -- it returned {len(exact)}!"
+            )
+
+        # Nome parcial (case insensitive)
+        partial = [c for c, name in self._names if upper_value in name]
+        if len(partial) == 1:
+            return partial[0], None
+        elif len(partial) > 1:
+            class_names = ", ".join([c.class_name for c in partial[:3]])
+            return None, f"Múltiplas turmas encontradas para '{value}': {class_names}"
+
+        # Tenta extrair ano e turma (ex: "5º Ano A", "ano: 5º ano")
+        match = re.search(r'(\d+)[º°]?\s*(?:ano)?', value.lower())
+        if match:
+            grade_num = match.group(1)
+            patterns = (f"{grade_num}º".upper(), f"{grade_num}°".upper())
+            by_grade = [
+                c for (c, grade), (_, name) in zip(self._grades, self._names)
+                if any(p in grade for p in patterns) or upper_value in name
+            ]
+            if len(by_grade) == 1:
+                return by_grade[0], None
+            elif len(by_grade) > 1:
+                class_names = ", ".join([c.class_name for c in by_grade[:3]])
+                return None, f"Múltiplas turmas encontradas: {class_names}"
+
+        school_msg = f" na escola selecionada" if self.school_id else ""
+        return None, f"Turma '{value}' não encontrada{school_msg}"
+
+    def available_classes(self):
+        """Lista as turmas carregadas no formato usado na resposta do endpoint"""
+        return [
+            {
+                'id': c.id,
+                'name': c.class_name,
+                'grade': c.grade
+            }
+            for c in self.classes
+        ]
+
+
+# ============================================
+# GRAVAÇÃO EM LOTE DE ALUNOS
+# ============================================
+
+STUDENT_UPSERT_FIELDS = ['student_name', 'id_class', 'enrollment_date', 'status']
+
+
+def upsert_students(rows):
+    """
+    Grava um lote de alunos validados.
+
+    Recebe uma lista de (linha, dados) e faz uma consulta para descobrir quais
+    matrículas já existem e um único INSERT ... ON CONFLICT (student_serial)
+    DO UPDATE para todo o lote, em uma transação própria. Retorna as listas
+    (criados, atualizados, erros) com a mesma contagem do update_or_create
+    linha a linha: a primeira ocorrência de uma matrícula nova conta como
+    criada e as seguintes como atualizadas.
+    """
+    created, updated = [], []
+    serials = {data['student_serial'] for _, data in rows}
+
+    try:
+        with transaction.atomic():
+            existing = set(
+                TbStudents.objects.filter(student_serial__in=serials)
+                .values_list('student_serial', flat=True)
+            )
+
+            # A última linha de cada matrícula prevalece, como no update_or_create
+            merged = {}
+            for _, data in rows:
+                serial = data['student_serial']
+                if serial in existing or serial in merged:
+                    updated.append(data['student_name'])
+                else:
+                    created.append(data['student_name'])
+                merged[serial] = data
+
+            TbStudents.objects.bulk_create(
+                [TbStudents(**data) for data in merged.values()],
+                update_conflicts=True,
+                unique_fields=['student_serial'],
+                update_fields=STUDENT_UPSERT_FIELDS,
+            )
+        return created, updated, ImportErrorLog()
+    except DatabaseError:
+        # Algum registro do lote foi recusado pelo banco: regrava linha a
+        # linha para apontar exatamente quais linhas falharam
+        return _upsert_students_row_by_row(rows)
+
+
+def preview_students(rows, previewed_serials):
+    """
+    Conta, sem gravar, quem o upsert_students criaria ou atualizaria.
+
+    previewed_serials acumula as matrículas dos lotes anteriores do mesmo
+    arquivo, que na importação real já estariam gravadas.
+    """
+    created, updated = [], []
+    serials = {data['student_serial'] for _, data in rows}
+    existing = set(
+        TbStudents.objects.filter(student_serial__in=serials)
+        .values_list('student_serial', flat=True)
+    )
+
+    for _, data in rows:
+        serial = data['student_serial']
+        if serial in existing or serial in previewed_serials:
+            updated.append(data['student_name'])
+        else:
+            created.append(data['student_name'])
+        previewed_serials.add(serial)
+    return created, updated
+
+
+def _upsert_students_row_by_row(rows):
+    created, updated, errors = [], [], ImportErrorLog()
+    for idx, data in rows:
+        try:
+            with transaction.atomic():
+                student, was_created = TbStudents.objects.update_or_create(
+                    student_serial=data['student_serial'],
+                    defaults={field: data[field] for field in STUDENT_UPSERT_FIELDS}
+                )
+        except Exception as e:
+            errors.add(f"Linha {idx}: {str(e)}", row=idx, code='database')
+            continue
+
+        if was_created:
+            created.append(student.student_name)
+        else:
+            updated.append(student.student_name)
+    return created, updated, errors
+
+
+# ============================================
+# IMPORTAÇÃO DE ALUNOS
+# ============================================
+
+# Mapeamento de nomes de colunas (português -> inglês)
+STUDENT_COLUMN_MAPPING = {
+    'nome do aluno': 'student_name',
+    'nome': 'student_name',
+    'aluno': 'student_name',
+    'matrícula': 'student_serial',
+    'matricula': 'student_serial',
+    'turma': 'id_class',
+    'classe': 'id_class',
+    'data de matrícula': 'enrollment_date',
+    'data de matricula': 'enrollment_date',
+    'data': 'enrollment_date',
+    'status': 'status',
+    'situação': 'status',
+    'situacao': 'status',
+}
+
+# Mapeamento de status (português -> inglês)
+STUDENT_STATUS_MAPPING = {
+    'matriculado': 'enrolled',
+    'transferido': 'transferred',
+    'formado': 'graduated',
+    'desistente': 'dropped',
+    'ativo': 'active',
+    'inativo': 'inactive',
+}
+
+
+def normalize_student_column(column):
+    """Normaliza o nome da coluna para o padrão em inglês"""
+    if not column:
+        return None
+
+    # Remove espaços extras e converte para minúsculas
+    normalized = column.strip().lower()
+
+    # Se já está em inglês, retorna
+    if normalized in ['student_name', 'student_serial', 'id_class', 'enrollment_date', 'status']:
+        return normalized
+
+    # Busca no mapeamento
+    return STUDENT_COLUMN_MAPPING.get(normalized, normalized)
+
+
+def normalize_student_status(status_value):
+    """Normaliza o status para o padrão em inglês"""
+    if not status_value:
+        return 'enrolled'  # Padrão
+
+    # Remove espaços extras e converte para minúsculas
+    normalized = str(status_value).strip().lower()
+
+    # Se já está em inglês, retorna
+    if normalized in ['enrolled', 'transferred', 'graduated', 'dropped', 'active', 'inactive']:
+        return normalized
+
+    # Busca no mapeamento PT -> EN
+    return STUDENT_STATUS_MAPPING.get(normalized, normalized)
+
+
+def run_student_import(file, school_id=None, sheet=None, progress=None, dry_run=False):
+    """
+    Importa alunos do arquivo e retorna o corpo da resposta do bulk_import.
+
+    Cada lote de STUDENT_IMPORT_BATCH_SIZE alunos é gravado em uma transação
+    própria. progress(linhas_processadas, erros), se informado, é chamado
+    após cada lote gravado. Com dry_run=True o arquivo é apenas validado: cada
+    lote faz só a consulta das matrículas existentes, para contar quem seria
+    criado ou atualizado.
+    """
+    progress = progress or _no_progress
+
+    # Lê o arquivo em streaming, normalizando os nomes das colunas
+    rows = iter_import_rows(file, normalize_header=normalize_student_column, sheet=sheet)
+
+    # Índice das turmas carregado uma única vez para todo o arquivo
+    class_resolver = ClassResolver(school_id)
+
+    # Valida e processa os dados
+    students_created = []
+    students_updated = []
+    errors = ImportErrorLog()
+    missing_classes = set()  # Rastreia turmas não encontradas
+
+    pending_students = []
+    previewed_serials = set()
+    total_rows = 0
+
+    def flush_students():
+        """Grava o lote pendente de alunos (um SELECT e um INSERT ... ON CONFLICT)"""
+        if pending_students and dry_run:
+            created, updated = preview_students(pending_students, previewed_serials)
+            students_created.extend(created)
+            students_updated.extend(updated)
+            pending_students.clear()
+        elif pending_students:
+            created, updated, batch_errors = upsert_students(pending_students)
+            students_created.extend(created)
+            students_updated.extend(updated)
+            errors.extend(batch_errors)
+            pending_students.clear()
+        progress(total_rows, len(errors))
+
+    for idx, row in enumerate(rows, start=2):
+        total_rows += 1
+        try:
+            # Validação dos campos obrigatórios
+            student_name = row.get('student_name', '').strip() if row.get('student_name') else ''
+            student_serial = row.get('student_serial')
+            class_value = row.get('id_class')
+
+            if not student_name:
+                errors.add(f"Linha {idx}: Nome do aluno é obrigatório", row=idx, column='student_name', code='required')
+                continue
+
+            if not student_serial:
+                errors.add(f"Linha {idx}: Matrícula é obrigatória", row=idx, column='student_serial', code='required')
+                continue
+
+            if not class_value:
+                errors.add(f"Linha {idx}: Turma é obrigatória", row=idx, column='id_class', code='required')
+                continue
+
+            # Converte matrícula para inteiro
+            try:
+                student_serial = int(student_serial)
+            except (ValueError, TypeError):
+                errors.add(f"Linha {idx}: Matrícula deve ser um número", row=idx, column='student_serial', code='invalid')
+                continue
+
+            # Busca a turma por nome ou ID (filtrando por escola se fornecido)
+            class_obj, error = class_resolver.resolve(class_value)
+            if not class_obj:
+                errors.add(f"Linha {idx} ({student_name}): {error}", row=idx, column='id_class', code='not_found')
+                missing_classes.add(str(class_value))
+                continue
+
+            # Processa campos opcionais
+            enrollment_date = row.get('enrollment_date')
+            if enrollment_date:
+                if isinstance(enrollment_date, str):
+                    try:
+                        enrollment_date = datetime.strptime(enrollment_date, '%Y-%m-%d').date()
+                    except ValueError:
+                        errors.add(f"Linha {idx}: Data de matrícula inválida (use YYYY-MM-DD)", row=idx, column='enrollment_date', code='invalid')
+                        continue
+            else:
+                enrollment_date = datetime.now().date()
+
+            # Normaliza o status (aceita PT ou EN)
+            student_status = normalize_student_status(row.get('status'))
+
+            # Acumula a linha validada; o lote é gravado de uma vez
+            pending_students.append((idx, {
+                'student_serial': student_serial,
+                'student_name': student_name,
+                'id_class': class_obj,
+                'enrollment_date': enrollment_date,
+                'status': student_status
+            }))
+            if len(pending_students) >= STUDENT_IMPORT_BATCH_SIZE:
+                flush_students()
+
+        except Exception as e:
+            errors.add(f"Linha {idx}: {str(e)}", row=idx, code='error')
+            continue
+
+    flush_students()
+
+    if total_rows == 0:
+        raise ImportFileError('Arquivo vazio')
+
+    response_data = {
+        'success': True,
+        'message': f'{len(students_created)} alunos criados, {len(students_updated)} alunos atualizados',
+        'created': len(students_created),
+        'updated': len(students_updated),
+        **errors.response_fields('students', save=not dry_run)
+    }
+    if dry_run:
+        response_data['dry_run'] = True
+        response_data['message'] = (
+            f'Validação concluída: {len(students_created)} alunos seriam criados, '
+            f'{len(students_updated)} alunos seriam atualizados'
+        )
+
+    # Adiciona informações extras quando houver erros: lista as turmas
+    # disponíveis (filtradas por escola se fornecido)
+    if missing_classes:
+        response_data['missing_classes'] = list(missing_classes)
+        response_data['available_classes'] = class_resolver.available_classes()
+        school_filter_msg = f" na escola selecionada" if school_id else ""
+        response_data['suggestion'] = f'Algumas turmas não foram encontradas{school_filter_msg}. Verifique se as turmas existem no sistema antes de importar os alunos.'
+
+    return response_data
+
+
+# ============================================
+# IMPORTAÇÃO DE GABARITOS
+# ============================================
+
+def run_answer_key_import(file, sheet=None, progress=None, dry_run=False):
+    """
+    Importa o gabarito das provas e retorna o corpo da resposta do endpoint.
+
+    Cada prova é gravada em uma transação própria. progress(linhas_processadas,
+    erros), se informado, é chamado após cada prova gravada. Com dry_run=True
+    o arquivo é apenas validado (nada é gravado).
+    """
+    progress = progress or _no_progress
+
+    # Lê o arquivo em streaming (uma linha por vez)
+    rows = iter_import_rows(file, sheet=sheet)
+
+    # Agrupa questões por código de prova
+    exams_data = {}
+    question_rows = {}  # (código da prova, número da questão) -> primeira linha
+    errors = ImportErrorLog()
+    descriptor_codes = set()
+
+    total_rows = 0
+    for idx, row in enumerate(rows, start=2):
+        total_rows += 1
+        try:
+            codigo_prova = str(row.get('codigo_prova', '')).strip()
+            nome_prova = str(row.get('nome_prova', '')).strip()
+            disciplina = str(row.get('disciplina', '')).strip()
+            ano_escolar = row.get('ano_escolar')
+            numero_questao = row.get('numero_questao')
+            resposta_correta = str(row.get('resposta_correta', '')).strip().upper()
+            codigo_descritor = str(row.get('codigo_descritor', '')).strip()
+            pontos = row.get('pontos', 1.0)
+            dificuldade = str(row.get('dificuldade', 'medium')).strip().lower()
+            enunciado = str(row.get('enunciado', '')).strip()
+
+            # Validações
+            if not codigo_prova:
+                errors.add(f"Linha {idx}: codigo_prova obrigatório", row=idx, column='codigo_prova', code='required')
+                continue
+            if not nome_prova:
+                errors.add(f"Linha {idx}: nome_prova obrigatório", row=idx, column='nome_prova', code='required')
+                continue
+            if not numero_questao:
+                errors.add(f"Linha {idx}: numero_questao obrigatório", row=idx, column='numero_questao', code='required')
+                continue
+            if not resposta_correta or resposta_correta not in ['A', 'B', 'C', 'D', 'E']:
+                errors.add(f"Linha {idx}: resposta_correta deve ser A, B, C, D ou E", row=idx, column='resposta_correta', code='invalid')
+                continue
+
+            # Converte tipos
+            try:
+                numero_questao = int(numero_questao)
+                pontos = Decimal(str(pontos))
+                if ano_escolar:
+                    ano_escolar = str(ano_escolar).strip()
+            except (ValueError, TypeError) as e:
+                errors.add(f"Linha {idx}: Erro de conversão - {str(e)}", row=idx, code='invalid')
+                continue
+
+            # Questão repetida na mesma prova: vale a primeira linha
+            first_row = question_rows.setdefault((codigo_prova, numero_questao), idx)
+            if first_row != idx:
+                errors.add(
+                    f"Linha {idx}: questão {numero_questao} da prova {codigo_prova} repetida (já informada na linha {first_row})",
+                    row=idx, column='numero_questao', code='duplicate'
+                )
+                continue
+
+            # Descritores são resolvidos todos juntos depois da leitura
+            if codigo_descritor:
+                descriptor_codes.add(codigo_descritor)
+
+            # Agrupa por prova
+            if codigo_prova not in exams_data:
+                exams_data[codigo_prova] = {
+                    'nome_prova': nome_prova,
+                    'disciplina': disciplina,
+                    'ano_escolar': ano_escolar,
+                    'questions': []
+                }
+
+            exams_data[codigo_prova]['questions'].append({
+                'numero_questao': numero_questao,
+                'resposta_correta': resposta_correta,
+                'codigo_descritor': codigo_descritor,
+                'pontos': pontos,
+                'dificuldade': dificuldade,
+                'enunciado': enunciado
+            })
+
+        except Exception as e:
+            errors.add(f"Linha {idx}: {str(e)}", row=idx, code='error')
+            continue
+
+    if total_rows == 0:
+        raise ImportFileError('Arquivo vazio')
+
+    # Valida todos os descritores do arquivo de uma vez
+    descriptors = {}
+    for chunk in _chunked(descriptor_codes):
+        descriptors.update(
+            (descriptor.descriptor_code, descriptor)
+            for descriptor in TbDescriptorsCatalog.objects.filter(descriptor_code__in=chunk)
+        )
+    descriptors_not_found = descriptor_codes - set(descriptors)
+
+    if dry_run:
+        return _answer_key_report(exams_data, errors, descriptors_not_found)
+
+    # Linhas recusadas na validação já estão concluídas
+    processed_rows = total_rows - sum(len(data['questions']) for data in exams_data.values())
+    progress(processed_rows, len(errors))
+
+    # Cria provas e questões
+    created_exams = []
+    for codigo_prova, exam_data in exams_data.items():
+        with transaction.atomic():
+            created = _save_exam_answer_key(codigo_prova, exam_data, descriptors)
+
+        created_exams.append({
+            'codigo': codigo_prova,
+            'nome': exam_data['nome_prova'],
+            'questoes': len(exam_data['questions']),
+            'criada': created
+        })
+        processed_rows += len(exam_data['questions'])
+        progress(processed_rows, len(errors))
+
+    response_data = {
+        'success': True,
+        'message': f'{len(created_exams)} prova(s) importada(s)',
+        'exams': created_exams,
+        **errors.response_fields('answer_key')
+    }
+
+    if descriptors_not_found:
+        response_data['warning'] = 'Alguns descritores não foram encontrados'
+        response_data['descriptors_not_found'] = list(descriptors_not_found)
+
+    return response_data
+
+
+def _answer_key_report(exams_data, errors, descriptors_not_found):
+    """Resultado da validação (dry_run) do gabarito, sem gravar nada"""
+    existing_codes = set()
+    for chunk in _chunked(exams_data):
+        existing_codes.update(
+            TbExams.objects.filter(exam_code__in=chunk).values_list('exam_code', flat=True)
+        )
+
+    exams = [
+        {
+            'codigo': codigo_prova,
+            'nome': exam_data['nome_prova'],
+            'questoes': len(exam_data['questions']),
+            'criada': codigo_prova not in existing_codes
+        }
+        for codigo_prova, exam_data in exams_data.items()
+    ]
+
+    response_data = {
+        'success': True,
+        'dry_run': True,
+        'message': f'Validação concluída: {len(exams)} prova(s) seriam importada(s)',
+        'exams': exams,
+        **errors.response_fields('answer_key', save=False)
+    }
+
+    if descriptors_not_found:
+        response_data['warning'] = 'Alguns descritores não foram encontrados'
+        response_data['descriptors_not_found'] = list(descriptors_not_found)
+
+    return response_data
+
+
+def _save_exam_answer_key(codigo_prova, exam_data, descriptors):
+    """
+    Cria ou atualiza a prova com suas questões e alternativas.
+
+    Numa prova que já existe, as questões são atualizadas no lugar pelo
+    número (as respostas gravadas continuam ligadas a elas; as notas são
+    refeitas pela recorreção, api.regrading). Questões que saíram do arquivo
+    são removidas com DELETEs por conjunto, exceto as que já têm respostas.
+    As novas entram com bulk_create (o INSERT devolve os ids das questões,
+    usados para criar as alternativas).
+    """
+    # Verifica se prova já existe
+    exam, created = TbExams.objects.get_or_create(
+        exam_code=codigo_prova,
+        defaults={
+            'exam_name': exam_data['nome_prova'],
+            'subject': exam_data['disciplina'],
+            'school_year': exam_data['ano_escolar'],
+            'total_questions': len(exam_data['questions'])
+        }
+    )
+
+    existing = {}
+    if not created:
+        # Atualiza informações da prova se já existe
+        exam.exam_name = exam_data['nome_prova']
+        exam.subject = exam_data['disciplina']
+        exam.school_year = exam_data['ano_escolar']
+        exam.total_questions = len(exam_data['questions'])
+        exam.save()
+
+        for question in TbQuestions.objects.filter(id_exam=exam).order_by('-id'):
+            existing[question.question_number] = question
+
+    new_questions = []
+    updated_questions = []
+    for q_data in exam_data['questions']:
+        question = existing.pop(q_data['numero_questao'], None)
+        if question is None:
+            question = TbQuestions(
+                id_exam=exam,
+                question_number=q_data['numero_questao'],
+                question_type='multiple_choice'
+            )
+            new_questions.append((question, q_data))
+        else:
+            updated_questions.append((question, q_data))
+
+        question.question_text = q_data['enunciado'] or f"Questão {q_data['numero_questao']}"
+        question.correct_answer = q_data['resposta_correta']
+        question.difficulty_level = q_data['dificuldade']
+        question.points = q_data['pontos']
+        question.id_descriptor = descriptors.get(q_data['codigo_descritor'])
+
+    if not created:
+        # Remove alternativas e questões que saíram do gabarito
+        _delete_exam_questions(exam, keep=[question.id for question, _ in updated_questions])
+
+    if updated_questions:
+        _update_exam_questions(updated_questions)
+
+    # Cria questões
+    questions = TbQuestions.objects.bulk_create(
+        [question for question, _ in new_questions],
+        batch_size=IMPORT_INSERT_BATCH_SIZE
+    )
+
+    # Cria alternativas genéricas (A, B, C, D, E)
+    TbAlternatives.objects.bulk_create(
+        [
+            TbAlternatives(
+                id_question=question,
+                alternative_order=i,
+                alternative_text=f"Alternativa {letter}",
+                is_correct=(letter == q_data['resposta_correta'])
+            )
+            for question, (_, q_data) in zip(questions, new_questions)
+            for i, letter in enumerate(['A', 'B', 'C', 'D', 'E'], start=1)
+        ],
+        batch_size=IMPORT_INSERT_BATCH_SIZE
+    )
+
+    # As escritas em lote não disparam sinais: o gabarito em cache sai aqui
+    invalidate_answer_key(exam.id)
+
+    return created
+
+
+def _update_exam_questions(updated_questions):
+    """
+    Atualiza questões existentes e a alternativa correta de cada uma.
+
+    As alternativas são mantidas (as respostas apontam para elas); só
+    is_correct muda, e as ordens que faltarem (A a E) são criadas.
+    """
+    TbQuestions.objects.bulk_update(
+        [question for question, _ in updated_questions],
+        ['question_text', 'correct_answer', 'difficulty_level', 'points', 'id_descriptor'],
+        batch_size=IMPORT_INSERT_BATCH_SIZE
+    )
+
+    correct_orders = {
+        question.id: 'ABCDE'.index(q_data['resposta_correta']) + 1
+        for question, q_data in updated_questions
+    }
+    alternatives = []
+    missing_orders = {question_id: set(range(1, 6)) for question_id in correct_orders}
+    for alternative in TbAlternatives.objects.filter(id_question__in=list(correct_orders)):
+        alternative.is_correct = alternative.alternative_order == correct_orders[alternative.id_question_id]
+        alternatives.append(alternative)
+        missing_orders[alternative.id_question_id].discard(alternative.alternative_order)
+
+    TbAlternatives.objects.bulk_update(alternatives, ['is_correct'], batch_size=IMPORT_INSERT_BATCH_SIZE)
+    TbAlternatives.objects.bulk_create(
+        [
+            TbAlternatives(
+                id_question_id=question_id,
+                alternative_order=order,
+                alternative_text=f"Alternativa {'ABCDE'[order - 1]}",
+                is_correct=(order == correct_orders[question_id])
+            )
+            for question_id, orders in missing_orders.items()
+            for order in sorted(orders)
+        ],
+        batch_size=IMPORT_INSERT_BATCH_SIZE
+    )
+
+
+def _delete_exam_questions(exam, keep=()):
+    """
+    Remove as questões da prova com um DELETE por tabela.
+
+    O delete() do ORM buscaria os ids das questões e emularia o CASCADE
+    (alternativas e vínculos com competências) com listas de ids; aqui cada
+    tabela é limpa com uma subconsulta pela prova. Ficam as questões em keep
+    e as que já têm respostas de alunos.
+    """
+    questions = """
+        SELECT q.id FROM tb_questions q
+        WHERE q.id_exam = %s
+          AND NOT (q.id = ANY(%s))
+          AND NOT EXISTS (SELECT 1 FROM tb_student_answers sa WHERE sa.id_question = q.id)
+    """
+    params = [exam.id, list(keep)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM tb_alternatives WHERE id_question IN ({questions})', params)
+        cursor.execute(f'DELETE FROM tb_question_competency WHERE id_question IN ({questions})', params)
+        cursor.execute(f'DELETE FROM tb_questions WHERE id IN ({questions})', params)
+
+
+# ============================================
+# IMPORTAÇÃO DE RESPOSTAS DOS ALUNOS
+# ============================================
+
+RESULT_UPSERT_FIELDS = [
+    'total_score', 'max_score', 'correct_answers', 'wrong_answers', 'blank_answers'
+]
+
+
+class AnswerImportIndex:
+    """
+    Índice em memória usado pelo import_student_answers.
+
+    Resolve provas (por código), turmas (por ID) e alunos (por matrícula e
+    turma) de todo o arquivo com consultas IN, em blocos de
+    IMPORT_LOOKUP_CHUNK_SIZE valores, em vez de três consultas por linha.
+    load_answer_keys traz os gabaritos compilados das provas envolvidas.
+    """
+
+    def __init__(self, exam_codes, class_ids, serials):
+        self.exams = {}
+        for chunk in _chunked(exam_codes):
+            self.exams.update(
+                (exam.exam_code, exam)
+                for exam in TbExams.objects.filter(exam_code__in=chunk)
+            )
+
+        self.classes = {}
+        for chunk in _chunked(class_ids):
+            self.classes.update(TbClass.objects.in_bulk(chunk))
+
+        # A matrícula é única; a turma entra na chave para manter a regra de
+        # que o aluno precisa pertencer à turma informada
+        self.students = {}
+        for chunk in _chunked(serials):
+            self.students.update(
+                ((student.student_serial, student.id_class_id), student)
+                for student in TbStudents.objects.filter(student_serial__in=chunk)
+            )
+
+        self.answer_keys = {}   # id da prova -> gabarito compilado (AnswerKey)
+
+    def load_answer_keys(self, exams):
+        """Gabaritos compilados das provas, vindos do cache (api.answer_keys)"""
+        self.answer_keys.update(get_answer_keys(
+            [exam.id for exam in exams if exam.id not in self.answer_keys]
+        ))
+
+    def answer_key(self, exam_id):
+        return self.answer_keys[exam_id]
+
+    def exam_slice(self, exam):
+        """Cópia só com o gabarito da prova (enviada aos workers)"""
+        part = AnswerImportIndex((), (), ())
+        part.answer_keys[exam.id] = self.answer_keys[exam.id]
+        return part
+
+
+def run_student_answers_import(file, sheet=None, progress=None, copy=False, dry_run=False, workers=None):
+    """
+    Importa as respostas dos alunos e retorna o corpo da resposta do endpoint.
+
+    Cada aplicação (prova + turma) é gravada em uma transação própria; uma
+    aplicação que falhar é desfeita e registrada em "errors" sem descartar as
+    demais. progress(linhas_processadas, erros), se informado, é chamado após
+    cada aplicação gravada. Com copy=True o arquivo segue pelo pipeline de
+    alto volume (COPY para tabela temporária, ver api.copy_import). Com
+    dry_run=True o arquivo é apenas validado (nada é gravado).
+
+    Cada aplicação gravada registra um checkpoint com o hash do arquivo, na
+    mesma transação; reenviar o mesmo arquivo pula essas aplicações e
+    retoma a importação de onde parou. Os checkpoints só valem para retomar
+    uma importação interrompida: quando todas as aplicações são gravadas eles
+    são apagados, e um novo envio do mesmo arquivo é processado inteiro (as
+    respostas podem ter sido excluídas ou corrigidas depois). Com workers=N
+    as aplicações são distribuídas entre N processos, cada um com sua conexão
+    ao banco.
+
+    O arquivo é lido duas vezes: a primeira leitura junta as chaves das
+    buscas em lote e a última linha de cada aplicação; a segunda entrega cada
+    aplicação para gravação assim que ela termina. A memória acompanha as
+    aplicações abertas, não o tamanho do arquivo.
+    """
+    if copy and not dry_run:
+        from .copy_import import run_student_answers_copy_import
+        return run_student_answers_copy_import(file, sheet=sheet, progress=progress)
+
+    progress = progress or _no_progress
+
+    # Aplicações já gravadas em um envio anterior do mesmo arquivo
+    file_hash = file_fingerprint(file, sheet)
+    completed_chunks = set(
+        TbImportCheckpoint.objects.filter(file_hash=file_hash, import_type='student_answers')
+        .values_list('chunk_key', flat=True)
+    )
+
+    # Primeira passada (streaming): guarda só os valores usados nas buscas em
+    # lote e a última linha de cada aplicação (prova + turma); as linhas em
+    # si não ficam em memória
+    exam_codes, class_ids, serials = set(), set(), set()
+    last_rows = {}  # (codigo_prova, id_turma) -> última linha da aplicação
+
+    total_rows = 0
+    for idx, row in enumerate(iter_import_rows(file, sheet=sheet), start=2):
+        total_rows += 1
+        values, _ = _parse_answer_row(idx, row)
+        if values:
+            codigo_prova, id_turma, matricula_aluno, _ = values
+            exam_codes.add(codigo_prova)
+            class_ids.add(id_turma)
+            serials.add(matricula_aluno)
+            last_rows[(codigo_prova, id_turma)] = idx
+
+    if total_rows == 0:
+        raise ImportFileError('Arquivo vazio')
+
+    # Provas, turmas e alunos de todo o arquivo em poucas consultas IN, e os
+    # gabaritos das provas envolvidas (do cache; só os ausentes vão ao banco)
+    index = AnswerImportIndex(exam_codes, class_ids, serials)
+    index.load_answer_keys({index.exams[code] for code in exam_codes if code in index.exams})
+
+    # Segunda passada: lê o arquivo de novo e entrega cada aplicação assim
+    # que a sua última linha é lida
+    reader = AnswerApplicationReader(index, last_rows, completed_chunks)
+    applications = reader.applications(iter_import_rows(file, sheet=sheet))
+
+    if dry_run:
+        outcomes = _iter_application_reports(applications, index, last_rows)
+    else:
+        # Em paralelo com workers > 1; o resultado é montado na ordem do
+        # arquivo, qualquer que seja a ordem de conclusão
+        outcomes = _iter_application_imports(applications, index, file_hash, workers, len(last_rows))
+
+    results = {}
+    finished_rows = pending_errors = 0
+    for app_key, outcome in outcomes:
+        results[app_key] = outcome
+        pending_errors += len(outcome[3])
+        finished_rows += reader.applications_read[app_key]['rows']
+        progress(reader.finished_rows + finished_rows, len(reader.errors) + pending_errors)
+
+    errors = reader.errors
+    processed_students = 0
+    created_applications = []
+
+    for app_key, app_info in reader.applications_read.items():
+        _, created, students_count, app_errors = results[app_key]
+        if created:
+            created_applications.append({
+                'exam': app_info['exam'].exam_name,
+                'class': app_info['class'].class_name
+            })
+        processed_students += students_count
+        errors.extend(app_errors)
+
+    if dry_run:
+        response_data = {
+            'success': True,
+            'dry_run': True,
+            'message': f'Validação concluída: respostas de {processed_students} aluno(s) seriam importadas',
+        }
+    else:
+        # Importação concluída: os checkpoints serviam só para retomá-la
+        if all(outcome[0] for outcome in results.values()):
+            TbImportCheckpoint.objects.filter(file_hash=file_hash, import_type='student_answers').delete()
+
+        # Respostas novas descartam a análise de itens em cache das provas
+        invalidate_answer_data(app_info['exam'].id for app_info in reader.applications_read.values())
+
+        response_data = {
+            'success': True,
+            'message': f'Respostas de {processed_students} aluno(s) importadas com sucesso',
+        }
+
+    response_data.update({
+        'processed_students': processed_students,
+        'created_applications': created_applications,
+        **errors.response_fields('student_answers', save=not dry_run)
+    })
+
+    if reader.students_not_found:
+        response_data['students_not_found'] = list(reader.students_not_found)
+
+    if reader.exams_not_found:
+        response_data['exams_not_found'] = list(reader.exams_not_found)
+
+    if reader.resumed_applications:
+        response_data['resumed_applications'] = reader.resumed_applications
+
+    return response_data
+
+
+def _parse_answer_row(idx, row):
+    """
+    Validação básica de uma linha do arquivo de respostas.
+
+    Retorna ((codigo_prova, id_turma, matricula_aluno, células de resposta),
+    None) ou (None, (mensagem, coluna, código do erro)).
+    """
+    try:
+        codigo_prova = str(row.get('codigo_prova', '')).strip()
+        id_turma = row.get('id_turma')
+        matricula_aluno = row.get('matricula_aluno')
+
+        # Validações básicas
+        if not codigo_prova:
+            return None, (f"Linha {idx}: codigo_prova obrigatório", 'codigo_prova', 'required')
+        if not id_turma:
+            return None, (f"Linha {idx}: id_turma obrigatório", 'id_turma', 'required')
+        if not matricula_aluno:
+            return None, (f"Linha {idx}: matricula_aluno obrigatório", 'matricula_aluno', 'required')
+
+        # Converte tipos
+        try:
+            id_turma = int(id_turma)
+            matricula_aluno = int(matricula_aluno)
+        except (ValueError, TypeError):
+            return None, (f"Linha {idx}: id_turma e matricula_aluno devem ser números", None, 'invalid')
+
+        # Células de respostas (q1, q2, q3...)
+        answer_cells = [
+            (key, value) for key, value in row.items()
+            if key.startswith('q') and key[1:].isdigit()
+        ]
+        return (codigo_prova, id_turma, matricula_aluno, answer_cells), None
+
+    except Exception as e:
+        return None, (f"Linha {idx}: {str(e)}", None, 'error')
+
+
+class AnswerApplicationReader:
+    """
+    Segunda passada do import_student_answers.
+
+    Resolve as linhas pelo AnswerImportIndex e entrega cada aplicação (prova
+    + turma) assim que a sua última linha, conhecida da primeira passada, é
+    lida. Só ficam em memória as aplicações com linhas ainda por vir: num
+    arquivo agrupado por turma, uma de cada vez. Erros das linhas, alunos e
+    provas não encontrados e aplicações retomadas ficam registrados no leitor.
+    """
+
+    def __init__(self, index, last_rows, completed_chunks):
+        self.index = index
+        self.closing_rows = {idx: app_key for app_key, idx in last_rows.items()}
+        self.completed_chunks = completed_chunks
+
+        self.errors = ImportErrorLog()
+        self.students_not_found = set()
+        self.exams_not_found = set()
+        self.resumed_applications = []
+        self.applications_read = {}  # chave -> prova, turma e linhas, na ordem de entrega
+        self.finished_rows = 0       # linhas recusadas ou de aplicações retomadas
+
+    def applications(self, rows):
+        """Gera (chave da aplicação, dados da aplicação) ao fim de cada aplicação"""
+        open_applications = {}
+        for idx, row in enumerate(rows, start=2):
+            entry = self._resolve_row(idx, row)
+            if entry is None:
+                self.finished_rows += 1
+            else:
+                app_key, exam, class_obj, student_data = entry
+                if app_key not in open_applications:
+                    open_applications[app_key] = {
+                        'exam': exam,
+                        'class': class_obj,
+                        'students_answers': []
+                    }
+                open_applications[app_key]['students_answers'].append(student_data)
+
+            app_key = self.closing_rows.get(idx)
+            app_data = open_applications.pop(app_key, None)
+            if app_data is None:
+                continue
+
+            # Retomada: aplicações confirmadas no envio anterior não são reprocessadas
+            if _answers_chunk_key(*app_key) in self.completed_chunks:
+                self.resumed_applications.append({
+                    'exam': app_data['exam'].exam_name,
+                    'class': app_data['class'].class_name,
+                    'students': len(app_data['students_answers'])
+                })
+                self.finished_rows += len(app_data['students_answers'])
+                continue
+
+            self.applications_read[app_key] = {
+                'exam': app_data['exam'],
+                'class': app_data['class'],
+                'rows': len(app_data['students_answers'])
+            }
+            yield app_key, app_data
+
+    def _resolve_row(self, idx, row):
+        """
+        Valida a linha e resolve prova, turma e aluno; retorna (chave da
+        aplicação, prova, turma, dados do aluno) ou None se a linha foi recusada.
+        """
+        values, error = _parse_answer_row(idx, row)
+        if error:
+            message, column, code = error
+            self.errors.add(message, row=idx, column=column, code=code)
+            return None
+
+        codigo_prova, id_turma, matricula_aluno, answer_cells = values
+        errors = self.errors
+
+        # Busca prova
+        exam = self.index.exams.get(codigo_prova)
+        if exam is None:
+            self.exams_not_found.add(codigo_prova)
+            errors.add(f"Linha {idx}: Prova '{codigo_prova}' não encontrada", row=idx, column='codigo_prova', code='not_found')
+            return None
+
+        # Busca turma
+        class_obj = self.index.classes.get(id_turma)
+        if class_obj is None:
+            errors.add(f"Linha {idx}: Turma ID {id_turma} não encontrada", row=idx, column='id_turma', code='not_found')
+            return None
+
+        # Busca aluno
+        student = self.index.students.get((matricula_aluno, id_turma))
+        if student is None:
+            self.students_not_found.add(matricula_aluno)
+            errors.add(
+                f"Linha {idx}: Aluno matrícula {matricula_aluno} não encontrado na turma",
+                row=idx, column='matricula_aluno', code='not_found'
+            )
+            return None
+
+        # Extrai respostas (q1, q2, q3...)
+        answers = {}
+        for key, value in answer_cells:
+            question_number = int(key[1:])
+            answer_value = str(value).strip().upper() if value else ''
+            if answer_value and answer_value not in ['A', 'B', 'C', 'D', 'E']:
+                errors.add(f"Linha {idx}, {key}: Resposta deve ser A, B, C, D, E ou vazio", row=idx, column=key, code='invalid')
+                continue
+            answers[question_number] = answer_value
+
+        if not answers:
+            errors.add(f"Linha {idx}: Nenhuma resposta encontrada (colunas q1, q2, q3...)", row=idx, code='required')
+            return None
+
+        student_data = {
+            'row': idx,
+            'student': student,
+            'answers': answers
+        }
+        return (codigo_prova, id_turma), exam, class_obj, student_data
+
+
+def _iter_application_imports(applications, index, file_hash, workers=None, application_count=None):
+    """
+    Grava as aplicações e gera (chave da aplicação, resultado) conforme cada
+    uma termina.
+
+    Com workers > 1 as aplicações vão para um ProcessPoolExecutor, no máximo
+    duas por worker em espera, para que as linhas das demais ainda não
+    tenham sido lidas. A conexão do processo principal é fechada antes de
+    criar os processos, para que nenhum deles herde o socket aberto; cada
+    worker abre a sua. Dentro de uma transação externa a importação continua
+    serial.
+    """
+    workers = min(int(workers or 1), IMPORT_MAX_WORKERS, application_count or 1)
+    if workers <= 1 or connection.in_atomic_block:
+        for app_key, app_data in applications:
+            yield app_key, _import_application(app_key, app_data, index, file_hash)
+        return
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        futures = {}
+        for app_key, app_data in applications:
+            future = executor.submit(
+                _import_application, app_key, app_data, index.exam_slice(app_data['exam']), file_hash
+            )
+            futures[future] = app_key
+            if len(futures) >= workers * 2:
+                yield from _completed_imports(futures, FIRST_COMPLETED)
+        yield from _completed_imports(futures, ALL_COMPLETED)
+
+
+def _completed_imports(futures, return_when):
+    """Aguarda as aplicações em andamento e gera as concluídas"""
+    done, _ = wait(futures, return_when=return_when)
+    for future in done:
+        app_key = futures.pop(future)
+        try:
+            outcome = future.result()
+        except Exception as e:
+            # Worker encerrado no meio da aplicação: o checkpoint indica,
+            # no reenvio, se ela chegou a ser gravada
+            outcome = (False, False, 0, _application_error(app_key, e))
+        yield app_key, outcome
+
+
+def _import_application(app_key, app_data, index, file_hash):
+    """
+    Grava uma aplicação em transação própria, junto com o seu checkpoint.
+
+    Retorna (aplicação gravada, aplicação criada, alunos processados, erros);
+    uma falha desfaz a aplicação inteira e é devolvida como erro.
+    """
+    codigo_prova, id_turma = app_key
+    try:
+        with transaction.atomic():
+            application, created, students_count, app_errors = _save_application_answers(app_data, index)
+            TbImportCheckpoint.objects.create(
+                file_hash=file_hash,
+                import_type='student_answers',
+                chunk_key=_answers_chunk_key(codigo_prova, id_turma),
+                rows=len(app_data['students_answers'])
+            )
+    except Exception as e:
+        return False, False, 0, _application_error(app_key, e)
+    return True, created, students_count, app_errors
+
+
+def _application_error(app_key, error):
+    """Erro de uma aplicação que não pôde ser gravada (desfeita inteira)"""
+    errors = ImportErrorLog()
+    errors.add(f"Prova '{app_key[0]}', turma ID {app_key[1]}: {str(error)}", code='database')
+    return errors
+
+
+def _answers_chunk_key(codigo_prova, id_turma):
+    """Identificador da aplicação (prova + turma) nos checkpoints"""
+    return f"{codigo_prova}:{id_turma}"
+
+
+def _save_application_answers(app_data, index):
+    """
+    Grava as respostas de uma aplicação (prova + turma).
+
+    Uma consulta identifica os alunos que já têm respostas na aplicação; as
+    respostas novas são inseridas com bulk_create em blocos e resultados,
+    descritores e progresso de aprendizagem são gravados com INSERT ... ON
+    CONFLICT. Retorna (aplicação, criada, alunos processados, erros).
+    """
+    exam = app_data['exam']
+    class_obj = app_data['class']
+
+    # Cria ou busca aplicação
+    application, created = TbExamApplications.objects.get_or_create(
+        id_exam=exam,
+        id_class=class_obj,
+        defaults={
+            # id_teacher é obrigatório: usa o professor responsável pela turma
+            'id_teacher_id': class_obj.id_teacher_id,
+            'application_date': datetime.now().date(),
+            'status': 'completed',
+            'fiscal_year': datetime.now().year
+        }
+    )
+
+    # Alunos que já fizeram a prova nesta aplicação
+    answered = set(
+        TbStudentAnswers.objects.filter(id_exam_application=application)
+        .values_list('id_student_id', flat=True)
+        .distinct()
+    )
+
+    graded, errors = _grade_application_answers(app_data, index, application, answered)
+
+    TbStudentAnswers.objects.bulk_create(graded.answers(), batch_size=IMPORT_INSERT_BATCH_SIZE)
+
+    # Grava resultados e descritores de todos os alunos da aplicação
+    save_results_and_descriptors(graded)
+
+    # Progresso de aprendizagem por descritor, derivado das respostas gravadas
+    if len(graded):
+        upsert_learning_progress(application_ids=[application.id])
+
+    return application, created, len(graded), errors
+
+
+class GradedApplication:
+    """Alunos de uma aplicação e a correção vetorizada das suas respostas"""
+
+    def __init__(self, application, students, result):
+        self.application = application
+        self.students = students
+        self.result = result  # api.grading.GradeResult, uma linha por aluno
+
+    def __len__(self):
+        return len(self.students)
+
+    def answers(self):
+        """Uma TbStudentAnswers por célula de resposta corrigida"""
+        result = self.result
+        questions = result.key.questions
+        selected = result.selected_alternative.tolist()
+        correct = result.correct.tolist()
+        rows, columns = np.nonzero(result.present)
+        return [
+            TbStudentAnswers(
+                id_student=self.students[row],
+                id_exam_application=self.application,
+                id_question=questions[column],
+                id_selected_alternative_id=selected[row][column] or None,
+                answer_text=result.answer_letter(row, column),
+                is_correct=correct[row][column]
+            )
+            for row, column in zip(rows.tolist(), columns.tolist())
+        ]
+
+
+def _grade_application_answers(app_data, index, application, answered):
+    """
+    Corrige as respostas dos alunos de uma aplicação.
+
+    As folhas viram uma matriz alunos × questões corrigida de uma vez pelo
+    gabarito compilado (api.grading). answered traz os alunos que já têm
+    respostas na aplicação e é atualizado com os alunos corrigidos. Retorna
+    (GradedApplication, erros); application pode ser None na validação
+    (dry_run) de aplicação nova.
+    """
+    key = index.answer_key(app_data['exam'].id)
+    sheets = app_data['students_answers']
+    responses = key.encode_letters([student_data['answers'] for student_data in sheets])
+    has_answers = (responses != NOT_ANSWERED).any(axis=1)
+
+    errors = ImportErrorLog()
+    rows = []
+    for row, student_data in enumerate(sheets):
+        student = student_data['student']
+
+        # Verifica se aluno já fez a prova (inclusive em linha anterior do arquivo)
+        if student.id_student in answered:
+            errors.add(
+                f"Aluno {student.student_name} (mat: {student.student_serial}) "
+                f"já tem respostas para esta prova",
+                row=student_data['row'], column='matricula_aluno', code='duplicate'
+            )
+            continue
+
+        # Alunos sem nenhuma questão da prova no arquivo ficam de fora
+        if has_answers[row]:
+            answered.add(student.id_student)
+            rows.append(row)
+
+    students = [sheets[row]['student'] for row in rows]
+    return GradedApplication(application, students, key.grade(responses[rows])), errors
+
+
+def _iter_application_reports(applications, index, last_rows):
+    """
+    Valida as aplicações (dry_run) sem gravar nada e gera (chave da
+    aplicação, resultado) no formato de _import_application.
+
+    Aplicações existentes e alunos que já têm respostas são consultados uma
+    única vez para o arquivo inteiro; a correção usa a mesma rotina da
+    importação.
+    """
+    exam_ids = {index.exams[code].id for code, _ in last_rows if code in index.exams}
+    class_ids = {class_id for _, class_id in last_rows if class_id in index.classes}
+
+    existing = {}
+    for application in TbExamApplications.objects.filter(
+        id_exam_id__in=exam_ids, id_class_id__in=class_ids
+    ).order_by('-id'):
+        existing[(application.id_exam_id, application.id_class_id)] = application
+
+    answered = {}
+    for application_id, student_id in TbStudentAnswers.objects.filter(
+        id_exam_application__in=[application.id for application in existing.values()]
+    ).values_list('id_exam_application_id', 'id_student_id').distinct():
+        answered.setdefault(application_id, set()).add(student_id)
+
+    for app_key, app_data in applications:
+        application = existing.get((app_data['exam'].id, app_data['class'].id))
+        app_answered = set(answered.get(application.id, ())) if application else set()
+        graded, app_errors = _grade_application_answers(app_data, index, application, app_answered)
+        yield app_key, (True, application is None, len(graded), app_errors)
+
+
+def save_results_and_descriptors(graded):
+    """
+    Grava resultado e descritores conquistados dos alunos de uma aplicação.
+
+    graded é a GradedApplication com as somas já calculadas pelo motor de
+    correção; as respostas já devem estar gravadas. Os resultados são
+    gravados com um INSERT ... ON CONFLICT (id_student, id_exam_application)
+    DO UPDATE e os descritores da aplicação inteira com um INSERT ... SELECT
+    DISTINCT sobre os acertos (api.scoring.insert_achievements), mantendo a
+    aplicação em que o descritor foi conquistado pela primeira vez.
+    """
+    application = graded.application
+    result = graded.result
+
+    results = [
+        TbExamResults(
+            id_student=student,
+            id_exam_application=application,
+            total_score=result.total_score(row),
+            max_score=result.max_score(row),
+            correct_answers=int(result.correct_count[row]),
+            wrong_answers=int(result.wrong_count[row]),
+            blank_answers=int(result.blank_count[row])
+        )
+        for row, student in enumerate(graded.students)
+    ]
+
+    TbExamResults.objects.bulk_create(
+        results,
+        batch_size=IMPORT_INSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['id_student', 'id_exam_application'],
+        update_fields=RESULT_UPSERT_FIELDS,
+    )
+
+    if graded.students:
+        insert_achievements(application_ids=[application.id])
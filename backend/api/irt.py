@@ -0,0 +1,318 @@
+"""
+Proficiência pela Teoria de Resposta ao Item (TRI), vetorizada com NumPy.
+
+A calibração dos itens (modelos logísticos de 2 ou 3 parâmetros) usa máxima
+verossimilhança marginal pelo algoritmo EM de Bock-Aitkin: a proficiência é
+integrada numa grade fixa de pontos de quadratura com priori normal padrão,
+de modo que cada iteração é feita com produtos de matrizes sobre a matriz de
+respostas inteira (linhas (aluno, aplicação) × questões), sem laço por aluno.
+O passo M atualiza todos os itens juntos por scoring de Fisher.
+
+Com os itens calibrados, a proficiência de cada linha é a média a posteriori
+(EAP) na mesma grade, com o desvio padrão a posteriori como erro padrão.
+Questões não respondidas ficam fora da verossimilhança; em branco conta como
+erro, como na correção.
+
+estimate_exam_proficiency grava os parâmetros em tb_questions e a
+proficiência (theta, erro padrão e nota na escala) ao lado do resultado em
+tb_exam_results.
+"""
+import math
+
+import numpy as np
+from django.db import connection, transaction
+
+from .answer_keys import get_answer_key
+from .grading import NOT_ANSWERED
+from .item_analysis import load_responses
+
+
+IRT_MODELS = ('2pl', '3pl')
+
+# Grade de quadratura da proficiência (priori normal padrão)
+QUADRATURE_POINTS = 41
+QUADRATURE_RANGE = 4.0
+
+# Critérios de parada do EM e passos de scoring de Fisher por iteração
+EM_MAX_ITERATIONS = 200
+EM_TOLERANCE = 1e-4
+M_STEP_ITERATIONS = 3
+
+# Limites dos parâmetros (itens sem variação não divergem)
+DISCRIMINATION_BOUNDS = (0.05, 5.0)
+INTERCEPT_BOUNDS = (-15.0, 15.0)
+GUESSING_BOUNDS = (1e-4, 0.5)
+
+# Priori Beta do acerto ao acaso no 3PL (média 0,2, cinco alternativas)
+GUESSING_PRIOR = (5.0, 17.0)
+
+# Escala das notas: média e desvio padrão da proficiência
+DEFAULT_SCALE_MEAN = 250.0
+DEFAULT_SCALE_SD = 50.0
+
+# Mínimo de linhas (aluno, aplicação) e de questões respondidas para calibrar
+IRT_MIN_STUDENTS = 30
+IRT_MIN_QUESTIONS = 2
+
+# Linhas gravadas por instrução
+IRT_UPDATE_BATCH_SIZE = 10000
+
+
+class ProficiencyError(Exception):
+    """Prova sem respostas suficientes ou calibração que não convergiu"""
+
+
+def check_scale(scale_mean=DEFAULT_SCALE_MEAN, scale_sd=DEFAULT_SCALE_SD):
+    """Valida a escala das notas; levanta ValueError com a mensagem"""
+    if not (math.isfinite(scale_mean) and math.isfinite(scale_sd)):
+        raise ValueError('scale_mean e scale_sd devem ser números finitos')
+    if scale_sd <= 0:
+        raise ValueError('scale_sd deve ser maior que zero')
+
+
+def quadrature(points=QUADRATURE_POINTS, limit=QUADRATURE_RANGE):
+    """Pontos da grade e pesos da priori normal padrão"""
+    nodes = np.linspace(-limit, limit, points)
+    weights = np.exp(-0.5 * nodes ** 2)
+    return nodes, weights / weights.sum()
+
+
+def item_probabilities(nodes, discrimination, intercept, guessing):
+    """Probabilidade de acerto de cada item em cada ponto (itens × pontos)"""
+    logistic = 1.0 / (1.0 + np.exp(-(np.outer(discrimination, nodes) + intercept[:, None])))
+    return guessing[:, None] + (1.0 - guessing[:, None]) * logistic
+
+
+def _posterior(correct, wrong, probabilities, log_prior):
+    """
+    Posteriori de cada linha nos pontos de quadratura (linhas × pontos).
+
+    correct e wrong são matrizes 0/1 (linhas × itens); itens não respondidos
+    têm zero nas duas e não entram na verossimilhança.
+    """
+    probabilities = probabilities.clip(1e-10, 1 - 1e-10)
+    log_likelihood = correct @ np.log(probabilities) + wrong @ np.log1p(-probabilities)
+    log_likelihood += log_prior
+    log_likelihood -= log_likelihood.max(axis=1, keepdims=True)
+    posterior = np.exp(log_likelihood)
+    posterior /= posterior.sum(axis=1, keepdims=True)
+    return posterior
+
+
+def _initial_parameters(correct, present, model):
+    """Ponto de partida: discriminação 1 e intercepto pelo logit da dificuldade"""
+    answered = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = np.where(answered > 0, correct.sum(axis=0) / answered, 0.5)
+    difficulty = difficulty.clip(0.02, 0.98)
+
+    discrimination = np.ones(correct.shape[1])
+    intercept = np.log(difficulty / (1 - difficulty))
+    if model == '3pl':
+        alpha, beta = GUESSING_PRIOR
+        guessing = np.full(correct.shape[1], (alpha - 1) / (alpha + beta - 2))
+    else:
+        guessing = np.zeros(correct.shape[1])
+    return discrimination, intercept, guessing
+
+
+def _maximize_items(nodes, expected_correct, expected_total, discrimination, intercept, guessing, model):
+    """
+    Passo M: scoring de Fisher de todos os itens ao mesmo tempo.
+
+    expected_correct e expected_total são os acertos e respostas esperados de
+    cada item em cada ponto (itens × pontos). No 3PL o acerto ao acaso tem
+    priori Beta, que evita estimativas degeneradas.
+    """
+    parameters = 3 if model == '3pl' else 2
+
+    for _ in range(M_STEP_ITERATIONS):
+        logistic = 1.0 / (1.0 + np.exp(-(np.outer(discrimination, nodes) + intercept[:, None])))
+        probabilities = (guessing[:, None] + (1 - guessing[:, None]) * logistic).clip(1e-10, 1 - 1e-10)
+        slope = (1 - guessing[:, None]) * logistic * (1 - logistic)
+
+        derivatives = [slope * nodes, slope, 1 - logistic][:parameters]
+        derivatives = np.stack(derivatives, axis=-1)  # itens × pontos × parâmetros
+
+        weight = 1.0 / (probabilities * (1 - probabilities))
+        residual = (expected_correct - expected_total * probabilities) * weight
+        gradient = np.einsum('jq,jqk->jk', residual, derivatives)
+        information = np.einsum('jq,jqk,jql->jkl', expected_total * weight, derivatives, derivatives)
+
+        if model == '3pl':
+            alpha, beta = GUESSING_PRIOR
+            gradient[:, 2] += (alpha - 1) / guessing - (beta - 1) / (1 - guessing)
+            information[:, 2, 2] += (alpha - 1) / guessing ** 2 + (beta - 1) / (1 - guessing) ** 2
+
+        information += np.eye(parameters) * 1e-6
+        step = np.linalg.solve(information, gradient[..., None])[..., 0]
+        step = step.clip(-1.0, 1.0)
+
+        discrimination = (discrimination + step[:, 0]).clip(*DISCRIMINATION_BOUNDS)
+        intercept = (intercept + step[:, 1]).clip(*INTERCEPT_BOUNDS)
+        if model == '3pl':
+            guessing = (guessing + step[:, 2]).clip(*GUESSING_BOUNDS)
+
+    return discrimination, intercept, guessing
+
+
+def calibrate(correct, present, model='2pl', max_iterations=EM_MAX_ITERATIONS, tolerance=EM_TOLERANCE):
+    """
+    Calibra os itens por máxima verossimilhança marginal (EM de Bock-Aitkin).
+
+    correct e present são matrizes booleanas linhas × itens. Retorna
+    (discriminação, intercepto, acerto ao acaso, iterações, convergiu); a
+    dificuldade na métrica usual é -intercepto / discriminação.
+    """
+    if model not in IRT_MODELS:
+        raise ValueError(f'Modelo de TRI inválido: {model}')
+
+    nodes, prior = quadrature()
+    log_prior = np.log(prior)
+    hits = correct & present
+    correct_matrix = hits.astype(np.float64)
+    wrong_matrix = (present & ~hits).astype(np.float64)
+    present_matrix = present.astype(np.float64)
+
+    discrimination, intercept, guessing = _initial_parameters(hits, present, model)
+
+    converged = False
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        probabilities = item_probabilities(nodes, discrimination, intercept, guessing)
+        posterior = _posterior(correct_matrix, wrong_matrix, probabilities, log_prior)
+
+        expected_correct = correct_matrix.T @ posterior
+        expected_total = present_matrix.T @ posterior
+
+        previous = np.concatenate([discrimination, intercept, guessing])
+        discrimination, intercept, guessing = _maximize_items(
+            nodes, expected_correct, expected_total, discrimination, intercept, guessing, model
+        )
+        change = np.abs(np.concatenate([discrimination, intercept, guessing]) - previous).max(initial=0.0)
+        if change < tolerance:
+            converged = True
+            break
+
+    return discrimination, intercept, guessing, iteration, converged
+
+
+def expected_a_posteriori(correct, present, discrimination, intercept, guessing):
+    """Proficiência EAP e erro padrão (desvio a posteriori) de cada linha"""
+    nodes, prior = quadrature()
+    hits = correct & present
+    posterior = _posterior(
+        hits.astype(np.float64),
+        (present & ~hits).astype(np.float64),
+        item_probabilities(nodes, discrimination, intercept, guessing),
+        np.log(prior),
+    )
+    theta = posterior @ nodes
+    standard_error = np.sqrt(np.maximum(posterior @ nodes ** 2 - theta ** 2, 0.0))
+    return theta, standard_error
+
+
+def estimate_exam_proficiency(exam_id, model='2pl', scale_mean=DEFAULT_SCALE_MEAN, scale_sd=DEFAULT_SCALE_SD):
+    """
+    Calibra os itens da prova e estima a proficiência de todas as aplicações.
+
+    Grava os parâmetros das questões e theta, erro padrão e nota na escala
+    (scale_mean + scale_sd * theta) nos resultados. Questões sem respostas
+    ficam sem parâmetros. Retorna o resumo da operação.
+
+    Levanta ProficiencyError, sem gravar nada, se a prova tiver menos de
+    IRT_MIN_STUDENTS linhas ou IRT_MIN_QUESTIONS questões respondidas ou se
+    a calibração não convergir.
+    """
+    check_scale(scale_mean, scale_sd)
+    key = get_answer_key(exam_id)
+    pairs, responses, correct = load_responses(exam_id, key)
+    present = responses != NOT_ANSWERED
+
+    calibrated = present.any(axis=0)
+    present = present[:, calibrated]
+    correct = correct[:, calibrated]
+    questions = [question for question, used in zip(key.questions, calibrated) if used]
+
+    if len(pairs) < IRT_MIN_STUDENTS or len(questions) < IRT_MIN_QUESTIONS:
+        raise ProficiencyError(
+            f'A TRI precisa de respostas de ao menos {IRT_MIN_STUDENTS} aluno(s) em '
+            f'{IRT_MIN_QUESTIONS} questão(ões); a prova tem {len(pairs)} aluno(s) e '
+            f'{len(questions)} questão(ões) respondida(s)'
+        )
+
+    discrimination, intercept, guessing, iterations, converged = calibrate(correct, present, model)
+    if not converged or not np.isfinite([discrimination, intercept, guessing]).all():
+        raise ProficiencyError(
+            f'A calibração não convergiu em {iterations} iteração(ões); nenhum parâmetro foi gravado'
+        )
+    theta, standard_error = expected_a_posteriori(correct, present, discrimination, intercept, guessing)
+    difficulty = -intercept / discrimination
+    scale_score = scale_mean + scale_sd * theta
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _update_questions(cursor, questions, discrimination, difficulty, guessing, model)
+        results = _update_results(cursor, pairs, theta, standard_error, scale_score)
+
+    return {
+        'model': model,
+        'students': len(pairs),
+        'questions': len(questions),
+        'iterations': iterations,
+        'converged': converged,
+        'results': results,
+        'theta_mean': round(float(theta.mean()), 4),
+        'theta_sd': round(float(theta.std()), 4),
+        'items': [
+            {
+                'id_question': question.id,
+                'question_number': question.question_number,
+                'discrimination': round(float(a), 4),
+                'difficulty': round(float(b), 4),
+                'guessing': round(float(c), 4) if model == '3pl' else None,
+            }
+            for question, a, b, c in zip(questions, discrimination, difficulty, guessing)
+        ],
+    }
+
+
+def _update_questions(cursor, questions, discrimination, difficulty, guessing, model):
+    cursor.execute("""
+        UPDATE tb_questions q
+        SET irt_discrimination = p.discrimination,
+            irt_difficulty = p.difficulty,
+            irt_guessing = p.guessing
+        FROM unnest(%s::int[], %s::float8[], %s::float8[], %s::float8[])
+             AS p(id, discrimination, difficulty, guessing)
+        WHERE q.id = p.id
+    """, [
+        [question.id for question in questions],
+        discrimination.tolist(),
+        difficulty.tolist(),
+        guessing.tolist() if model == '3pl' else [None] * len(questions),
+    ])
+
+
+def _update_results(cursor, pairs, theta, standard_error, scale_score):
+    """Grava a proficiência nos resultados existentes, em lotes de unnest"""
+    updated = 0
+    for start in range(0, len(pairs), IRT_UPDATE_BATCH_SIZE):
+        batch = slice(start, start + IRT_UPDATE_BATCH_SIZE)
+        cursor.execute("""
+            UPDATE tb_exam_results r
+            SET theta = p.theta,
+                theta_se = p.theta_se,
+                scale_score = p.scale_score
+            FROM unnest(%s::int[], %s::int[], %s::float8[], %s::float8[], %s::float8[])
+                 AS p(id_student, id_exam_application, theta, theta_se, scale_score)
+            WHERE r.id_student = p.id_student
+              AND r.id_exam_application = p.id_exam_application
+        """, [
+            pairs[batch, 0].tolist(),
+            pairs[batch, 1].tolist(),
+            theta[batch].tolist(),
+            standard_error[batch].tolist(),
+            scale_score[batch].tolist(),
+        ])
+        updated += cursor.rowcount
+    return updated
@@ -0,0 +1,213 @@
+"""
+Análise clássica de itens (TCT) de uma prova, vetorizada com NumPy.
+
+Todas as respostas da prova vêm de uma única consulta values_list e viram
+uma matriz (aluno, aplicação) × questões. Dela saem, por questão, a
+dificuldade (proporção de acertos), a discriminação (correlação
+ponto-bisserial entre o acerto na questão e os acertos no restante da
+prova) e a frequência de escolha de cada alternativa.
+
+O resultado fica no cache do Django, com a versão do gabarito
+(api.answer_keys) e a versão das respostas da prova na chave. As duas versões
+ficam no banco (api.versions), então qualquer processo que grave respostas
+(API, worker de importações, flush do salvamento automático, recorreção)
+descarta a análise em cache de todos (invalidate_answer_data).
+"""
+from functools import partial
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from students.models import TbStudentAnswers
+
+from .answer_keys import answer_key_version_name, get_answer_key
+from .grading import ANSWER_LETTERS, BLANK, NOT_ANSWERED
+from .versions import bump_versions, get_versions
+
+
+# Validade da análise em cache (a troca de versão já a descarta antes)
+ITEM_ANALYSIS_CACHE_SECONDS = 24 * 60 * 60
+
+
+def answer_data_version_name(exam_id):
+    return f'answer_data:{exam_id}'
+
+
+def invalidate_answer_data(exam_ids):
+    """
+    Troca a versão das respostas das provas no commit.
+
+    A troca é uma instrução própria depois do commit, e não parte da
+    transação, para que gravações concorrentes de respostas da mesma prova
+    não fiquem presas à linha da versão até o fim da transação. A análise
+    lê a versão antes das respostas, então uma análise montada entre o
+    commit e a troca fica com a versão antiga e nunca é reaproveitada.
+    """
+    exam_ids = set(exam_ids)
+    if exam_ids:
+        transaction.on_commit(partial(bump_versions, [answer_data_version_name(exam_id) for exam_id in exam_ids]))
+
+
+def get_item_analysis(exam_id):
+    """Análise de itens da prova, do cache quando as versões não mudaram"""
+    names = [answer_key_version_name(exam_id), answer_data_version_name(exam_id)]
+    versions = get_versions(names)
+    cache_key = f'item_analysis:{exam_id}:{versions[names[0]]}:{versions[names[1]]}'
+    analysis = cache.get(cache_key)
+    if analysis is None:
+        analysis = item_analysis(exam_id)
+        if not connection.in_atomic_block:
+            cache.set(cache_key, analysis, timeout=ITEM_ANALYSIS_CACHE_SECONDS)
+    return analysis
+
+
+def item_analysis(exam_id):
+    """Calcula a análise de itens de todas as respostas gravadas da prova"""
+    key = get_answer_key(exam_id)
+
+    _, responses, correct = load_responses(exam_id, key)
+    present = responses != NOT_ANSWERED
+
+    answered = present.sum(axis=0)
+    correct_count = correct.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = correct_count / answered
+
+    discrimination = _point_biserial(correct, present)
+    frequencies = _choice_frequencies(key, responses, present)
+
+    questions = []
+    for column, question in enumerate(key.questions):
+        total = int(answered[column])
+        questions.append({
+            'id_question': question.id,
+            'question_number': question.question_number,
+            'answered': total,
+            'correct': int(correct_count[column]),
+            'difficulty': _rounded(difficulty[column]),
+            'discrimination': _rounded(discrimination[column]),
+            'correct_alternative': question.correct_answer,
+            'alternatives': {
+                label: {
+                    'count': int(frequencies[column, code]),
+                    'proportion': _rounded(frequencies[column, code] / total) if total else None,
+                }
+                for code, label in _choice_labels(key)
+            },
+        })
+
+    return {
+        'exam': exam_id,
+        'students': int(present.any(axis=1).sum()),
+        'answers': int(present.sum()),
+        'questions': questions,
+    }
+
+
+def load_responses(exam_id, key):
+    """
+    Respostas gravadas da prova em forma de matriz, com uma única consulta.
+
+    Retorna os pares (aluno, aplicação) de cada linha, a matriz de respostas
+    (códigos de api.grading) e a de acertos.
+    """
+    rows = TbStudentAnswers.objects.filter(id_question__id_exam_id=exam_id).values_list(
+        'id_student_id', 'id_exam_application_id', 'id_question_id',
+        'id_selected_alternative_id', 'is_correct'
+    )
+    data = np.array(
+        [
+            (student_id, application_id, question_id, alternative_id or 0, bool(is_correct))
+            for student_id, application_id, question_id, alternative_id, is_correct in rows
+        ],
+        dtype=np.int64
+    ).reshape(-1, 5)
+
+    return _response_matrix(key, data)
+
+
+def _response_matrix(key, data):
+    """
+    Matriz de respostas e de acertos a partir das linhas de respostas.
+
+    Cada linha é um par (aluno, aplicação); questões e alternativas são
+    resolvidas com buscas ordenadas nos ids do gabarito.
+    """
+    if not len(data) or not len(key):
+        shape = (0, len(key))
+        return (
+            np.zeros((0, 2), dtype=np.int64),
+            np.full(shape, NOT_ANSWERED, dtype=np.int16),
+            np.zeros(shape, dtype=bool),
+        )
+
+    students, row_index = np.unique(data[:, :2], axis=0, return_inverse=True)
+    row_index = row_index.reshape(-1)
+
+    question_ids = np.array(sorted(key.question_columns), dtype=np.int64)
+    question_columns = np.array([key.question_columns[question_id] for question_id in question_ids], dtype=np.int64)
+    positions = np.searchsorted(question_ids, data[:, 2]).clip(max=len(question_ids) - 1)
+    known = question_ids[positions] == data[:, 2]
+    columns = question_columns[positions]
+
+    alternative_ids = np.array(sorted(key.alternative_options), dtype=np.int64)
+    alternative_columns = np.array([key.alternative_options[alt][0] for alt in alternative_ids], dtype=np.int64)
+    alternative_orders = np.array([key.alternative_options[alt][1] for alt in alternative_ids], dtype=np.int64)
+
+    codes = np.full(len(data), key.other_option, dtype=np.int64)
+    codes[data[:, 3] == 0] = BLANK
+    if len(alternative_ids):
+        alt_positions = np.searchsorted(alternative_ids, data[:, 3]).clip(max=len(alternative_ids) - 1)
+        valid = (alternative_ids[alt_positions] == data[:, 3]) & (alternative_columns[alt_positions] == columns)
+        codes[valid] = alternative_orders[alt_positions[valid]]
+
+    responses = np.full((len(students), len(key)), NOT_ANSWERED, dtype=np.int16)
+    correct = np.zeros((len(students), len(key)), dtype=bool)
+    responses[row_index[known], columns[known]] = codes[known]
+    correct[row_index[known], columns[known]] = data[known, 4].astype(bool)
+    return students, responses, correct
+
+
+def _point_biserial(correct, present):
+    """
+    Correlação ponto-bisserial corrigida de cada questão.
+
+    Compara o acerto na questão com os acertos do aluno nas demais questões
+    (sem a própria, para não inflar a correlação), só entre os alunos que
+    responderam a questão. None quando não há variação.
+    """
+    item = correct.astype(np.float64)
+    mask = present.astype(np.float64)
+    rest = item.sum(axis=1, keepdims=True) - item
+
+    n = mask.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_item = item.sum(axis=0) / n
+        mean_rest = (rest * mask).sum(axis=0) / n
+        covariance = (item * rest * mask).sum(axis=0) / n - mean_item * mean_rest
+        variance_item = mean_item * (1 - mean_item)
+        variance_rest = (rest ** 2 * mask).sum(axis=0) / n - mean_rest ** 2
+        return covariance / np.sqrt(variance_item * variance_rest)
+
+
+def _choice_frequencies(key, responses, present):
+    """Contagem de escolhas por questão × código da resposta"""
+    size = key.other_option + 1
+    columns = np.broadcast_to(np.arange(len(key)), responses.shape)
+    cells = columns[present] * size + responses[present]
+    return np.bincount(cells, minlength=len(key) * size).reshape(len(key), size)
+
+
+def _choice_labels(key):
+    """(código, rótulo) das colunas de frequência: em branco, A..E e outras"""
+    labels = [(BLANK, 'blank')]
+    for order in range(1, key.options + 1):
+        labels.append((order, ANSWER_LETTERS[order - 1] if order <= len(ANSWER_LETTERS) else str(order)))
+    labels.append((key.other_option, 'other'))
+    return labels
+
+
+def _rounded(value, digits=4):
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
@@ -0,0 +1,192 @@
+"""
+Fila de importações em segundo plano.
+
+Os endpoints de importação gravam o arquivo enviado no storage, criam um
+TbImportJob pendente e respondem na hora; o comando process_import_jobs
+consome a fila e executa as mesmas rotinas de api.imports.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from students.models import TbImportJob
+from .imports import (
+    ImportFileError, iter_import_rows, run_answer_key_import,
+    run_student_answers_import, run_student_import,
+)
+
+
+# Pasta do storage onde ficam os arquivos aguardando processamento
+IMPORT_JOBS_LOCATION = 'imports'
+
+# Intervalo mínimo (segundos) entre gravações do progresso no banco
+JOB_PROGRESS_INTERVAL = 2.0
+
+# Intervalo (segundos) entre os sinais de vida de um job em execução; deve
+# ficar bem abaixo do prazo de requeue_stale_jobs
+JOB_HEARTBEAT_INTERVAL = 30.0
+
+# Tentativas antes de um job interrompido ser marcado como falho
+JOB_MAX_ATTEMPTS = 3
+
+IMPORT_RUNNERS = {
+    'students': run_student_import,
+    'answer_key': run_answer_key_import,
+    'student_answers': run_student_answers_import,
+}
+
+
+def enqueue_import(import_type, file, params=None):
+    """Grava o arquivo enviado no storage e cria o job pendente"""
+    file_extension = file.name.split('.')[-1].lower()
+    file_path = default_storage.save(
+        f"{IMPORT_JOBS_LOCATION}/{import_type}_{uuid.uuid4()}.{file_extension}",
+        file
+    )
+    return TbImportJob.objects.create(
+        import_type=import_type,
+        file_path=file_path,
+        file_name=file.name,
+        params=params or {}
+    )
+
+
+def claim_next_job():
+    """
+    Reserva o próximo job pendente.
+
+    SELECT ... FOR UPDATE SKIP LOCKED permite vários workers consumindo a
+    mesma fila sem pegar o mesmo job.
+    """
+    with transaction.atomic():
+        job = (
+            TbImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.processed_rows = 0
+        job.error_count = 0
+        job.save(update_fields=[
+            'status', 'attempts', 'started_at', 'processed_rows', 'error_count', 'updated_at'
+        ])
+    return job
+
+
+def requeue_stale_jobs(stale_after):
+    """
+    Devolve à fila jobs "running" sem sinal de vida há mais de stale_after
+    (worker encerrado no meio do processamento). Enquanto o worker está vivo,
+    _heartbeat renova updated_at em todas as fases do job, inclusive as que
+    não reportam progresso. Retorna a quantidade.
+    """
+    limit = timezone.now() - stale_after
+    stale = TbImportJob.objects.filter(status='running', updated_at__lt=limit)
+
+    failed = stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(
+        status='failed',
+        error_message='Processamento interrompido repetidas vezes',
+        finished_at=timezone.now(),
+        updated_at=timezone.now()
+    )
+    requeued = stale.update(status='pending', updated_at=timezone.now())
+    return failed + requeued
+
+
+def run_import_job(job):
+    """Executa o job e grava o resultado (ou o erro) no próprio registro"""
+    runner = IMPORT_RUNNERS[job.import_type]
+    last_save = [0.0]
+
+    def progress(processed_rows, error_count):
+        now = time.monotonic()
+        if now - last_save[0] < JOB_PROGRESS_INTERVAL:
+            return
+        last_save[0] = now
+        TbImportJob.objects.filter(pk=job.pk).update(
+            processed_rows=processed_rows,
+            error_count=error_count,
+            updated_at=timezone.now()
+        )
+
+    try:
+        with _heartbeat(job):
+            # Conta as linhas antes de processar para permitir estimar o término
+            with default_storage.open(job.file_path, 'rb') as file:
+                total_rows = sum(1 for _ in iter_import_rows(file, sheet=job.params.get('sheet')))
+            TbImportJob.objects.filter(pk=job.pk).update(total_rows=total_rows, updated_at=timezone.now())
+
+            with default_storage.open(job.file_path, 'rb') as file:
+                result = runner(file, progress=progress, **job.params)
+    except ImportFileError as e:
+        _finish_job(job, 'failed', error_message=str(e))
+    except Exception as e:
+        _finish_job(job, 'failed', error_message=f'Erro ao processar arquivo: {str(e)}')
+    else:
+        _finish_job(
+            job, 'completed',
+            result=result,
+            processed_rows=total_rows,
+            error_count=result.get('error_count') or 0
+        )
+        default_storage.delete(job.file_path)
+
+    job.refresh_from_db()
+    return job
+
+
+@contextmanager
+def _heartbeat(job):
+    """
+    Renova updated_at do job a cada JOB_HEARTBEAT_INTERVAL enquanto o bloco
+    roda, numa thread com conexão própria (a leitura do arquivo e instruções
+    longas não passam pelo callback de progresso).
+    """
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(JOB_HEARTBEAT_INTERVAL):
+                TbImportJob.objects.filter(pk=job.pk, status='running').update(updated_at=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'import-job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def _finish_job(job, status, **fields):
+    TbImportJob.objects.filter(pk=job.pk).update(
+        status=status,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+        **fields
+    )
+
+
+def job_eta_seconds(job):
+    """Estimativa (segundos) para o término do job, a partir da vazão atual"""
+    if job.status != 'running' or not job.started_at or not job.total_rows:
+        return None
+    if not job.processed_rows:
+        return None
+
+    elapsed = (timezone.now() - job.started_at).total_seconds()
+    remaining = max(job.total_rows - job.processed_rows, 0)
+    return round(elapsed / job.processed_rows * remaining, 1)
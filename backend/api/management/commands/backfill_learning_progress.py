@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from api.scoring import upsert_learning_progress
+from students.models import TbExamApplications, TbStudentAnswers
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera tb_student_learning_progress a partir das respostas já gravadas '
+        '(aplicações históricas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', action='append', dest='exam_codes', default=[], help='Código da prova (pode repetir)')
+        parser.add_argument('--application', type=int, action='append', dest='application_ids', default=[], help='ID da aplicação (pode repetir)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Aplicações processadas por transação (padrão: 100)'
+        )
+
+    def handle(self, *args, **options):
+        applications = TbExamApplications.objects.filter(
+            Exists(TbStudentAnswers.objects.filter(id_exam_application=OuterRef('pk')))
+        )
+        if options['exam_codes']:
+            applications = applications.filter(id_exam__exam_code__in=options['exam_codes'])
+        if options['application_ids']:
+            applications = applications.filter(id__in=options['application_ids'])
+
+        application_ids = list(applications.order_by('id').values_list('id', flat=True))
+        batch_size = max(1, options['batch_size'])
+
+        saved = 0
+        for start in range(0, len(application_ids), batch_size):
+            batch = application_ids[start:start + batch_size]
+            with transaction.atomic():
+                saved += upsert_learning_progress(application_ids=batch)
+            self.stdout.write(f'{start + len(batch)}/{len(application_ids)} aplicação(ões) processada(s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{saved} linha(s) de progresso gravada(s) em {len(application_ids)} aplicação(ões)'
+        ))
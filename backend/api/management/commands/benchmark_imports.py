@@ -0,0 +1,118 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.benchmarks import (
+    BenchmarkScale, answer_key_rows, answers_rows, build_upload, create_descriptors,
+    create_network, measure, students_rows,
+)
+from api.imports import run_answer_key_import, run_student_answers_import, run_student_import
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão das importações (alunos, gabarito e respostas) com dados '
+        'sintéticos em um PostgreSQL local'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--answers',
+            type=int,
+            default=10000,
+            help='Total aproximado de respostas geradas (padrão: 10000; ex.: 1000 a 1000000)'
+        )
+        parser.add_argument('--questions', type=int, default=20, help='Questões por prova (padrão: 20)')
+        parser.add_argument('--exams', type=int, default=1, help='Provas aplicadas a cada aluno (padrão: 1)')
+        parser.add_argument('--class-size', type=int, default=30, help='Alunos por turma (padrão: 30)')
+        parser.add_argument('--classes-per-school', type=int, default=10, help='Turmas por escola (padrão: 10)')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'xlsx'],
+            default='csv',
+            help='Formato dos arquivos gerados (padrão: csv)'
+        )
+        parser.add_argument('--copy', action='store_true', help='Importa as respostas com copy=True')
+        parser.add_argument('--workers', type=int, default=None, help='Processos paralelos na importação de respostas')
+        parser.add_argument('--seed', type=int, default=1, help='Semente dos dados sintéticos (padrão: 1)')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Mantém os dados gerados no banco (por padrão tudo é desfeito ao final)'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] and options['workers'] > 1 and not options['keep']:
+            # Os workers usam conexões próprias e não enxergam a transação do
+            # benchmark, que é desfeita ao final
+            raise CommandError('--workers exige --keep (use um --seed diferente a cada execução)')
+
+        scale = BenchmarkScale(
+            options['answers'],
+            questions=options['questions'],
+            exams=options['exams'],
+            class_size=options['class_size'],
+            classes_per_school=options['classes_per_school']
+        )
+        self.stdout.write(
+            f'Rede sintética: {scale.schools} escola(s), {scale.classes} turma(s), '
+            f'{scale.students} aluno(s), {scale.exams} prova(s) de {scale.questions} questões '
+            f'({scale.answers} respostas)'
+        )
+
+        if options['keep']:
+            results = self._run(scale, options)
+        else:
+            with transaction.atomic():
+                results = self._run(scale, options)
+                transaction.set_rollback(True)
+
+        self._report(results)
+
+    def _run(self, scale, options):
+        seed = options['seed']
+        file_format = options['format']
+        rng = random.Random(seed)
+
+        class_ids = create_network(scale, seed)
+        descriptor_codes = create_descriptors(scale, seed)
+
+        # Os arquivos são montados antes da medição de cada passo
+        students_file = build_upload('alunos', students_rows(scale, seed, class_ids), file_format)
+        answer_key_file = build_upload('gabarito', answer_key_rows(scale, seed, descriptor_codes, rng), file_format)
+        answers_file = build_upload('respostas', answers_rows(scale, seed, class_ids, rng), file_format)
+
+        answers_params = {'copy': options['copy'], 'workers': options['workers']}
+        answers_step = 'import_student_answers'
+        if options['copy']:
+            answers_step += ' (copy)'
+        elif options['workers']:
+            answers_step += f" ({options['workers']} workers)"
+
+        return [
+            measure('bulk_import', scale.students, lambda: run_student_import(students_file)),
+            measure(
+                'import_answer_key', scale.questions * scale.exams,
+                lambda: run_answer_key_import(answer_key_file)
+            ),
+            measure(
+                answers_step, scale.answers,
+                lambda: run_student_answers_import(answers_file, **answers_params)
+            ),
+        ]
+
+    def _report(self, results):
+        header = f"{'Passo':<40} {'Registros':>9} {'Segundos':>9} {'Registros/s':>11} {'Consultas':>10} {'RSS (MB)':>9} {'Erros':>6}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for result in results:
+            self.stdout.write(
+                f"{result['step']:<40} {result['rows']:>9} {result['seconds']:>9} "
+                f"{result['rows_per_second'] or '-':>11} {result['queries']:>10} "
+                f"{result['peak_rss_mb'] or '-':>9} {result['errors']:>6}"
+            )
+            if result['errors']:
+                self.stdout.write(self.style.WARNING(
+                    f"  {result['step']}: {result['errors']} erro(s) nos dados sintéticos"
+                ))
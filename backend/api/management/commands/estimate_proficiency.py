@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.irt import (
+    DEFAULT_SCALE_MEAN, DEFAULT_SCALE_SD, IRT_MODELS, ProficiencyError, check_scale, estimate_exam_proficiency,
+)
+from api.management.exams import add_exam_arguments, select_exams
+
+
+class Command(BaseCommand):
+    help = (
+        'Calibra os itens das provas pela TRI (2PL/3PL) e grava a proficiência '
+        '(theta, erro padrão e nota na escala) nos resultados'
+    )
+
+    def add_arguments(self, parser):
+        add_exam_arguments(parser, 'Estima todas as provas com respostas')
+        parser.add_argument('--model', choices=IRT_MODELS, default='2pl', help='Modelo logístico (padrão: 2pl)')
+        parser.add_argument('--scale-mean', type=float, default=DEFAULT_SCALE_MEAN, help='Média da escala de notas')
+        parser.add_argument('--scale-sd', type=float, default=DEFAULT_SCALE_SD, help='Desvio padrão da escala de notas')
+
+    def handle(self, *args, **options):
+        try:
+            check_scale(options['scale_mean'], options['scale_sd'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for exam in select_exams(options):
+            try:
+                summary = estimate_exam_proficiency(
+                    exam.id,
+                    model=options['model'],
+                    scale_mean=options['scale_mean'],
+                    scale_sd=options['scale_sd'],
+                )
+            except ProficiencyError as e:
+                self.stderr.write(f"{exam.exam_code}: {e}")
+                continue
+            self.stdout.write(
+                f"{exam.exam_code}: {summary['questions']} questão(ões), {summary['students']} aluno(s), "
+                f"{summary['iterations']} iteração(ões), {summary['results']} resultado(s) atualizado(s)"
+            )
@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.autosave import AUTOSAVE_FLUSH_BATCH_SIZE, flush_answers
+
+
+class Command(BaseCommand):
+    help = 'Move as respostas salvas na prova online (tb_answer_autosave) para as respostas dos alunos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Faz um flush e encerra, sem aguardar novas respostas'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=10.0,
+            help='Segundos entre um flush e o próximo (padrão: 10)'
+        )
+        parser.add_argument(
+            '--older-than',
+            type=float,
+            default=10.0,
+            help='Só move respostas salvas há mais de N segundos; 0 move todas (padrão: 10)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=AUTOSAVE_FLUSH_BATCH_SIZE,
+            help=f'Respostas movidas por instrução (padrão: {AUTOSAVE_FLUSH_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        older_than = timedelta(seconds=options['older_than']) if options['older_than'] > 0 else None
+
+        while True:
+            close_old_connections()
+
+            flushed, exam_ids = flush_answers(older_than=older_than, batch_size=options['batch_size'])
+            if flushed:
+                self.stdout.write(f'{flushed} resposta(s) gravada(s) de {len(exam_ids)} prova(s)')
+
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
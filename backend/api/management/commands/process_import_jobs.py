@@ -0,0 +1,57 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import claim_next_job, requeue_stale_jobs, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de importações em segundo plano (tb_import_job)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Processa os jobs pendentes e encerra, sem aguardar novos'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Segundos de espera quando a fila está vazia (padrão: 5)'
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=30,
+            help='Minutos sem progresso para devolver um job "running" à fila (padrão: 30)'
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes'])
+
+        while True:
+            close_old_connections()
+
+            requeued = requeue_stale_jobs(stale_after)
+            if requeued:
+                self.stdout.write(f'{requeued} job(s) interrompido(s) devolvido(s) à fila')
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Processando {job}: {job.file_name}')
+            job = run_import_job(job)
+
+            if job.status == 'completed':
+                self.stdout.write(self.style.SUCCESS(
+                    f'Job #{job.id} concluído: {job.processed_rows} linha(s), {job.error_count} erro(s)'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f'Job #{job.id} falhou: {job.error_message}'))
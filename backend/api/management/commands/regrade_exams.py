@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.management.exams import add_exam_arguments, select_exams
+from api.regrading import regrade_exam
+
+
+class Command(BaseCommand):
+    help = (
+        'Recorrige respostas, resultados e conquistas de descritores das provas '
+        'com o gabarito atual (use após reimportar um gabarito)'
+    )
+
+    def add_arguments(self, parser):
+        add_exam_arguments(parser, 'Recorrige todas as provas com respostas')
+
+    def handle(self, *args, **options):
+        for exam in select_exams(options):
+            summary = regrade_exam(exam.id)
+            self.stdout.write(
+                f"{exam.exam_code}: {summary['changed_answers']} resposta(s) alterada(s), "
+                f"{summary['results']} resultado(s), {summary['achievements']} conquista(s) de descritores"
+            )
@@ -0,0 +1,33 @@
+from django.core.management.base import CommandError
+from django.db.models import Q
+
+from students.models import TbExams
+
+
+def add_exam_arguments(parser, all_help):
+    """Argumentos de seleção de provas: códigos, --id (repetível) e --all"""
+    parser.add_argument('exam_codes', nargs='*', help='Códigos das provas (codigo_prova)')
+    parser.add_argument('--id', type=int, action='append', dest='exam_ids', default=[], help='ID da prova (pode repetir)')
+    parser.add_argument('--all', action='store_true', help=all_help)
+
+
+def select_exams(options):
+    """
+    Provas escolhidas nas opções do comando, em ordem de id.
+
+    --all seleciona as provas com aplicações; códigos e ids inexistentes
+    levantam CommandError com a lista do que não foi encontrado.
+    """
+    if options['all']:
+        exams = TbExams.objects.filter(tbexamapplications__isnull=False).distinct()
+    elif options['exam_codes'] or options['exam_ids']:
+        exams = TbExams.objects.filter(
+            Q(exam_code__in=options['exam_codes']) | Q(id__in=options['exam_ids'])
+        )
+        found = {exam.exam_code for exam in exams} | {exam.id for exam in exams}
+        missing = [str(value) for value in options['exam_codes'] + options['exam_ids'] if value not in found]
+        if missing:
+            raise CommandError(f"Prova(s) não encontrada(s): {', '.join(missing)}")
+    else:
+        raise CommandError('Informe os códigos das provas, --id ou --all')
+    return exams.order_by('id')
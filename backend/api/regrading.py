@@ -0,0 +1,93 @@
+"""
+Recorreção de provas após mudança de gabarito.
+
+Quando o gabarito de uma prova é reimportado (ou alterado pela API), as
+respostas gravadas, os resultados, as conquistas de descritores e o
+progresso de aprendizagem ficam defasados. regrade_exam refaz tudo no banco
+com instruções por conjunto: um UPDATE ... FROM para is_correct, os cálculos
+agregados de api.scoring para resultados e progresso e uma instrução
+agregada para as conquistas, sem trazer as respostas para o Python.
+"""
+from django.db import connection, transaction
+
+from .item_analysis import invalidate_answer_data
+from .scoring import upsert_learning_progress, upsert_results
+
+
+def regrade_exam(exam_id):
+    """
+    Recorrige todas as aplicações da prova e retorna o resumo da operação.
+
+    A correção segue a das importações: a resposta está correta quando a
+    alternativa marcada é correta.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        changed_answers = _update_answers(cursor, exam_id)
+        results = upsert_results(exam_id=exam_id)
+        removed_achievements, achievements = _rebuild_achievements(cursor, exam_id)
+        learning_progress = upsert_learning_progress(exam_id=exam_id)
+        invalidate_answer_data([exam_id])
+
+    return {
+        'changed_answers': changed_answers,
+        'results': results,
+        'removed_achievements': removed_achievements,
+        'achievements': achievements,
+        'learning_progress': learning_progress,
+    }
+
+
+def _update_answers(cursor, exam_id):
+    """Recalcula is_correct das respostas da prova; só as alteradas são regravadas"""
+    cursor.execute("""
+        UPDATE tb_student_answers sa
+        SET is_correct = graded.is_correct
+        FROM (
+            SELECT sa.id, COALESCE(a.is_correct, false) AS is_correct
+            FROM tb_student_answers sa
+            JOIN tb_questions q ON q.id = sa.id_question
+            LEFT JOIN tb_alternatives a
+                   ON a.id = sa.id_selected_alternative AND a.id_question = sa.id_question
+            WHERE q.id_exam = %s
+        ) graded
+        WHERE sa.id = graded.id
+          AND sa.is_correct IS DISTINCT FROM graded.is_correct
+    """, [exam_id])
+    return cursor.rowcount
+
+
+def _rebuild_achievements(cursor, exam_id):
+    """
+    Refaz as conquistas de descritores ligadas às aplicações da prova.
+
+    As conquistas registradas por essas aplicações saem e os alunos da prova
+    recebem de novo cada descritor com ao menos um acerto (em qualquer prova),
+    ligado à primeira aplicação em que foi acertado. Conquistas de outras
+    provas são mantidas.
+    """
+    cursor.execute("""
+        DELETE FROM tb_student_descriptor_achievements sda
+        USING tb_exam_applications ea
+        WHERE ea.id = sda.id_exam_application AND ea.id_exam = %s
+    """, [exam_id])
+    removed = cursor.rowcount
+
+    cursor.execute("""
+        INSERT INTO tb_student_descriptor_achievements
+            (id_student, id_descriptor, id_exam_application, achieved_at)
+        SELECT DISTINCT ON (sa.id_student, q.id_descriptor)
+            sa.id_student, q.id_descriptor, sa.id_exam_application, now()
+        FROM tb_student_answers sa
+        JOIN tb_questions q ON q.id = sa.id_question
+        WHERE sa.is_correct
+          AND q.id_descriptor IS NOT NULL
+          AND sa.id_student IN (
+              SELECT sa2.id_student
+              FROM tb_student_answers sa2
+              JOIN tb_exam_applications ea ON ea.id = sa2.id_exam_application
+              WHERE ea.id_exam = %s
+          )
+        ORDER BY sa.id_student, q.id_descriptor, sa.id_exam_application
+        ON CONFLICT (id_student, id_descriptor) DO NOTHING
+    """, [exam_id])
+    return removed, cursor.rowcount
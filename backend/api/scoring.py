@@ -0,0 +1,356 @@
+"""
+Cálculo de resultados (tb_exam_results), conquistas de descritores e
+progresso de aprendizagem (tb_student_learning_progress) a partir das
+respostas gravadas.
+
+Nota, nota máxima e contagens de acertos, erros e brancos de um ou muitos
+pares (aluno, aplicação) saem de uma única consulta com agregação
+condicional sobre tb_student_answers ⨝ tb_questions. upsert_results grava
+o mesmo cálculo com um INSERT ... SELECT ... ON CONFLICT,
+upsert_learning_progress faz o mesmo por aluno e descritor e
+insert_achievements deriva as conquistas de descritores dos acertos.
+
+Uma resposta está em branco quando não tem alternativa nem texto; as demais
+que não estão corretas contam como erradas.
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+from students.models import TbQuestions
+
+
+RESULT_AGGREGATES = """
+    COALESCE(SUM(q.points) FILTER (WHERE sa.is_correct), 0) AS total_score,
+    COALESCE(SUM(q.points), 0) AS max_score,
+    COUNT(*) FILTER (WHERE sa.is_correct) AS correct_answers,
+    COUNT(*) FILTER (
+        WHERE NOT COALESCE(sa.is_correct, false)
+          AND (sa.id_selected_alternative IS NOT NULL OR COALESCE(sa.answer_text, '') <> '')
+    ) AS wrong_answers,
+    COUNT(*) FILTER (
+        WHERE NOT COALESCE(sa.is_correct, false)
+          AND sa.id_selected_alternative IS NULL AND COALESCE(sa.answer_text, '') = ''
+    ) AS blank_answers
+"""
+
+RESULT_FIELDS = ['total_score', 'max_score', 'correct_answers', 'wrong_answers', 'blank_answers']
+
+
+def _answers_filter(pairs=None, application_ids=None, exam_id=None):
+    """Cláusula WHERE (e parâmetros) das respostas que entram no cálculo"""
+    if pairs is not None:
+        pairs = list(pairs)
+        return (
+            '(sa.id_student, sa.id_exam_application) IN '
+            '(SELECT * FROM unnest(%s::integer[], %s::integer[]))',
+            [[student_id for student_id, _ in pairs], [application_id for _, application_id in pairs]]
+        )
+    if application_ids is not None:
+        return 'sa.id_exam_application = ANY(%s::integer[])', [list(application_ids)]
+    if exam_id is not None:
+        return (
+            'sa.id_exam_application IN (SELECT id FROM tb_exam_applications WHERE id_exam = %s)',
+            [exam_id]
+        )
+    raise ValueError('Informe pairs, application_ids ou exam_id')
+
+
+def calculate_results(pairs=None, application_ids=None, exam_id=None):
+    """
+    Resultados calculados das respostas gravadas, sem gravar nada.
+
+    Aceita pares (id do aluno, id da aplicação), IDs de aplicações ou o ID
+    de uma prova. Retorna dict (id do aluno, id da aplicação) -> campos de
+    tb_exam_results; pares sem respostas ficam de fora.
+    """
+    where, params = _answers_filter(pairs, application_ids, exam_id)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT sa.id_student, sa.id_exam_application, {RESULT_AGGREGATES}
+            FROM tb_student_answers sa
+            JOIN tb_questions q ON q.id = sa.id_question
+            WHERE {where}
+            GROUP BY sa.id_student, sa.id_exam_application
+        """, params)
+        return {
+            (row[0], row[1]): dict(zip(RESULT_FIELDS, row[2:]))
+            for row in cursor.fetchall()
+        }
+
+
+def upsert_results(pairs=None, application_ids=None, exam_id=None):
+    """
+    Recalcula e grava tb_exam_results com uma instrução.
+
+    Mesmos filtros de calculate_results. Retorna a quantidade de resultados
+    gravados.
+    """
+    where, params = _answers_filter(pairs, application_ids, exam_id)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO tb_exam_results
+                (id_student, id_exam_application, {', '.join(RESULT_FIELDS)}, created_at)
+            SELECT sa.id_student, sa.id_exam_application, {RESULT_AGGREGATES}, now()
+            FROM tb_student_answers sa
+            JOIN tb_questions q ON q.id = sa.id_question
+            WHERE {where}
+            GROUP BY sa.id_student, sa.id_exam_application
+            ON CONFLICT (id_student, id_exam_application) DO UPDATE SET
+                {', '.join(f'{field} = EXCLUDED.{field}' for field in RESULT_FIELDS)}
+        """, params)
+        return cursor.rowcount
+
+
+def insert_achievements(pairs=None, application_ids=None, exam_id=None):
+    """
+    Grava as conquistas de descritores dos acertos com uma instrução.
+
+    Cada aluno conquista os descritores das questões que acertou; um
+    descritor presente em várias questões gera uma única linha (a da
+    primeira aplicação) e conquistas já existentes são mantidas (ON CONFLICT
+    DO NOTHING). Mesmos filtros de calculate_results; retorna a quantidade de
+    conquistas novas.
+    """
+    where, params = _answers_filter(pairs, application_ids, exam_id)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO tb_student_descriptor_achievements
+                (id_student, id_descriptor, id_exam_application, achieved_at)
+            SELECT DISTINCT ON (sa.id_student, q.id_descriptor)
+                sa.id_student, q.id_descriptor, sa.id_exam_application, now()
+            FROM tb_student_answers sa
+            JOIN tb_questions q ON q.id = sa.id_question
+            WHERE sa.is_correct AND q.id_descriptor IS NOT NULL AND {where}
+            ORDER BY sa.id_student, q.id_descriptor, sa.id_exam_application
+            ON CONFLICT (id_student, id_descriptor) DO NOTHING
+        """, params)
+        return cursor.rowcount
+
+
+def upsert_learning_progress(pairs=None, application_ids=None, exam_id=None):
+    """
+    Recalcula o progresso de aprendizagem por aluno, descritor e aplicação.
+
+    Nota e nota máxima somam os pontos das questões do descritor e
+    descriptor_mastery é o percentual (0 a 100) da nota sobre a máxima. As
+    linhas são gravadas com INSERT ... ON CONFLICT sobre o índice único
+    (aluno, descritor, aplicação); as do mesmo escopo cujo descritor não
+    aparece mais nas respostas (questão com descritor trocado) são removidas.
+    Mesmos filtros de calculate_results; retorna a quantidade de linhas
+    gravadas.
+    """
+    where, params = _answers_filter(pairs, application_ids, exam_id)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO tb_student_learning_progress
+                (id_student, id_descriptor, id_exam_application, score, max_score,
+                 descriptor_mastery, assessment_date, created_at)
+            SELECT
+                id_student, id_descriptor, id_exam_application, score, max_score,
+                CASE WHEN max_score > 0 THEN ROUND(100 * score / max_score, 2) ELSE 0 END,
+                assessment_date, now()
+            FROM (
+                SELECT
+                    sa.id_student, q.id_descriptor, sa.id_exam_application,
+                    COALESCE(SUM(q.points) FILTER (WHERE sa.is_correct), 0) AS score,
+                    COALESCE(SUM(q.points), 0) AS max_score,
+                    COALESCE(MIN(ea.application_date), CURRENT_DATE) AS assessment_date
+                FROM tb_student_answers sa
+                JOIN tb_questions q ON q.id = sa.id_question
+                JOIN tb_exam_applications ea ON ea.id = sa.id_exam_application
+                WHERE q.id_descriptor IS NOT NULL AND {where}
+                GROUP BY sa.id_student, q.id_descriptor, sa.id_exam_application
+            ) progress
+            ON CONFLICT (id_student, id_descriptor, id_exam_application) DO UPDATE SET
+                score = EXCLUDED.score,
+                max_score = EXCLUDED.max_score,
+                descriptor_mastery = EXCLUDED.descriptor_mastery,
+                assessment_date = EXCLUDED.assessment_date
+        """, params)
+        saved = cursor.rowcount
+
+        cursor.execute(f"""
+            DELETE FROM tb_student_learning_progress lp
+            WHERE (lp.id_student, lp.id_exam_application) IN (
+                SELECT sa.id_student, sa.id_exam_application
+                FROM tb_student_answers sa
+                WHERE {where}
+            )
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM tb_student_answers sa
+                  JOIN tb_questions q ON q.id = sa.id_question
+                  WHERE sa.id_student = lp.id_student
+                    AND sa.id_exam_application = lp.id_exam_application
+                    AND q.id_descriptor = lp.id_descriptor
+              )
+        """, params)
+
+    return saved
+
+
+# ============================================
+# MANUTENÇÃO INCREMENTAL (UMA RESPOSTA)
+# ============================================
+
+def answer_contribution(answer, points):
+    """Parcela de uma resposta no resultado, na ordem de RESULT_FIELDS"""
+    correct = bool(answer.is_correct)
+    blank = not correct and not answer.id_selected_alternative_id and not answer.answer_text
+    return (
+        points if correct else Decimal('0'),
+        points,
+        int(correct),
+        int(not correct and not blank),
+        int(blank),
+    )
+
+
+def update_answer_aggregates(before, after):
+    """
+    Ajusta resultado, conquistas e progresso após a gravação de uma resposta.
+
+    before é a resposta como estava no banco (None se nova) e after como
+    ficou (None se removida). Em vez de recalcular a aplicação, o resultado
+    do aluno recebe só a diferença entre as duas parcelas, com um número
+    fixo de instruções; deve rodar na mesma transação da gravação. Retorna
+    os IDs das provas afetadas.
+    """
+    questions = {
+        question.id: question
+        for question in TbQuestions.objects.filter(
+            id__in={answer.id_question_id for answer in (before, after) if answer is not None}
+        )
+    }
+    before_question = questions.get(before.id_question_id) if before is not None else None
+    after_question = questions.get(after.id_question_id) if after is not None else None
+
+    before_key = (before.id_student_id, before.id_exam_application_id) if before_question else None
+    after_key = (after.id_student_id, after.id_exam_application_id) if after_question else None
+
+    before_part = answer_contribution(before, before_question.points) if before_question else None
+    after_part = answer_contribution(after, after_question.points) if after_question else None
+
+    if before_key == after_key and before_key is not None:
+        _apply_result_delta(after_key, [new - old for new, old in zip(after_part, before_part)])
+    else:
+        if before_key is not None:
+            _apply_result_delta(before_key, [-value for value in before_part], create=False)
+        if after_key is not None:
+            _apply_result_delta(after_key, after_part)
+
+    before_descriptor = (before_key, before_question.id_descriptor_id) if before_question else None
+    after_descriptor = (after_key, after_question.id_descriptor_id) if after_question else None
+
+    # Progresso de aprendizagem: mesma diferença, por descritor
+    recomputed = set()
+    if before_descriptor == after_descriptor and before_descriptor is not None:
+        _apply_progress_delta(after_key, after_question.id_descriptor_id, [
+            after_part[0] - before_part[0], after_part[1] - before_part[1]
+        ], recomputed)
+    else:
+        if before_descriptor is not None:
+            _apply_progress_delta(
+                before_key, before_question.id_descriptor_id, [-before_part[0], -before_part[1]], recomputed
+            )
+        if after_descriptor is not None:
+            _apply_progress_delta(after_key, after_question.id_descriptor_id, after_part[:2], recomputed)
+
+    # Conquistas: o acerto novo conquista o descritor; o acerto desfeito só
+    # remove a conquista se o aluno não tiver outro acerto no descritor
+    if after_question and after.is_correct and after_question.id_descriptor_id:
+        _insert_achievement(after_key, after_question.id_descriptor_id)
+    if before_question and before.is_correct and before_question.id_descriptor_id:
+        if (after_descriptor != before_descriptor or not after.is_correct):
+            _remove_achievement(before.id_student_id, before_question.id_descriptor_id)
+
+    return {question.id_exam_id for question in questions.values()}
+
+
+def _apply_result_delta(key, delta, create=True):
+    """
+    Soma a diferença ao resultado do aluno.
+
+    Sem resultado gravado (ex.: respostas do salvamento automático ainda não
+    entregues), a diferença não vale como valor absoluto: com create o
+    resultado é recalculado inteiro pelas respostas.
+    """
+    if not any(delta):
+        return
+    student_id, application_id = key
+    assignments = ', '.join(
+        f'{field} = COALESCE({field}, 0) + %s' for field in RESULT_FIELDS
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE tb_exam_results SET {assignments}
+            WHERE id_student = %s AND id_exam_application = %s
+        """, [*delta, student_id, application_id])
+        if cursor.rowcount == 0 and create:
+            upsert_results(pairs=[key])
+
+
+def _apply_progress_delta(key, descriptor_id, delta, recomputed):
+    """
+    Soma a diferença ao progresso do aluno no descritor.
+
+    Sem linha de progresso, o progresso do par (aluno, aplicação) é
+    recalculado inteiro; recomputed guarda os pares já recalculados, que não
+    recebem mais diferenças na mesma gravação.
+    """
+    if descriptor_id is None or not any(delta) or key in recomputed:
+        return
+    student_id, application_id = key
+    score, max_score = delta
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE tb_student_learning_progress SET
+                score = score + %s,
+                max_score = max_score + %s,
+                descriptor_mastery = CASE
+                    WHEN max_score + %s > 0
+                    THEN ROUND(100 * (score + %s) / (max_score + %s), 2)
+                    ELSE 0
+                END
+            WHERE id_student = %s AND id_descriptor = %s AND id_exam_application = %s
+        """, [score, max_score, max_score, score, max_score, student_id, descriptor_id, application_id])
+        if cursor.rowcount == 0:
+            upsert_learning_progress(pairs=[key])
+            recomputed.add(key)
+            return
+
+        # Descritor sem nenhuma questão respondida na aplicação
+        cursor.execute("""
+            DELETE FROM tb_student_learning_progress
+            WHERE id_student = %s AND id_descriptor = %s AND id_exam_application = %s
+              AND max_score <= 0
+        """, [student_id, descriptor_id, application_id])
+
+
+def _insert_achievement(key, descriptor_id):
+    student_id, application_id = key
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO tb_student_descriptor_achievements
+                (id_student, id_descriptor, id_exam_application, achieved_at)
+            VALUES (%s, %s, %s, now())
+            ON CONFLICT (id_student, id_descriptor) DO NOTHING
+        """, [student_id, descriptor_id, application_id])
+
+
+def _remove_achievement(student_id, descriptor_id):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM tb_student_descriptor_achievements sda
+            WHERE sda.id_student = %s AND sda.id_descriptor = %s
+              AND sda.id_exam_application IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM tb_student_answers sa
+                  JOIN tb_questions q ON q.id = sa.id_question
+                  WHERE sa.id_student = sda.id_student
+                    AND q.id_descriptor = sda.id_descriptor
+                    AND sa.is_correct
+              )
+        """, [student_id, descriptor_id])
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from students.models import *
+from .jobs import job_eta_seconds
 
 # ============================================
 # 1. CADASTROS BÁSICOS E GEOLOCALIZAÇÃO
@@ -438,6 +440,30 @@ class BulkStudentAnswersSerializer(serializers.Serializer):
         return data
 
 
+class ClassSheetStudentSerializer(serializers.Serializer):
+    """Respostas de um aluno na folha da turma"""
+    id_student = serializers.IntegerField()
+    answers = serializers.ListField(child=serializers.DictField())
+
+
+class ClassSheetAnswersSerializer(serializers.Serializer):
+    """Serializer utilitário para receber a folha de respostas de uma turma"""
+    id_exam_application = serializers.IntegerField()
+    students = ClassSheetStudentSerializer(many=True, allow_empty=False)
+
+    def validate_id_exam_application(self, value):
+        if not TbExamApplications.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Aplicação de exame não encontrada")
+        return value
+
+
+class ExamSessionAnswersSerializer(serializers.Serializer):
+    """Serializer utilitário para as respostas salvas durante a prova online"""
+    id_student = serializers.IntegerField()
+    id_exam_application = serializers.IntegerField()
+    answers = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+
+
 class TbExamResultsSerializer(serializers.ModelSerializer):
     """Serializer básico para resultados"""
     student_name = serializers.CharField(source='id_student.student_name', read_only=True)
@@ -777,4 +803,36 @@ class EscolaResumoSerializer(serializers.Serializer):
     ideb = serializers.DecimalField(max_digits=4, decimal_places=2, allow_null=True)
     taxa_aprovacao = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)
     taxa_frequencia = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)
-    estado_conservacao = serializers.CharField(allow_null=True)
\ No newline at end of file
+    estado_conservacao = serializers.CharField(allow_null=True)
+
+# ============================================
+# 10. IMPORTAÇÕES EM SEGUNDO PLANO
+# ============================================
+
+class TbImportJobSerializer(serializers.ModelSerializer):
+    """Serializer para acompanhar o progresso de uma importação"""
+    import_type_display = serializers.CharField(source='get_import_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percent = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+    error_report_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TbImportJob
+        exclude = ['file_path']
+
+    def get_progress_percent(self, obj):
+        if obj.status == 'completed':
+            return 100.0
+        if not obj.total_rows:
+            return None
+        return round(min(obj.processed_rows / obj.total_rows, 1) * 100, 1)
+
+    def get_eta_seconds(self, obj):
+        return job_eta_seconds(obj)
+
+    def get_error_report_url(self, obj):
+        report_id = (obj.result or {}).get('error_report_id')
+        if not report_id:
+            return None
+        return reverse('import-error-report-detail', args=[report_id], request=self.context.get('request'))
@@ -0,0 +1,81 @@
+"""
+Sinais do app api.
+
+Mantém o cache de gabaritos compilados (api.answer_keys) em dia com as
+alterações de provas, questões e alternativas feitas pelo ORM (API, admin).
+Escritas em lote por SQL (importação de gabarito) invalidam o cache direto.
+
+A gravação de uma resposta isolada pelo ORM (endpoint student-answers,
+admin) ajusta resultado, conquistas e progresso do aluno pela diferença
+(api.scoring.update_answer_aggregates). Os lançamentos em lote usam
+bulk_create, que não dispara sinais, e gravam os agregados por conta própria.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from students.models import TbAlternatives, TbExams, TbQuestions, TbStudentAnswers
+
+from .answer_keys import invalidate_answer_key
+from .item_analysis import invalidate_answer_data
+from .scoring import update_answer_aggregates
+
+
+@receiver(post_delete, sender=TbExams)
+def exam_deleted(sender, instance, **kwargs):
+    invalidate_answer_key(instance.id)
+
+
+@receiver(post_save, sender=TbQuestions)
+@receiver(post_delete, sender=TbQuestions)
+def question_changed(sender, instance, **kwargs):
+    invalidate_answer_key(instance.id_exam_id)
+
+
+@receiver(post_save, sender=TbAlternatives)
+@receiver(post_delete, sender=TbAlternatives)
+def alternative_changed(sender, instance, **kwargs):
+    exam_id = TbQuestions.objects.filter(
+        id=instance.id_question_id
+    ).values_list('id_exam_id', flat=True).first()
+    if exam_id is not None:
+        invalidate_answer_key(exam_id)
+
+
+# ============================================
+# RESPOSTAS DOS ALUNOS
+# ============================================
+
+@receiver(pre_save, sender=TbStudentAnswers)
+def answer_before_save(sender, instance, raw=False, **kwargs):
+    """Guarda a resposta como está no banco e corrige a alternativa trocada"""
+    previous = None
+    if instance.pk and not raw:
+        previous = TbStudentAnswers.objects.filter(pk=instance.pk).first()
+    instance._previous_answer = previous
+
+    if raw:
+        return
+
+    previous_alternative = previous.id_selected_alternative_id if previous else None
+    if instance.id_selected_alternative_id != previous_alternative:
+        if instance.id_selected_alternative_id:
+            instance.is_correct = TbAlternatives.objects.filter(
+                id=instance.id_selected_alternative_id,
+                id_question_id=instance.id_question_id,
+                is_correct=True
+            ).exists()
+        else:
+            instance.is_correct = False
+
+
+@receiver(post_save, sender=TbStudentAnswers)
+def answer_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_answer_data(
+            update_answer_aggregates(getattr(instance, '_previous_answer', None), instance)
+        )
+
+
+@receiver(post_delete, sender=TbStudentAnswers)
+def answer_deleted(sender, instance, **kwargs):
+    invalidate_answer_data(update_answer_aggregates(instance, None))
@@ -1,3 +1,1470 @@
-from django.test import TestCase
+import csv
+import io
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.signals import pre_migrate
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from students.models import (
+    TbAlternatives, TbCity, TbClass, TbDescriptorsCatalog, TbExamApplications, TbExamResults,
+    TbExams, TbImportCheckpoint, TbImportError, TbImportJob, TbQuestions, TbSchool,
+    TbStudentAnswers, TbStudentDescriptorAchievements, TbStudentLearningProgress, TbStudents,
+    TbTeacher,
+)
+from . import answer_keys, imports, irt, jobs
+from .answer_keys import answer_key_version_name, get_answer_key
+from .autosave import flush_answers, save_answers, submit_session
+from .benchmarks import (
+    BenchmarkScale, answer_key_rows, answers_rows, build_upload, create_descriptors,
+    create_network, measure, students_rows,
+)
+from .grading import BLANK, NOT_ANSWERED, AnswerKey
+from .imports import (
+    IMPORT_ERROR_REPORT_DAYS, IMPORT_ERRORS_IN_RESPONSE, IMPORT_SNIFF_SIZE, AnswerApplicationReader,
+    AnswerImportIndex, ClassResolver, ImportFileError, iter_csv_rows, run_answer_key_import,
+    run_student_answers_import, run_student_import,
+)
+from .irt import calibrate, expected_a_posteriori
+from .item_analysis import _point_biserial, _response_matrix
+from .jobs import (
+    JOB_MAX_ATTEMPTS, claim_next_job, enqueue_import, requeue_stale_jobs, run_import_job,
+)
+from .regrading import regrade_exam
+from .scoring import (
+    calculate_results, insert_achievements, upsert_learning_progress, upsert_results,
+)
+from .versions import get_versions
+
+
+# Testes que gravam no banco só rodam com o PostgreSQL configurado (o SQL
+# usa unnest, ON CONFLICT, FOR UPDATE SKIP LOCKED...)
+POSTGRES = connection.vendor == 'postgresql' and bool(settings.DATABASES['default'].get('NAME'))
+
+
+def create_legacy_tables(using, **kwargs):
+    """
+    Cria no banco de testes as tabelas legadas (managed=False), que não têm
+    migrações, antes das migrações que as alteram ou referenciam.
+    """
+    test_connection = connections[using]
+    existing = set(test_connection.introspection.table_names())
+    with test_connection.schema_editor() as editor:
+        for model in apps.get_app_config('students').get_models():
+            if not model._meta.managed and model._meta.db_table not in existing:
+                editor.create_model(model)
+
+
+# Conectado só quando os testes são carregados: o migrate do banco real não
+# cria as tabelas legadas
+pre_migrate.connect(create_legacy_tables, sender=apps.get_app_config('students'), dispatch_uid='create_legacy_tables')
+
+
+def csv_file(content, name='dados.csv'):
+    file = io.BytesIO(content)
+    file.name = name
+    return file
+
+
+# ============================================
+# BASE DOS TESTES COM BANCO
+# ============================================
+
+class SqlFixture:
+    """Dados dos testes com banco: uma prova com duas questões e dois alunos"""
+
+    @classmethod
+    def create_fixture(cls):
+        cls.city = TbCity.objects.create(city='Belém', state='PA')
+        cls.school = TbSchool.objects.create(school='Escola', id_city=cls.city)
+        cls.teacher = TbTeacher.objects.create(teacher_serial=1, teacher_name='Professora')
+        cls.class_obj = TbClass.objects.create(
+            class_name='5º Ano A', id_teacher=cls.teacher, id_school=cls.school, school_year=2025, grade='5º Ano'
+        )
+        cls.students = [
+            TbStudents.objects.create(student_serial=100 + i, student_name=f'Aluno {i}', id_class=cls.class_obj)
+            for i in range(2)
+        ]
+        cls.descriptor = TbDescriptorsCatalog.objects.create(descriptor_code='D01', descriptor_name='D01')
+
+        cls.exam = TbExams.objects.create(exam_code='P1', exam_name='Prova 1')
+        cls.questions, cls.alternatives = [], {}
+        for number, (points, letter) in enumerate([('1', 'A'), ('2', 'B')], start=1):
+            question = TbQuestions.objects.create(
+                id_exam=cls.exam, question_number=number, question_text=f'Questão {number}',
+                points=Decimal(points), id_descriptor=cls.descriptor if number == 1 else None
+            )
+            cls.questions.append(question)
+            for order, option in enumerate('AB', start=1):
+                cls.alternatives[number, option] = TbAlternatives.objects.create(
+                    id_question=question, alternative_order=order, alternative_text=option,
+                    is_correct=option == letter
+                )
+
+        cls.application = TbExamApplications.objects.create(
+            id_exam=cls.exam, id_class=cls.class_obj, id_teacher=cls.teacher, application_date=date(2025, 6, 1)
+        )
+
+    def answer(self, student, number, option):
+        alternative = self.alternatives[number, option] if option else None
+        return TbStudentAnswers.objects.create(
+            id_student=student, id_exam_application=self.application, id_question=self.questions[number - 1],
+            id_selected_alternative=alternative, answer_text=option,
+            is_correct=bool(alternative and alternative.is_correct)
+        )
+
+    def result(self, student):
+        return TbExamResults.objects.filter(
+            id_student=student, id_exam_application=self.application
+        ).values_list('total_score', 'max_score', 'correct_answers', 'wrong_answers', 'blank_answers').first()
+
+
+
+@skipUnless(POSTGRES, 'requer o PostgreSQL configurado em DATABASES')
+class SqlTestCase(SqlFixture, TestCase):
+    databases = {'default'} if POSTGRES else set()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixture()
+
+
+# ============================================
+# IMPORTAÇÃO DE ALUNOS
+# ============================================
+
+def find_class_by_name_or_id(value, school_id=None):
+    """Busca linha a linha do bulk_import anterior, referência do ClassResolver"""
+    if not value:
+        return None, "Valor da turma não fornecido"
+
+    value = str(value).strip()
+
+    base_queryset = TbClass.objects.all()
+    if school_id:
+        base_queryset = base_queryset.filter(id_school_id=school_id)
+
+    try:
+        class_id = int(value)
+        try:
+            return base_queryset.get(id=class_id), None
+        except TbClass.DoesNotExist:
+            pass
+    except (ValueError, TypeError):
+        pass
+
+    try:
+        return base_queryset.get(class_name__iexact=value), None
+    except TbClass.DoesNotExist:
+        pass
+
+    classes = base_queryset.filter(class_name__icontains=value)
+    if classes.count() == 1:
+        return classes.first(), None
+    elif classes.count() > 1:
+        class_names = ", ".join([c.class_name for c in classes[:3]])
+        return None, f"Múltiplas turmas encontradas para '{value}': {class_names}"
+
+    match = re.search(r'(\d+)[º°]?\s*(?:ano)?', value.lower())
+    if match:
+        grade_num = match.group(1)
+        classes = base_queryset.filter(
+            Q(grade__icontains=f"{grade_num}º") |
+            Q(grade__icontains=f"{grade_num}°") |
+            Q(class_name__icontains=value)
+        )
+        if classes.count() == 1:
+            return classes.first(), None
+        elif classes.count() > 1:
+            class_names = ", ".join([c.class_name for c in classes[:3]])
+            return None, f"Múltiplas turmas encontradas: {class_names}"
+
+    school_msg = f" na escola selecionada" if school_id else ""
+    return None, f"Turma '{value}' não encontrada{school_msg}"
+
+
+class ClassResolverTests(SqlTestCase):
+    """ClassResolver resolve as turmas como a busca linha a linha no banco"""
+
+    VALUES = [
+        '', None, '  5º Ano A  ', '5º ano b', '5º ANO B', 'ano b', 'Especial', 'espec',
+        '3º Ano', '3', '7º Ano', '9º Ano', 'Turma X', 'Integral', 'integral manhã',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_school = TbSchool.objects.create(school='Outra Escola', id_city=cls.city)
+        for school, name, grade in [
+            (cls.school, '5º Ano B', '5º Ano'),
+            (cls.school, 'Especial', None),
+            (cls.school, 'Integral Manhã', '3° Ano'),
+            (cls.school, 'Integral Tarde', '4º Ano'),
+            (cls.other_school, '5º Ano A', '5º Ano'),
+            (cls.other_school, '9º Ano Único', '9º Ano'),
+        ]:
+            TbClass.objects.create(
+                class_name=name, id_teacher=cls.teacher, id_school=school, school_year=2025, grade=grade
+            )
+
+    def assertSameResolution(self, value, school_id):
+        resolver = ClassResolver(school_id)
+        try:
+            expected = find_class_by_name_or_id(value, school_id)
+        except TbClass.MultipleObjectsReturned:
+            with self.assertRaises(TbClass.MultipleObjectsReturned):
+                resolver.resolve(value)
+            return
+        self.assertEqual(resolver.resolve(value), expected, f'{value!r} (escola {school_id})')
+
+    def test_same_results_and_messages_as_row_lookup(self):
+        ids = [str(class_obj.id) for class_obj in TbClass.objects.all()] + [' 999999 ']
+        for school_id in (None, self.school.id, self.other_school.id):
+            for value in self.VALUES + ids:
+                with self.subTest(value=value, school_id=school_id):
+                    self.assertSameResolution(value, school_id)
+
+    def test_ambiguous_exact_name_raises_like_get(self):
+        # Mesmo nome exato em duas escolas: sem escola, o get() do banco
+        # levantava MultipleObjectsReturned
+        with self.assertRaises(TbClass.MultipleObjectsReturned):
+            find_class_by_name_or_id('5º Ano A')
+        with self.assertRaises(TbClass.MultipleObjectsReturned):
+            ClassResolver().resolve('5º Ano A')
+
+    def test_id_takes_precedence_over_name(self):
+        numbered = TbClass.objects.create(
+            class_name=str(self.class_obj.id), id_teacher=self.teacher, id_school=self.other_school, school_year=2025
+        )
+        resolver = ClassResolver()
+
+        self.assertEqual(resolver.resolve(str(self.class_obj.id)), (self.class_obj, None))
+        self.assertEqual(resolver.resolve(f' {numbered.id} '), (numbered, None))
+
+    def test_not_found_messages(self):
+        self.assertEqual(ClassResolver().resolve('Turma X'), (None, "Turma 'Turma X' não encontrada"))
+        self.assertEqual(
+            ClassResolver(self.school.id).resolve('9º Ano Único'),
+            (None, "Turma '9º Ano Único' não encontrada na escola selecionada")
+        )
+        self.assertEqual(ClassResolver().resolve(''), (None, "Valor da turma não fornecido"))
+        self.assertEqual(ClassResolver().available_classes()[0].keys(), {'id', 'name', 'grade'})
+
+
+# ============================================
+# IMPORTAÇÃO DE RESPOSTAS
+# ============================================
+
+@skipUnless(POSTGRES, 'requer o PostgreSQL configurado em DATABASES')
+class SqlTransactionTestCase(SqlFixture, TransactionTestCase):
+    """
+    Base dos testes em que outras conexões (processos, threads) precisam ver
+    os dados. O flush do Django não limpa as tabelas legadas: elas são
+    truncadas ao fim de cada teste.
+    """
+    databases = {'default'} if POSTGRES else set()
+
+    def setUp(self):
+        self.create_fixture()
+
+    def tearDown(self):
+        tables = [
+            model._meta.db_table for model in apps.get_app_config('students').get_models()
+            if not model._meta.managed
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+
+
+def answers_csv(rows):
+    lines = ['codigo_prova,id_turma,matricula_aluno,q1,q2'] + [','.join(map(str, row)) for row in rows]
+    return csv_file(('\n'.join(lines) + '\n').encode())
+
+
+def answer_state():
+    """Respostas, resultados e conquistas gravados, sem depender dos ids"""
+    return (
+        sorted(TbStudentAnswers.objects.values_list(
+            'id_student__student_serial', 'id_exam_application__id_class__class_name',
+            'id_question__question_number', 'answer_text', 'is_correct', 'id_selected_alternative__alternative_order'
+        )),
+        sorted(TbExamResults.objects.values_list(
+            'id_student__student_serial', 'id_exam_application__id_class__class_name',
+            'total_score', 'max_score', 'correct_answers', 'wrong_answers', 'blank_answers'
+        )),
+        sorted(TbStudentDescriptorAchievements.objects.values_list(
+            'id_student__student_serial', 'id_descriptor__descriptor_code'
+        )),
+    )
+
+
+def clear_answers(application):
+    """Apaga o que a importação de respostas grava, menos a aplicação informada"""
+    TbStudentDescriptorAchievements.objects.all().delete()
+    TbExamResults.objects.all().delete()
+    TbStudentAnswers.objects.all().delete()
+    TbImportCheckpoint.objects.all().delete()
+    TbExamApplications.objects.exclude(pk=application.pk).delete()
+
+
+class ParallelAnswerImportTests(SqlTransactionTestCase):
+    """workers=N grava o mesmo que a importação serial"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_class = TbClass.objects.create(
+            class_name='5º Ano B', id_teacher=self.teacher, id_school=self.school, school_year=2025, grade='5º Ano'
+        )
+        for serial in (102, 103):
+            TbStudents.objects.create(student_serial=serial, student_name=f'Aluno {serial}', id_class=self.other_class)
+
+        self.rows = [
+            ('P1', self.class_obj.id, 100, 'A', 'B'),
+            ('P1', self.class_obj.id, 101, 'B', ''),
+            ('P1', self.other_class.id, 102, 'A', 'C'),
+            ('P1', self.other_class.id, 999, 'A', 'A'),
+            ('P1', self.other_class.id, 103, '', 'B'),
+        ]
+
+    def import_answers(self, workers):
+        with mock.patch.object(imports, 'IMPORT_MAX_WORKERS', 2), \
+                mock.patch.object(imports, 'ProcessPoolExecutor', wraps=imports.ProcessPoolExecutor) as pool:
+            response = run_student_answers_import(answers_csv(self.rows), workers=workers)
+        self.assertEqual(pool.called, workers > 1)
+        return response
+
+    def test_parallel_matches_serial(self):
+        serial = self.import_answers(workers=1)
+        serial_state = answer_state()
+        clear_answers(self.application)
+
+        parallel = self.import_answers(workers=2)
+
+        # Cada importação grava o próprio relatório de erros
+        parallel.pop('error_report_id')
+        serial.pop('error_report_id')
+        self.assertEqual(parallel, serial)
+        self.assertEqual(answer_state(), serial_state)
+        self.assertEqual(serial['processed_students'], 4)
+        self.assertEqual(len(serial_state[0]), 8)
+
+
+# ============================================
+# RELATÓRIO DE ERROS DAS IMPORTAÇÕES
+# ============================================
+
+class ImportErrorReportTests(SqlTestCase):
+    """Lista de erros limitada na resposta e relatório completo em CSV"""
+
+    def test_download_full_report(self):
+        rows = [('P1', self.class_obj.id, 100, 'A', 'B')]
+        rows += [('P1', self.class_obj.id, 1000 + i, 'A', 'B') for i in range(IMPORT_ERRORS_IN_RESPONSE)]
+        rows += [('P1', self.class_obj.id, 101, 'Z', 'B'), ('P9', self.class_obj.id, 101, 'A', 'B')]
+        content = answers_csv(rows).getvalue()
+
+        response = APIClient().post(
+            '/api/exam-applications/import_student_answers/',
+            {'file': SimpleUploadedFile('respostas.csv', content)}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['error_count'], IMPORT_ERRORS_IN_RESPONSE + 2)
+        self.assertEqual(len(data['errors']), IMPORT_ERRORS_IN_RESPONSE)
+
+        report = APIClient().get(data['error_report_url'])
+
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual(report['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f"erros_student_answers_{data['error_report_id']}.csv", report['Content-Disposition'])
+
+        text = b''.join(report.streaming_content).decode('utf-8')
+        self.assertTrue(text.startswith('﻿'))
+        lines = list(csv.reader(io.StringIO(text.lstrip('﻿'))))
+        self.assertEqual(lines[0], ['linha', 'coluna', 'codigo', 'mensagem'])
+        self.assertEqual(len(lines), IMPORT_ERRORS_IN_RESPONSE + 3)
+        self.assertEqual(lines[1], ['3', 'matricula_aluno', 'not_found', 'Linha 3: Aluno matrícula 1000 não encontrado na turma'])
+        self.assertEqual(lines[-2], [
+            str(IMPORT_ERRORS_IN_RESPONSE + 3), 'q1', 'invalid',
+            f'Linha {IMPORT_ERRORS_IN_RESPONSE + 3}, q1: Resposta deve ser A, B, C, D, E ou vazio'
+        ])
+        self.assertEqual(lines[-1], [
+            str(IMPORT_ERRORS_IN_RESPONSE + 4), 'codigo_prova', 'not_found',
+            f"Linha {IMPORT_ERRORS_IN_RESPONSE + 4}: Prova 'P9' não encontrada"
+        ])
+
+    def test_dry_run_does_not_save_report(self):
+        old = TbImportError.objects.create(
+            report_id='00000000-0000-0000-0000-000000000001', import_type='students', position=1, message='antigo'
+        )
+        TbImportError.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=IMPORT_ERROR_REPORT_DAYS + 1)
+        )
+
+        responses = [
+            run_student_import(csv_file(b'nome,matricula,turma\nAluno,200,999999\n'), dry_run=True),
+            run_answer_key_import(csv_file(
+                b'codigo_prova,nome_prova,numero_questao,resposta_correta\nP2,Prova 2,1,Z\n'
+            ), dry_run=True),
+            run_student_answers_import(answers_csv([('P1', self.class_obj.id, 1000, 'A', 'B')]), dry_run=True),
+        ]
+
+        for response in responses:
+            self.assertTrue(response['dry_run'])
+            self.assertEqual(response['error_count'], 1)
+            self.assertEqual(len(response['errors']), 1)
+            self.assertNotIn('error_report_id', response)
+        # Nada gravado e o relatório antigo não foi descartado
+        self.assertEqual(list(TbImportError.objects.values_list('pk', flat=True)), [old.pk])
+
+    def test_unknown_report(self):
+        client = APIClient()
+
+        self.assertEqual(client.get('/api/import-errors/nao-e-uuid/').status_code, 404)
+        self.assertEqual(client.get(f'/api/import-errors/{"0" * 8}-0000-0000-0000-{"0" * 12}/').status_code, 404)
+        self.assertFalse(TbImportError.objects.exists())
+
+
+# ============================================
+# BENCHMARK DAS IMPORTAÇÕES
+# ============================================
+
+@skipUnless(POSTGRES, 'requer o PostgreSQL configurado em DATABASES')
+class ImportBenchmarkTests(TestCase):
+    """
+    Versão reduzida do benchmark_imports: os dados sintéticos importam sem
+    erros e as consultas de cada passo não crescem com o número de linhas.
+    """
+    databases = {'default'} if POSTGRES else set()
+
+    def run_benchmark(self, answers, seed, questions=10):
+        scale = BenchmarkScale(answers, questions=questions, class_size=10, classes_per_school=2)
+        rng = random.Random(seed)
+        class_ids = create_network(scale, seed)
+        descriptor_codes = create_descriptors(scale, seed)
+
+        students_file = build_upload('alunos', students_rows(scale, seed, class_ids))
+        answer_key_file = build_upload('gabarito', answer_key_rows(scale, seed, descriptor_codes, rng))
+        answers_file = build_upload('respostas', answers_rows(scale, seed, class_ids, rng))
+
+        results = [
+            measure('bulk_import', scale.students, lambda: run_student_import(students_file)),
+            measure('import_answer_key', scale.questions, lambda: run_answer_key_import(answer_key_file)),
+            measure('import_student_answers', scale.answers, lambda: run_student_answers_import(answers_file)),
+        ]
+        return scale, {result['step']: result for result in results}
+
+    def test_imports_synthetic_data(self):
+        scale, results = self.run_benchmark(answers=400, seed=1)
+
+        self.assertEqual([result['errors'] for result in results.values()], [0, 0, 0])
+        self.assertEqual(TbStudents.objects.filter(student_serial__gte=1_900_000_000).count(), scale.students)
+        self.assertEqual(TbStudentAnswers.objects.count(), scale.answers)
+        self.assertEqual(TbExamResults.objects.count(), scale.students)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # Mesma rede (20 alunos em 2 turmas) com cinco vezes mais questões
+        _, small = self.run_benchmark(answers=200, seed=1, questions=10)
+        _, large = self.run_benchmark(answers=1000, seed=2, questions=50)
+
+        for step in ('import_answer_key', 'import_student_answers'):
+            with self.subTest(step=step):
+                self.assertEqual(large[step]['queries'], small[step]['queries'])
+
+    def test_command_report(self):
+        output = io.StringIO()
+
+        call_command('benchmark_imports', answers=200, questions=10, class_size=10, stdout=output)
+
+        report = output.getvalue()
+        self.assertIn('Rede sintética: 1 escola(s), 2 turma(s), 20 aluno(s)', report)
+        for step in ('bulk_import', 'import_answer_key', 'import_student_answers'):
+            self.assertIn(step, report)
+        self.assertNotIn('erro(s) nos dados sintéticos', report)
+        # O comando desfaz os dados gerados
+        self.assertFalse(TbStudents.objects.filter(student_serial__gte=1_900_000_000).exists())
+
+
+def answer_key(points=('1', '2', '1.5'), correct='ABC'):
+    """
+    Gabarito em memória: questões 1..N (ids 10, 20...) com alternativas
+    A-E (ids questão + ordem) e descritor 7 na primeira questão.
+    """
+    questions, alternatives = [], {}
+    for number, (question_points, letter) in enumerate(zip(points, correct), start=1):
+        question = TbQuestions(
+            id=number * 10, question_number=number, points=Decimal(question_points),
+            id_descriptor_id=7 if number == 1 else None
+        )
+        questions.append(question)
+        alternatives[question.id] = {
+            order: TbAlternatives(
+                id=question.id + order, id_question_id=question.id, alternative_order=order,
+                is_correct=order == ord(letter) - ord('A') + 1
+            )
+            for order in range(1, 6)
+        }
+    return AnswerKey(questions, alternatives)
+
+
+
+# ============================================
+# CORREÇÃO VETORIZADA
+# ============================================
+
+class AnswerKeyTests(SimpleTestCase):
+    """Gabarito compilado e correção vetorizada (api.grading)"""
+
+    def test_grade_letters(self):
+        key = answer_key()
+        responses = key.encode_letters([
+            {1: 'A', 2: 'B', 3: 'C'},
+            {1: 'B', 2: '', 9: 'A'},
+            {},
+        ])
+
+        self.assertEqual(responses.tolist(), [[1, 2, 3], [2, BLANK, NOT_ANSWERED], [NOT_ANSWERED] * 3])
+
+        result = key.grade(responses)
+        self.assertEqual(result.correct_count.tolist(), [3, 0, 0])
+        self.assertEqual(result.wrong_count.tolist(), [0, 1, 0])
+        self.assertEqual(result.blank_count.tolist(), [0, 1, 0])
+        self.assertEqual(result.total_score(0), Decimal('4.50'))
+        self.assertEqual(result.max_score(0), Decimal('4.50'))
+        self.assertEqual(result.total_score(1), Decimal('0.00'))
+        self.assertEqual(result.max_score(1), Decimal('3.00'))
+        self.assertEqual(result.selected_alternative[1].tolist(), [12, 0, 0])
+        self.assertEqual(result.answer_letter(1, 0), 'B')
+        self.assertEqual(result.answer_letter(1, 1), '')
+
+    def test_alternative_from_another_question_is_wrong(self):
+        key = answer_key()
+        responses = key.encode_alternatives([{10: 21, 20: 22, 30: None}])
+
+        self.assertEqual(responses.tolist(), [[key.other_option, 2, BLANK]])
+
+        result = key.grade(responses)
+        self.assertEqual(result.correct.tolist(), [[False, True, False]])
+        self.assertEqual(result.selected_alternative.tolist(), [[0, 22, 0]])
+        self.assertEqual(result.total_score(0), Decimal('2.00'))
+
+    def test_descriptor_index(self):
+        key = answer_key()
+
+        self.assertEqual(key.descriptor_ids, [7])
+        self.assertEqual(key.descriptor_index.tolist(), [0, -1, -1])
+
+
+# ============================================
+# RECORREÇÃO
+# ============================================
+
+class RegradeTests(SqlTestCase):
+    """Recorrigir após trocar o gabarito grava o mesmo que importar de novo"""
+
+    answer_rows = [('P1', 100, 'A', ''), ('P1', 101, 'B', 'A')]
+
+    def import_answers(self):
+        rows = [(code, self.class_obj.id, serial, q1, q2) for code, serial, q1, q2 in self.answer_rows]
+        response = run_student_answers_import(answers_csv(rows))
+        self.assertEqual(response['error_count'], 0)
+
+    def state(self):
+        return answer_state() + (sorted(TbStudentLearningProgress.objects.values_list(
+            'id_student__student_serial', 'id_descriptor__descriptor_code',
+            'score', 'max_score', 'descriptor_mastery'
+        )),)
+
+    def test_regrade_matches_fresh_import(self):
+        self.import_answers()
+        before = self.state()
+
+        # Gabarito novo: a questão 1 passa a ser B e a questão 2 passa a ser A
+        response = run_answer_key_import(csv_file(
+            'codigo_prova,nome_prova,numero_questao,resposta_correta,codigo_descritor,pontos\n'
+            'P1,Prova 1,1,B,D01,1\n'
+            'P1,Prova 1,2,A,,2\n'.encode()
+        ))
+        self.assertEqual(response['error_count'], 0)
+
+        summary = regrade_exam(self.exam.id)
+        regraded = self.state()
+
+        self.assertEqual(summary['changed_answers'], 3)
+        self.assertNotEqual(regraded, before)
+        self.assertEqual(len(regraded[3]), 2)
+
+        clear_answers(self.application)
+        TbStudentLearningProgress.objects.all().delete()
+        self.import_answers()
+
+        self.assertEqual(self.state(), regraded)
+
+
+# ============================================
+# AGREGADOS DAS RESPOSTAS
+# ============================================
+
+class ScoringTests(SqlTestCase):
+    """Agregados derivados das respostas (api.scoring)"""
+
+    def test_calculate_results(self):
+        first, second = self.students
+        self.answer(first, 1, 'A')
+        self.answer(first, 2, 'A')
+        self.answer(second, 2, '')
+
+        results = calculate_results(application_ids=[self.application.id])
+
+        self.assertEqual(results, {
+            (first.id_student, self.application.id): {
+                'total_score': Decimal('1.00'), 'max_score': Decimal('3.00'),
+                'correct_answers': 1, 'wrong_answers': 1, 'blank_answers': 0,
+            },
+            (second.id_student, self.application.id): {
+                'total_score': Decimal('0.00'), 'max_score': Decimal('2.00'),
+                'correct_answers': 0, 'wrong_answers': 0, 'blank_answers': 1,
+            },
+        })
+
+    def test_upsert_results(self):
+        first, second = self.students
+        self.answer(first, 1, 'A')
+        self.answer(first, 2, 'A')
+        self.answer(second, 1, '')
+        self.answer(second, 2, 'B')
+
+        self.assertEqual(upsert_results(application_ids=[self.application.id]), 2)
+        self.assertEqual(self.result(first), (Decimal('1.00'), Decimal('3.00'), 1, 1, 0))
+        self.assertEqual(self.result(second), (Decimal('2.00'), Decimal('3.00'), 1, 0, 1))
+
+        # Recalcular atualiza o resultado existente
+        TbStudentAnswers.objects.filter(id_student=first, id_question=self.questions[1]).update(
+            id_selected_alternative=self.alternatives[2, 'B'], is_correct=True
+        )
+        upsert_results(pairs=[(first.id_student, self.application.id)])
+        self.assertEqual(self.result(first), (Decimal('3.00'), Decimal('3.00'), 2, 0, 0))
+        self.assertEqual(TbExamResults.objects.count(), 2)
+
+    def test_learning_progress(self):
+        first, second = self.students
+        self.answer(first, 1, 'A')
+        self.answer(first, 2, 'B')
+        self.answer(second, 1, 'B')
+
+        upsert_learning_progress(application_ids=[self.application.id])
+
+        # Só a questão 1 tem descritor
+        progress = sorted(TbStudentLearningProgress.objects.values_list(
+            'id_student', 'id_descriptor', 'score', 'max_score', 'descriptor_mastery', 'assessment_date'
+        ))
+        descriptor, assessment_date = self.descriptor.id, date(2025, 6, 1)
+        self.assertEqual(progress, [
+            (first.id_student, descriptor, Decimal('1.00'), Decimal('1.00'), Decimal('100.00'), assessment_date),
+            (second.id_student, descriptor, Decimal('0.00'), Decimal('1.00'), Decimal('0.00'), assessment_date),
+        ])
+
+        # Recalcular atualiza a linha existente
+        TbStudentAnswers.objects.filter(id_student=second).update(
+            id_selected_alternative=self.alternatives[1, 'A'], is_correct=True
+        )
+        upsert_learning_progress(pairs=[(second.id_student, self.application.id)])
+        self.assertEqual(
+            TbStudentLearningProgress.objects.get(id_student=second).descriptor_mastery, Decimal('100.00')
+        )
+        self.assertEqual(TbStudentLearningProgress.objects.count(), 2)
+
+    def test_achievements(self):
+        first, second = self.students
+        self.answer(first, 1, 'A')
+        self.answer(first, 2, 'B')
+        self.answer(second, 1, 'B')
+
+        insert_achievements(application_ids=[self.application.id])
+        # Conquistas existentes são mantidas
+        insert_achievements(application_ids=[self.application.id])
+
+        self.assertEqual(
+            list(TbStudentDescriptorAchievements.objects.values_list(
+                'id_student', 'id_descriptor', 'id_exam_application'
+            )),
+            [(first.id_student, self.descriptor.id, self.application.id)]
+        )
+
+
+# ============================================
+# MANUTENÇÃO INCREMENTAL DOS AGREGADOS
+# ============================================
+
+class AnswerAggregateDeltaTests(SqlTestCase):
+    """A gravação de uma resposta pelo ORM deixa os agregados iguais ao recálculo completo"""
+
+    def aggregates(self):
+        return (
+            sorted(TbExamResults.objects.values_list(
+                'id_student', 'id_exam_application',
+                'total_score', 'max_score', 'correct_answers', 'wrong_answers', 'blank_answers'
+            )),
+            sorted(TbStudentLearningProgress.objects.values_list(
+                'id_student', 'id_descriptor', 'id_exam_application', 'score', 'max_score', 'descriptor_mastery'
+            )),
+            sorted(TbStudentDescriptorAchievements.objects.filter(
+                id_exam_application__isnull=False
+            ).values_list('id_student', 'id_descriptor', 'id_exam_application')),
+        )
+
+    def recomputed(self):
+        """Agregados recalculados do zero pelas respostas (desfeito ao final)"""
+        savepoint = transaction.savepoint()
+        TbExamResults.objects.all().delete()
+        TbStudentLearningProgress.objects.all().delete()
+        TbStudentDescriptorAchievements.objects.filter(id_exam_application__isnull=False).delete()
+        upsert_results(application_ids=[self.application.id])
+        upsert_learning_progress(application_ids=[self.application.id])
+        insert_achievements(application_ids=[self.application.id])
+        aggregates = self.aggregates()
+        transaction.savepoint_rollback(savepoint)
+        return aggregates
+
+    def assertMatchesRecompute(self):
+        aggregates = self.aggregates()
+        self.assertEqual(aggregates, self.recomputed())
+        return aggregates
+
+    def answer_sheet(self):
+        first, second = self.students
+        return [
+            self.answer(first, 1, 'A'),
+            self.answer(first, 2, 'A'),
+            self.answer(second, 1, 'B'),
+            self.answer(second, 2, ''),
+        ]
+
+    def test_create(self):
+        self.answer_sheet()
+
+        results, progress, achievements = self.assertMatchesRecompute()
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(progress), 2)
+        self.assertEqual(achievements, [(self.students[0].id_student, self.descriptor.id, self.application.id)])
+
+    def test_switch_right_to_wrong_alternative(self):
+        right = self.answer_sheet()[0]
+
+        right.id_selected_alternative = self.alternatives[1, 'B']
+        right.answer_text = 'B'
+        right.save()
+
+        right.refresh_from_db()
+        self.assertFalse(right.is_correct)
+        results, _, achievements = self.assertMatchesRecompute()
+        self.assertEqual(self.result(self.students[0]), (Decimal('0.00'), Decimal('3.00'), 0, 2, 0))
+        self.assertEqual(achievements, [])
+
+    def test_delete(self):
+        answers = self.answer_sheet()
+
+        answers[0].delete()
+        answers[3].delete()
+
+        self.assertMatchesRecompute()
+        self.assertEqual(self.result(self.students[0]), (Decimal('0.00'), Decimal('2.00'), 0, 1, 0))
+
+    def test_pair_without_result(self):
+        first = self.students[0]
+        # bulk_create não dispara sinais: respostas sem resultado nem progresso
+        TbStudentAnswers.objects.bulk_create([
+            TbStudentAnswers(
+                id_student=first, id_exam_application=self.application, id_question=self.questions[number - 1],
+                id_selected_alternative=self.alternatives[number, 'A'], answer_text='A', is_correct=number == 1
+            )
+            for number in (1, 2)
+        ])
+        self.assertIsNone(self.result(first))
+
+        # A diferença da questão editada não vale como resultado do aluno
+        answer = TbStudentAnswers.objects.get(id_student=first, id_question=self.questions[0])
+        answer.id_selected_alternative = self.alternatives[1, 'B']
+        answer.answer_text = 'B'
+        answer.save()
+
+        _, progress, _ = self.assertMatchesRecompute()
+        self.assertEqual(self.result(first), (Decimal('0.00'), Decimal('3.00'), 0, 2, 0))
+        self.assertEqual(len(progress), 1)
+
+    def test_manual_achievement_is_kept(self):
+        first = self.students[0]
+        TbStudentDescriptorAchievements.objects.create(id_student=first, id_descriptor=self.descriptor)
+        right = self.answer(first, 1, 'A')
+
+        right.id_selected_alternative = self.alternatives[1, 'B']
+        right.save()
+
+        self.assertMatchesRecompute()
+        self.assertEqual(
+            list(TbStudentDescriptorAchievements.objects.values_list('id_student', 'id_exam_application')),
+            [(first.id_student, None)]
+        )
+
+
+# ============================================
+# ANÁLISE DE ITENS
+# ============================================
+
+class ItemAnalysisTests(SimpleTestCase):
+    """Matriz de respostas e índices da análise de itens (api.item_analysis)"""
+
+    def test_response_matrix(self):
+        key = answer_key()
+        # (aluno, aplicação, questão, alternativa, correta); 0 = em branco
+        data = np.array([
+            [2, 1, 10, 11, 1],
+            [2, 1, 20, 0, 0],
+            [1, 1, 30, 33, 1],
+            [1, 1, 20, 11, 0],  # alternativa da questão 1
+            [1, 1, 99, 11, 0],  # questão de outra prova
+        ], dtype=np.int64)
+
+        students, responses, correct = _response_matrix(key, data)
+
+        self.assertEqual(students.tolist(), [[1, 1], [2, 1]])
+        self.assertEqual(responses.tolist(), [[NOT_ANSWERED, key.other_option, 3], [1, BLANK, NOT_ANSWERED]])
+        self.assertEqual(correct.tolist(), [[False, False, True], [True, False, False]])
+
+    def test_point_biserial_matches_hand_computation(self):
+        correct = np.array([
+            [1, 1, 1],
+            [1, 1, 0],
+            [1, 0, 0],
+            [0, 0, 0],
+        ], dtype=bool)
+        present = np.ones(correct.shape, dtype=bool)
+
+        # Questão 1: acertos (1, 1, 1, 0) e demais questões (2, 1, 0, 0):
+        # cov = 0,75 - 0,75², var = 0,1875 e 0,6875, r = √(3/11)
+        correlation = _point_biserial(correct, present)
+
+        self.assertAlmostEqual(correlation[0], (3 / 11) ** 0.5)
+        self.assertAlmostEqual(correlation[2], (3 / 11) ** 0.5)
+
+    def test_point_biserial_only_counts_students_who_answered(self):
+        correct = np.array([
+            [1, 1, 1],
+            [1, 0, 0],
+            [0, 1, 1],
+            [0, 0, 0],
+        ], dtype=bool)
+        present = np.ones(correct.shape, dtype=bool)
+        present[3, 2] = False
+
+        # Questão 3 entre os três primeiros: acertos (1, 0, 1) e demais
+        # (2, 1, 1): cov = 1 - 8/9, var = 2/9 e 2/9, r = 0,5
+        correlation = _point_biserial(correct, present)
+
+        self.assertAlmostEqual(correlation[2], 0.5)
+
+    def test_point_biserial_without_variation(self):
+        correct = np.array([[1, 1], [1, 0], [1, 1]], dtype=bool)
+        present = np.ones(correct.shape, dtype=bool)
+
+        correlation = _point_biserial(correct, present)
+
+        self.assertTrue(np.isnan(correlation[0]))
+
+
+# ============================================
+# TRI
+# ============================================
+
+class IrtTests(SimpleTestCase):
+    """Calibração 2PL e proficiência EAP (api.irt) com dados simulados"""
+
+    def simulate(self, students=2000, items=15, missing=0.0, seed=0):
+        rng = np.random.default_rng(seed)
+        theta = rng.standard_normal(students)
+        discrimination = rng.uniform(0.8, 2.0, items)
+        difficulty = rng.uniform(-1.5, 1.5, items)
+        probability = 1 / (1 + np.exp(-discrimination * (theta[:, None] - difficulty)))
+        correct = rng.random((students, items)) < probability
+        present = rng.random((students, items)) >= missing
+        return theta, discrimination, difficulty, correct, present
+
+    def test_calibrate_recovers_2pl_parameters(self):
+        theta, discrimination, difficulty, correct, present = self.simulate()
+
+        a, intercept, guessing, _, converged = calibrate(correct, present)
+
+        self.assertTrue(converged)
+        self.assertFalse(guessing.any())
+        self.assertLess(np.abs(a - discrimination).max(), 0.3)
+        self.assertLess(np.abs(-intercept / a - difficulty).max(), 0.25)
+
+    def test_calibrate_with_missing_responses(self):
+        theta, discrimination, difficulty, correct, present = self.simulate(missing=0.2, seed=1)
+
+        a, intercept, _, _, converged = calibrate(correct, present)
+
+        self.assertTrue(converged)
+        self.assertGreater(np.corrcoef(a, discrimination)[0, 1], 0.8)
+        self.assertGreater(np.corrcoef(-intercept / a, difficulty)[0, 1], 0.95)
+
+    def test_expected_a_posteriori(self):
+        theta, _, _, correct, present = self.simulate()
+        a, intercept, guessing, _, _ = calibrate(correct, present)
+
+        estimate, standard_error = expected_a_posteriori(correct, present, a, intercept, guessing)
+
+        self.assertGreater(np.corrcoef(estimate, theta)[0, 1], 0.85)
+        self.assertTrue((standard_error > 0).all() and (standard_error < 1).all())
+
+        # Sem respostas a posteriori é a priori: theta 0 e erro padrão ~1
+        none = np.zeros((1, correct.shape[1]), dtype=bool)
+        estimate, standard_error = expected_a_posteriori(none, none, a, intercept, guessing)
+        self.assertAlmostEqual(estimate[0], 0.0)
+        self.assertAlmostEqual(standard_error[0], 1.0, places=2)
+
+        # Mais acertos, proficiência maior
+        everything = np.ones((2, correct.shape[1]), dtype=bool)
+        everything[1] = False
+        estimate, _ = expected_a_posteriori(everything, np.ones_like(everything), a, intercept, guessing)
+        self.assertGreater(estimate[0], 1.0)
+        self.assertLess(estimate[1], -1.0)
+
+
+class IrtApiTests(SqlTestCase):
+    """Escala inválida e calibração inutilizável no POST /api/exams/{id}/irt/"""
+
+    def setUp(self):
+        for student in self.students:
+            self.answer(student, 1, 'A')
+            self.answer(student, 2, 'A')
+
+    def post(self, **data):
+        return APIClient().post(f'/api/exams/{self.exam.id}/irt/', data, format='json')
+
+    def assertNothingWritten(self):
+        self.assertFalse(TbQuestions.objects.filter(irt_discrimination__isnull=False).exists())
+        self.assertFalse(TbExamResults.objects.filter(theta__isnull=False).exists())
+
+    def test_invalid_scale(self):
+        for data in ({'scale_sd': 0}, {'scale_sd': -10}, {'scale_mean': 'nan'}, {'scale_sd': 'inf'}):
+            with self.subTest(data=data):
+                response = self.post(**data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('scale', response.json()['error'])
+
+    def test_too_few_students(self):
+        response = self.post()
+
+        self.assertEqual(response.status_code, 422)
+        self.assertIn(f'{irt.IRT_MIN_STUDENTS} aluno(s)', response.json()['error'])
+        self.assertNothingWritten()
+
+    def test_not_converged(self):
+        parameters = np.ones(2), np.zeros(2), np.zeros(2)
+        with mock.patch.object(irt, 'IRT_MIN_STUDENTS', 2), \
+                mock.patch.object(irt, 'calibrate', return_value=(*parameters, irt.EM_MAX_ITERATIONS, False)):
+            response = self.post()
+
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('não convergiu', response.json()['error'])
+        self.assertNothingWritten()
+
+
+# ============================================
+# FOLHA DE RESPOSTAS DA TURMA
+# ============================================
+
+class ClassSheetTests(SqlTestCase):
+    """Validação do POST /api/student-answers/bulk_create_class/"""
+
+    def post(self, students, application_id=None):
+        return APIClient().post('/api/student-answers/bulk_create_class/', {
+            'id_exam_application': application_id or self.application.id,
+            'students': students,
+        }, format='json')
+
+    def sheet(self, student, *options):
+        return {'id_student': student.id_student, 'answers': [
+            {'id_question': self.questions[number - 1].id, 'id_selected_alternative': alternative.id}
+            for number, alternative in enumerate(options, start=1)
+        ]}
+
+    def test_unknown_application(self):
+        response = self.post([self.sheet(self.students[0], self.alternatives[1, 'A'])], application_id=999999)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id_exam_application', response.json())
+        self.assertFalse(TbStudentAnswers.objects.exists())
+
+    def test_student_from_another_class(self):
+        other_class = TbClass.objects.create(
+            class_name='5º Ano B', id_teacher=self.teacher, id_school=self.school, school_year=2025, grade='5º Ano'
+        )
+        outsider = TbStudents.objects.create(student_serial=200, student_name='Aluno B', id_class=other_class)
+
+        response = self.post([
+            self.sheet(self.students[0], self.alternatives[1, 'A'], self.alternatives[2, 'B']),
+            self.sheet(outsider, self.alternatives[1, 'A'], self.alternatives[2, 'B']),
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['processed_students'], 1)
+        self.assertEqual(data['errors'], ['Aluno Aluno B (mat: 200) não pertence à turma da aplicação'])
+        self.assertFalse(TbStudentAnswers.objects.filter(id_student=outsider).exists())
+        self.assertIsNone(TbExamResults.objects.filter(id_student=outsider).first())
+        self.assertEqual(self.result(self.students[0]), (Decimal('3'), Decimal('3'), 2, 0, 0))
+
+    def test_alternative_from_another_question(self):
+        wrong = self.alternatives[2, 'B']
+
+        response = self.post([self.sheet(self.students[0], wrong, self.alternatives[2, 'B'])])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['errors'], [
+            f'Aluno Aluno 0: alternativa {wrong.id} não pertence à questão {self.questions[0].id}'
+        ])
+        answers = TbStudentAnswers.objects.filter(id_student=self.students[0])
+        self.assertEqual(list(answers.values_list('id_question', flat=True)), [self.questions[1].id])
+
+
+# ============================================
+# SALVAMENTO AUTOMÁTICO
+# ============================================
+
+class AutosaveTests(SqlTestCase):
+    """Buffer de respostas da prova online (api.autosave)"""
+
+    def test_flush_grades_buffer_without_result(self):
+        student = self.students[0]
+        save_answers(student.id_student, self.application.id, [
+            {'id_question': self.questions[0].id, 'id_selected_alternative': self.alternatives[1, 'B'].id},
+            {'id_question': self.questions[0].id, 'id_selected_alternative': self.alternatives[1, 'A'].id},
+            {'id_question': self.questions[1].id, 'id_selected_alternative': self.alternatives[1, 'B'].id},
+        ])
+
+        flushed, exam_ids = flush_answers()
+
+        self.assertEqual((flushed, exam_ids), (2, [self.questions[0].id_exam_id]))
+        answers = dict(
+            TbStudentAnswers.objects.filter(id_student=student)
+            .values_list('id_question', 'is_correct')
+        )
+        # A última marcação vale; alternativa de outra questão conta como erro
+        self.assertEqual(answers, {self.questions[0].id: True, self.questions[1].id: False})
+        self.assertIsNone(self.result(student))
+
+
+    def test_submit_closes_the_exam(self):
+        student = self.students[0]
+        submit_session(student.id_student, self.application.id, [
+            {'id_question': self.questions[0].id, 'id_selected_alternative': self.alternatives[1, 'A'].id},
+            {'id_question': self.questions[1].id, 'id_selected_alternative': self.alternatives[2, 'B'].id},
+        ])
+
+        self.assertEqual(self.result(student), (Decimal('3.00'), Decimal('3.00'), 2, 0, 0))
+
+        # Depois da entrega nada mais é salvo
+        saved = save_answers(student.id_student, self.application.id, [
+            {'id_question': self.questions[1].id, 'id_selected_alternative': self.alternatives[2, 'A'].id},
+        ])
+        self.assertEqual(saved, 0)
+        self.assertEqual(flush_answers(), (0, []))
+        self.assertEqual(self.result(student), (Decimal('3.00'), Decimal('3.00'), 2, 0, 0))
+
+
+# ============================================
+# CACHE DE GABARITOS
+# ============================================
+
+class AnswerKeyCacheTests(SqlTransactionTestCase):
+    """Gabaritos compilados em memória e versões em tb_cache_version"""
+
+    def setUp(self):
+        super().setUp()
+        answer_keys._compiled.clear()
+
+    def tearDown(self):
+        answer_keys._compiled.clear()
+        super().tearDown()
+
+    def version(self):
+        name = answer_key_version_name(self.exam.id)
+        return get_versions([name])[name]
+
+    def test_warm_key_only_reads_the_version(self):
+        key = get_answer_key(self.exam.id)
+
+        with self.assertNumQueries(1):
+            self.assertIs(get_answer_key(self.exam.id), key)
+
+    def test_question_change_recompiles(self):
+        key = get_answer_key(self.exam.id)
+        version = self.version()
+
+        question = self.questions[1]
+        question.points = Decimal('4')
+        question.save()
+
+        self.assertNotEqual(self.version(), version)
+        recompiled = get_answer_key(self.exam.id)
+        self.assertIsNot(recompiled, key)
+        self.assertEqual(recompiled.points.tolist(), [100, 400])
+
+    def test_alternative_change_recompiles(self):
+        key = get_answer_key(self.exam.id)
+        version = self.version()
+
+        alternative = self.alternatives[2, 'A']
+        alternative.is_correct = True
+        alternative.save()
+
+        self.assertNotEqual(self.version(), version)
+        recompiled = get_answer_key(self.exam.id)
+        self.assertIsNot(recompiled, key)
+        responses = recompiled.encode_letters([{1: 'A', 2: 'A'}])
+        self.assertEqual(recompiled.grade(responses).correct_count.tolist(), [2])
+
+    def test_key_read_inside_transaction_is_not_cached(self):
+        with transaction.atomic():
+            key = get_answer_key(self.exam.id)
+            self.assertNotIn(self.exam.id, answer_keys._compiled)
+
+        self.assertIsNot(get_answer_key(self.exam.id), key)
+        self.assertIn(self.exam.id, answer_keys._compiled)
+
+
+# ============================================
+# LEITURA DOS ARQUIVOS
+# ============================================
+
+class CsvEncodingTests(SimpleTestCase):
+    """Detecção da codificação dos CSVs lidos em trechos"""
+
+    def ascii_rows(self, size):
+        rows = []
+        while sum(len(row) for row in rows) < size:
+            rows.append(f'{len(rows)},Aluno {len(rows)}\n')
+        return ''.join(rows)
+
+    def test_latin1_after_sniffed_head_falls_back(self):
+        body = self.ascii_rows(IMPORT_SNIFF_SIZE * 2)
+        content = ('matricula,nome\n' + body).encode('ascii') + '999,José Conceição\n'.encode('latin-1')
+
+        rows = list(iter_csv_rows(csv_file(content)))
+
+        self.assertEqual(len(rows), body.count('\n') + 1)
+        self.assertEqual(rows[-1], {'matricula': '999', 'nome': 'José Conceição'})
+
+    def test_utf8_character_split_between_chunks(self):
+        head = 'matricula,nome\n'
+        padding = 'x' * (IMPORT_SNIFF_SIZE - len(head) - len('1,') - 1)
+        content = (head + '1,' + padding + 'é\n2,João\n').encode('utf-8')
+
+        rows = list(iter_csv_rows(csv_file(content)))
+
+        self.assertEqual(rows[0]['nome'], padding + 'é')
+        self.assertEqual(rows[1], {'matricula': '2', 'nome': 'João'})
+
+    def test_utf8_bom_and_quoted_newline(self):
+        content = '﻿matricula,nome\n1,"Maria\nda Silva"\n'.encode('utf-8')
+
+        rows = list(iter_csv_rows(csv_file(content)))
+
+        self.assertEqual(rows, [{'matricula': '1', 'nome': 'Maria\nda Silva'}])
+
+
+# ============================================
+# FILA DE IMPORTAÇÕES
+# ============================================
+
+class ImportJobTests(SqlTransactionTestCase):
+    """Reserva, retomada e execução dos jobs (api.jobs)"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def enqueue(self):
+        return enqueue_import('students', csv_file(b'matricula,nome\n1,Aluno\n2,Aluna\n', name='alunos.csv'))
+
+    def run_with(self, runner):
+        job = claim_next_job()
+        with mock.patch.dict(jobs.IMPORT_RUNNERS, {'students': runner}):
+            return run_import_job(job)
+
+    def test_claim_skips_locked_job(self):
+        locked_job, free_job = self.enqueue(), self.enqueue()
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    TbImportJob.objects.select_for_update().get(pk=locked_job.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            claimed = claim_next_job()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(claimed.pk, free_job.pk)
+        self.assertEqual((claimed.status, claimed.attempts), ('running', 1))
+        self.assertEqual(TbImportJob.objects.get(pk=locked_job.pk).status, 'pending')
+
+    def test_requeue_stale_job(self):
+        stale, exhausted, alive = self.enqueue(), self.enqueue(), self.enqueue()
+        TbImportJob.objects.filter(pk=stale.pk).update(status='running', attempts=1)
+        TbImportJob.objects.filter(pk=exhausted.pk).update(status='running', attempts=JOB_MAX_ATTEMPTS)
+        TbImportJob.objects.filter(pk__in=[stale.pk, exhausted.pk]).update(
+            updated_at=timezone.now() - timedelta(minutes=10)
+        )
+        TbImportJob.objects.filter(pk=alive.pk).update(status='running', attempts=1)
+
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=5)), 2)
+
+        statuses = dict(TbImportJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {stale.pk: 'pending', exhausted.pk: 'failed', alive.pk: 'running'})
+
+    def test_heartbeat_keeps_long_job_running(self):
+        self.enqueue()
+        requeued = []
+
+        def slow_runner(file, progress=None, **params):
+            # Sem progresso reportado por mais tempo que o prazo de retomada
+            time.sleep(0.5)
+            requeued.append(requeue_stale_jobs(timedelta(seconds=0.2)))
+            return {'success': True, 'error_count': 0}
+
+        with mock.patch.object(jobs, 'JOB_HEARTBEAT_INTERVAL', 0.05):
+            job = self.run_with(slow_runner)
+
+        self.assertEqual(requeued, [0])
+        self.assertEqual((job.status, job.attempts, job.processed_rows), ('completed', 1, 2))
+
+    def test_failed_job(self):
+        self.enqueue()
+        self.enqueue()
+
+        def failing_runner(file, progress=None, **params):
+            raise RuntimeError('falha inesperada')
+
+        def invalid_file_runner(file, progress=None, **params):
+            raise ImportFileError('Arquivo vazio')
+
+        job = self.run_with(failing_runner)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error_message, 'Erro ao processar arquivo: falha inesperada')
+        self.assertIsNotNone(job.finished_at)
+
+        job = self.run_with(invalid_file_runner)
+        self.assertEqual((job.status, job.error_message), ('failed', 'Arquivo vazio'))
+
+
+# ============================================
+# RETOMADA DA IMPORTAÇÃO DE RESPOSTAS
+# ============================================
+
+class AnswerImportCheckpointTests(SqlTestCase):
+    """Checkpoints retomam uma importação interrompida e somem ao concluí-la"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_class = TbClass.objects.create(
+            class_name='5º Ano B', id_teacher=cls.teacher, id_school=cls.school, school_year=2025, grade='5º Ano'
+        )
+        for serial in (102, 103):
+            TbStudents.objects.create(student_serial=serial, student_name=f'Aluno {serial}', id_class=cls.other_class)
+
+    def import_answers(self):
+        return run_student_answers_import(answers_csv([
+            ('P1', self.class_obj.id, 100, 'A', 'B'),
+            ('P1', self.class_obj.id, 101, 'B', ''),
+            ('P1', self.other_class.id, 102, 'A', 'A'),
+            ('P1', self.other_class.id, 103, '', 'B'),
+        ]))
+
+    def test_interrupt_resume_and_upload_again(self):
+        save_application_answers = imports._save_application_answers
+
+        def interrupted(app_data, index):
+            if app_data['class'].id == self.other_class.id:
+                raise RuntimeError('conexão perdida')
+            return save_application_answers(app_data, index)
+
+        with mock.patch.object(imports, '_save_application_answers', interrupted):
+            response = self.import_answers()
+
+        self.assertEqual(response['processed_students'], 2)
+        self.assertEqual(TbImportCheckpoint.objects.count(), 1)
+
+        # Reenvio do mesmo arquivo: retoma da turma que faltou
+        response = self.import_answers()
+
+        self.assertEqual(len(response['resumed_applications']), 1)
+        self.assertEqual(response['processed_students'], 2)
+        self.assertEqual(TbStudentAnswers.objects.count(), 8)
+        self.assertFalse(TbImportCheckpoint.objects.exists())
+
+        # Respostas excluídas depois da importação concluída: o mesmo arquivo
+        # é importado inteiro de novo, sem pular nenhuma aplicação
+        TbStudentDescriptorAchievements.objects.all().delete()
+        TbExamResults.objects.all().delete()
+        TbStudentAnswers.objects.all().delete()
+
+        response = self.import_answers()
+
+        self.assertNotIn('resumed_applications', response)
+        self.assertEqual(response['processed_students'], 4)
+        self.assertEqual(TbStudentAnswers.objects.count(), 8)
+        self.assertEqual(TbExamResults.objects.count(), 4)
+        self.assertFalse(TbImportCheckpoint.objects.exists())
+
+
+# ============================================
+# IMPORTAÇÃO DE RESPOSTAS POR COPY
+# ============================================
+
+class CopyAnswerImportTests(SqlTestCase):
+    """copy=True grava o mesmo que a importação pelo ORM"""
+
+    def state(self):
+        return answer_state() + (sorted(TbStudentLearningProgress.objects.values_list(
+            'id_student__student_serial', 'id_descriptor__descriptor_code',
+            'score', 'max_score', 'descriptor_mastery'
+        )),)
+
+    def import_answers(self, copy):
+        response = run_student_answers_import(answers_csv([
+            ('P1', self.class_obj.id, 100, 'A', 'B'),
+            ('P1', self.class_obj.id, 101, 'B', ''),
+            ('P1', self.class_obj.id, 999, 'A', 'A'),
+            ('P1', self.class_obj.id, 100, 'B', 'B'),
+            ('P9', self.class_obj.id, 101, 'A', 'A'),
+        ]), copy=copy)
+        return response['processed_students'], response['error_count']
+
+    def test_copy_matches_orm(self):
+        orm_response = self.import_answers(copy=False)
+        orm_state = self.state()
+
+        clear_answers(self.application)
+        TbStudentLearningProgress.objects.all().delete()
+        copy_response = self.import_answers(copy=True)
+
+        self.assertEqual(copy_response, orm_response)
+        self.assertEqual(self.state(), orm_state)
+        self.assertEqual(len(orm_state[0]), 4)
+        self.assertEqual(len(orm_state[3]), 2)
+
+
+# ============================================
+# LEITURA DAS RESPOSTAS POR APLICAÇÃO
+# ============================================
+
+class AnswerApplicationReaderTests(SqlTestCase):
+    """Cada aplicação sai da memória assim que a sua última linha é lida"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_class = TbClass.objects.create(
+            class_name='5º Ano B', id_teacher=cls.teacher, id_school=cls.school, school_year=2025, grade='5º Ano'
+        )
+        for serial in (102, 103):
+            TbStudents.objects.create(student_serial=serial, student_name=f'Aluno {serial}', id_class=cls.other_class)
+
+    def read(self, rows):
+        """Aplicações entregues, com as linhas lidas até a entrega de cada uma"""
+        rows = [
+            {'codigo_prova': code, 'id_turma': str(class_id), 'matricula_aluno': str(serial), 'q1': q1}
+            for code, class_id, serial, q1 in rows
+        ]
+        last_rows = {}
+        for idx, row in enumerate(rows, start=2):
+            last_rows[(row['codigo_prova'], int(row['id_turma']))] = idx
+        index = AnswerImportIndex({'P1'}, {self.class_obj.id, self.other_class.id}, {100, 101, 102, 103})
+        index.load_answer_keys([self.exam])
+
+        read_rows = []
+
+        def counted():
+            for row in rows:
+                read_rows.append(row)
+                yield row
+
+        reader = AnswerApplicationReader(index, last_rows, set())
+        delivered = [
+            (app_key[1], len(read_rows), [data['student'].student_serial for data in app_data['students_answers']])
+            for app_key, app_data in reader.applications(counted())
+        ]
+        return reader, delivered
+
+    def test_grouped_file(self):
+        reader, delivered = self.read([
+            ('P1', self.class_obj.id, 100, 'A'),
+            ('P1', self.class_obj.id, 101, 'B'),
+            ('P1', self.other_class.id, 102, 'A'),
+            ('P1', self.other_class.id, 999, 'A'),
+            ('P1', self.other_class.id, 103, 'B'),
+        ])
+
+        self.assertEqual(delivered, [
+            (self.class_obj.id, 2, [100, 101]),
+            (self.other_class.id, 5, [102, 103]),
+        ])
+        self.assertEqual(len(reader.errors), 1)
+        self.assertEqual(reader.finished_rows, 1)
+
+    def test_interleaved_file(self):
+        _, delivered = self.read([
+            ('P1', self.class_obj.id, 100, 'A'),
+            ('P1', self.other_class.id, 102, 'A'),
+            ('P1', self.class_obj.id, 101, 'B'),
+            ('P1', self.other_class.id, 103, 'B'),
+        ])
+
+        self.assertEqual(delivered, [
+            (self.class_obj.id, 3, [100, 101]),
+            (self.other_class.id, 4, [102, 103]),
+        ])
+
+    def test_import_interleaved_file(self):
+        response = run_student_answers_import(answers_csv([
+            ('P1', self.other_class.id, 102, 'A', 'B'),
+            ('P1', self.class_obj.id, 100, 'A', 'B'),
+            ('P1', self.other_class.id, 103, 'B', ''),
+            ('P1', self.class_obj.id, 101, '', 'A'),
+        ]))
+
+        self.assertEqual((response['processed_students'], response['error_count']), (4, 0))
+        self.assertEqual(TbStudentAnswers.objects.count(), 8)
+        self.assertEqual(TbExamResults.objects.count(), 4)
@@ -43,6 +43,7 @@ router.register(r'exam-applications', TbExamApplicationsViewSet, basename='exam-
 router.register(r'assessment-metadata', TbAssessmentMetadataViewSet, basename='assessment-metadata')
 router.register(r'student-answers', TbStudentAnswersViewSet, basename='student-answer')
 router.register(r'exam-results', TbExamResultsViewSet, basename='exam-result')
+router.register(r'exam-sessions', ExamSessionViewSet, basename='exam-session')
 
 # ============================================
 # ROTAS DE PROGRESSO E CONQUISTAS
@@ -66,6 +67,12 @@ router.register(r'student-profiles', TbStudentProfileViewSet, basename='student-
 router.register(r'alerts', TbAlertViewSet, basename='alert')
 router.register(r'dashboard-secretaria', DashboardSecretariaViewSet, basename='dashboard-secretaria')
 
+# ============================================
+# ROTAS DE IMPORTAÇÕES EM SEGUNDO PLANO
+# ============================================
+router.register(r'import-jobs', TbImportJobViewSet, basename='import-job')
+router.register(r'import-errors', ImportErrorReportViewSet, basename='import-error-report')
+
 
 urlpatterns = [
     path('', include(router.urls)),
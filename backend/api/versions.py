@@ -0,0 +1,50 @@
+"""
+Versões de dados guardadas no banco (tb_cache_version).
+
+Caches em memória por processo (gabaritos compilados, análise de itens)
+guardam a versão em que foram montados e a comparam com a do banco a cada
+uso. Como a versão fica no PostgreSQL, a troca feita por qualquer processo
+(worker web, worker de importações, comandos de manutenção) vale para todos,
+sem depender de um cache compartilhado.
+
+Cada versão é um token aleatório, e não um contador: uma troca desfeita por
+rollback nunca volta a coincidir com uma versão já vista por outro processo.
+"""
+import uuid
+
+from django.db import connection
+
+
+def get_versions(names):
+    """Versões atuais, em dict nome -> token ('' quando nunca trocada)"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name, version FROM tb_cache_version WHERE name = ANY(%s::varchar[])',
+            [names]
+        )
+        versions = {name: str(version) for name, version in cursor.fetchall()}
+    return {name: versions.get(name, '') for name in names}
+
+
+def bump_versions(names):
+    """
+    Troca as versões com uma única instrução, na transação corrente.
+
+    Os nomes são gravados em ordem para que transações concorrentes travem as
+    linhas na mesma sequência.
+    """
+    names = sorted(set(names))
+    if not names:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO tb_cache_version (name, version, updated_at)
+            SELECT v.name, v.version, now()
+            FROM unnest(%s::varchar[], %s::uuid[]) AS v(name, version)
+            ON CONFLICT (name) DO UPDATE SET
+                version = EXCLUDED.version,
+                updated_at = EXCLUDED.updated_at
+        """, [names, [str(uuid.uuid4()) for _ in names]])
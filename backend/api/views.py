@@ -1,12 +1,85 @@
+import csv
+import uuid
+
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import transaction
-from django.db.models import Count, Avg, Max, Min, Q
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Count, Avg, Max, Min
 
 from students.models import *
 from .serializers import *
+from .imports import (
+    IMPORT_INSERT_BATCH_SIZE, GradedApplication, ImportFileError,
+    run_answer_key_import, run_student_answers_import, run_student_import,
+    save_results_and_descriptors,
+)
+from .answer_keys import get_answer_key
+from .autosave import save_answers, submit_session
+from .irt import IRT_MODELS, ProficiencyError, check_scale, estimate_exam_proficiency
+from .item_analysis import get_item_analysis, invalidate_answer_data
+from .jobs import enqueue_import
+from .regrading import regrade_exam
+from .scoring import insert_achievements, upsert_learning_progress, upsert_results
+
+
+def request_flag(request, name):
+    """Lê uma opção booleana enviada no formulário ou na query string"""
+    value = request.data.get(name, request.query_params.get(name))
+    return str(value or '').strip().lower() in ('1', 'true', 'sim', 'yes')
+
+
+def answer_question_id(answer):
+    """ID da questão de uma resposta enviada no lançamento (None se inválido)"""
+    try:
+        return int(answer.get('id_question'))
+    except (TypeError, ValueError):
+        return None
+
+
+def answer_alternative_id(key, question_id, answer):
+    """
+    ID da alternativa marcada numa resposta enviada, validado pelo gabarito.
+
+    Retorna (id, None), com id None para resposta em branco, ou (None,
+    mensagem de erro) quando a alternativa não existe ou é de outra questão.
+    """
+    alternative_id = answer.get('id_selected_alternative')
+    if alternative_id in (None, ''):
+        return None, None
+    try:
+        alternative_id = int(alternative_id)
+    except (TypeError, ValueError):
+        return None, f"Alternativa inválida: {answer.get('id_selected_alternative')}"
+    option = key.alternative_options.get(alternative_id)
+    if option is None or option[0] != key.question_columns[question_id]:
+        return None, f"Alternativa {alternative_id} não pertence à questão {question_id}"
+    return alternative_id, None
+
+
+def enqueue_import_response(request, import_type, file, params):
+    """Enfileira a importação e responde 202 com o endereço para acompanhar o job"""
+    job = enqueue_import(import_type, file, params)
+    return Response({
+        'success': True,
+        'message': 'Importação enviada para processamento em segundo plano',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('import-job-detail', args=[job.id]))
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def add_error_report_url(request, response_data):
+    """Inclui na resposta da importação o endereço do relatório de erros em CSV"""
+    report_id = response_data.get('error_report_id')
+    if report_id:
+        response_data['error_report_url'] = reverse(
+            'import-error-report-detail', args=[report_id], request=request
+        )
+    return response_data
 
 # ============================================
 # VIEWSETS DE LOCALIZAÇÃO E ESTRUTURA
@@ -170,125 +243,14 @@ class TbStudentsViewSet(viewsets.ModelViewSet):
         - Turma / id_class: Nome ou ID da turma (obrigatório)
         - Data de Matrícula / enrollment_date: Data de matrícula (opcional, formato YYYY-MM-DD)
         - Status / status: Status (opcional, padrão: enrolled)
-        """
-        import csv
-        import io
-        from datetime import datetime
-        import re
-
-        # Mapeamento de nomes de colunas (português -> inglês)
-        COLUMN_MAPPING = {
-            'nome do aluno': 'student_name',
-            'nome': 'student_name',
-            'aluno': 'student_name',
-            'matrícula': 'student_serial',
-            'matricula': 'student_serial',
-            'turma': 'id_class',
-            'classe': 'id_class',
-            'data de matrícula': 'enrollment_date',
-            'data de matricula': 'enrollment_date',
-            'data': 'enrollment_date',
-            'status': 'status',
-            'situação': 'status',
-            'situacao': 'status',
-        }
-
-        # Mapeamento de status (português -> inglês)
-        STATUS_MAPPING = {
-            'matriculado': 'enrolled',
-            'transferido': 'transferred',
-            'formado': 'graduated',
-            'desistente': 'dropped',
-            'ativo': 'active',
-            'inativo': 'inactive',
-        }
-
-        def normalize_column_name(column):
-            """Normaliza o nome da coluna para o padrão em inglês"""
-            if not column:
-                return None
-
-            # Remove espaços extras e converte para minúsculas
-            normalized = column.strip().lower()
-
-            # Se já está em inglês, retorna
-            if normalized in ['student_name', 'student_serial', 'id_class', 'enrollment_date', 'status']:
-                return normalized
-
-            # Busca no mapeamento
-            return COLUMN_MAPPING.get(normalized, normalized)
-
-        def normalize_status(status_value):
-            """Normaliza o status para o padrão em inglês"""
-            if not status_value:
-                return 'enrolled'  # Padrão
-
-            # Remove espaços extras e converte para minúsculas
-            normalized = str(status_value).strip().lower()
-
-            # Se já está em inglês, retorna
-            if normalized in ['enrolled', 'transferred', 'graduated', 'dropped', 'active', 'inactive']:
-                return normalized
-
-            # Busca no mapeamento PT -> EN
-            return STATUS_MAPPING.get(normalized, normalized)
-
-        def find_class_by_name_or_id(value, school_id=None):
-            """Busca turma por nome ou ID, opcionalmente filtrando por escola"""
-            if not value:
-                return None, "Valor da turma não fornecido"
-
-            # Remove espaços extras
-            value = str(value).strip()
-
-            # Base queryset - filtra por escola se fornecido
-            base_queryset = TbClass.objects.all()
-            if school_id:
-                base_queryset = base_queryset.filter(id_school_id=school_id)
-
-            # Tenta primeiro como ID numérico
-            try:
-                class_id = int(value)
-                try:
-                    return base_queryset.get(id=class_id), None
-                except TbClass.DoesNotExist:
-                    pass  # Continua para tentar por nome
-            except (ValueError, TypeError):
-                pass  # Não é um número, tenta por nome
-
-            # Tenta buscar por nome exato
-            try:
-                return base_queryset.get(class_name__iexact=value), None
-            except TbClass.DoesNotExist:
-                pass
-
-            # Tenta buscar por nome parcial (case insensitive)
-            classes = base_queryset.filter(class_name__icontains=value)
-            if classes.count() == 1:
-                return classes.first(), None
-            elif classes.count() > 1:
-                class_names = ", ".join([c.class_name for c in classes[:3]])
-                return None, f"Múltiplas turmas encontradas para '{value}': {class_names}"
-
-            # Tenta extrair ano e turma (ex: "5º Ano A", "ano: 5º ano")
-            match = re.search(r'(\d+)[º°]?\s*(?:ano)?', value.lower())
-            if match:
-                grade_num = match.group(1)
-                # Busca por grade que contenha esse número
-                classes = base_queryset.filter(
-                    Q(grade__icontains=f"{grade_num}º") |
-                    Q(grade__icontains=f"{grade_num}°") |
-                    Q(class_name__icontains=value)
-                )
-                if classes.count() == 1:
-                    return classes.first(), None
-                elif classes.count() > 1:
-                    class_names = ", ".join([c.class_name for c in classes[:3]])
-                    return None, f"Múltiplas turmas encontradas: {class_names}"
-
-            school_msg = f" na escola selecionada" if school_id else ""
-            return None, f"Turma '{value}' não encontrada{school_msg}"
 
+        Em arquivos Excel, o campo opcional "sheet" escolhe a planilha (nome ou
+        posição a partir de 1); sem ele é usada a planilha ativa. Com
+        background=1 o arquivo vai para a fila de importações e a resposta
+        (202) traz o job_id para acompanhar em /api/import-jobs/{id}/. Com
+        dry_run=1 o arquivo é só validado: a resposta (200) traz o que seria
+        importado e os erros, sem gravar nada.
+        """
         file = request.FILES.get('file')
         if not file:
             return Response({'error': 'Nenhum arquivo enviado'}, status=status.HTTP_400_BAD_REQUEST)
@@ -321,165 +283,23 @@ class TbStudentsViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Processa arquivo CSV
-            if file_extension == 'csv':
-                 # Try multiple encodings to handle different file formats
-                file_content = file.read()
-                decoded_file = None
-                encodings_to_try = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
- 
-                for encoding in encodings_to_try:
-                    try:
-                        decoded_file = file_content.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
- 
-                if decoded_file is None:
-                    return Response(
-                        {'error': 'Erro ao processar arquivo: codificação não suportada. Por favor, salve o arquivo como UTF-8.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                reader = csv.DictReader(io.StringIO(decoded_file))
-                rows = list(reader)
-            # Processa arquivo Excel
-            else:
-                try:
-                    import openpyxl
-                    workbook = openpyxl.load_workbook(file)
-                    sheet = workbook.active
-                    headers = [cell.value for cell in sheet[1]]
-                    rows = []
-                    for row in sheet.iter_rows(min_row=2, values_only=True):
-                        rows.append(dict(zip(headers, row)))
-                except ImportError:
-                    return Response(
-                        {'error': 'Biblioteca openpyxl não instalada. Use arquivo CSV.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            if not rows:
-                return Response({'error': 'Arquivo vazio'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Normaliza os nomes das colunas na primeira linha
-            normalized_rows = []
-            for row in rows:
-                normalized_row = {}
-                for key, value in row.items():
-                    normalized_key = normalize_column_name(key)
-                    if normalized_key:
-                        normalized_row[normalized_key] = value
-                normalized_rows.append(normalized_row)
-
-            # Valida e processa os dados
-            students_created = []
-            students_updated = []
-            errors = []
-            missing_classes = set()  # Rastreia turmas não encontradas
-
-            with transaction.atomic():
-                for idx, row in enumerate(normalized_rows, start=2):
-                    try:
-                        # Validação dos campos obrigatórios
-                        student_name = row.get('student_name', '').strip() if row.get('student_name') else ''
-                        student_serial = row.get('student_serial')
-                        class_value = row.get('id_class')
-
-                        if not student_name:
-                            errors.append(f"Linha {idx}: Nome do aluno é obrigatório")
-                            continue
-
-                        if not student_serial:
-                            errors.append(f"Linha {idx}: Matrícula é obrigatória")
-                            continue
-
-                        if not class_value:
-                            errors.append(f"Linha {idx}: Turma é obrigatória")
-                            continue
-
-                        # Converte matrícula para inteiro
-                        try:
-                            student_serial = int(student_serial)
-                        except (ValueError, TypeError):
-                            errors.append(f"Linha {idx}: Matrícula deve ser um número")
-                            continue
-
-                        # Busca a turma por nome ou ID (filtrando por escola se fornecido)
-                        class_obj, error = find_class_by_name_or_id(class_value, school_id)
-                        if not class_obj:
-                            errors.append(f"Linha {idx} ({student_name}): {error}")
-                            missing_classes.add(str(class_value))
-                            continue
-
-                        # Processa campos opcionais
-                        enrollment_date = row.get('enrollment_date')
-                        if enrollment_date:
-                            if isinstance(enrollment_date, str):
-                                try:
-                                    enrollment_date = datetime.strptime(enrollment_date, '%Y-%m-%d').date()
-                                except ValueError:
-                                    errors.append(f"Linha {idx}: Data de matrícula inválida (use YYYY-MM-DD)")
-                                    continue
-                        else:
-                            enrollment_date = datetime.now().date()
-
-                        # Normaliza o status (aceita PT ou EN)
-                        student_status = normalize_status(row.get('status'))
-
-                        # Verifica se o aluno já existe (por matrícula)
-                        student, created = TbStudents.objects.update_or_create(
-                            student_serial=student_serial,
-                            defaults={
-                                'student_name': student_name,
-                                'id_class': class_obj,
-                                'enrollment_date': enrollment_date,
-                                'status': student_status
-                            }
-                        )
-
-                        if created:
-                            students_created.append(student.student_name)
-                        else:
-                            students_updated.append(student.student_name)
-
-                    except Exception as e:
-                        errors.append(f"Linha {idx}: {str(e)}")
-                        continue
-
-            # Se houver turmas não encontradas, lista as turmas disponíveis (filtradas por escola se fornecido)
-            available_classes = None
-            if missing_classes:
-                classes_query = TbClass.objects.all()
-                if school_id:
-                    classes_query = classes_query.filter(id_school_id=school_id)
-                all_classes = classes_query.values('id', 'class_name', 'grade')
-                available_classes = [
-                    {
-                        'id': c['id'],
-                        'name': c['class_name'],
-                        'grade': c['grade']
-                    }
-                    for c in all_classes
-                ]
-
-            response_data = {
-                'success': True,
-                'message': f'{len(students_created)} alunos criados, {len(students_updated)} alunos atualizados',
-                'created': len(students_created),
-                'updated': len(students_updated),
-                'errors': errors if errors else None
+            params = {
+                'school_id': school_id,
+                'sheet': request.data.get('sheet'),
+                'dry_run': request_flag(request, 'dry_run')
             }
+            if request_flag(request, 'background'):
+                return enqueue_import_response(request, 'students', file, params)
 
-            # Adiciona informações extras quando houver erros
-            if missing_classes:
-                response_data['missing_classes'] = list(missing_classes)
-                response_data['available_classes'] = available_classes
-                school_filter_msg = f" na escola selecionada" if school_id else ""
-                response_data['suggestion'] = f'Algumas turmas não foram encontradas{school_filter_msg}. Verifique se as turmas existem no sistema antes de importar os alunos.'
-
-            return Response(response_data, status=status.HTTP_201_CREATED if students_created else status.HTTP_200_OK)
+            response_data = add_error_report_url(request, run_student_import(file, **params))
+            created = response_data['created'] and not params['dry_run']
+            return Response(
+                response_data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            )
 
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {'error': f'Erro ao processar arquivo: {str(e)}'},
@@ -583,6 +403,76 @@ class TbExamsViewSet(viewsets.ModelViewSet):
 
         return Response(stats)
 
+    @action(detail=True, methods=['get'])
+    def item_analysis(self, request, pk=None):
+        """
+        Análise clássica dos itens da prova sobre todas as respostas gravadas.
+
+        Por questão: dificuldade (proporção de acertos), discriminação
+        (ponto-bisserial corrigida) e frequência de cada alternativa.
+        """
+        exam = self.get_object()
+        return Response(get_item_analysis(exam.id))
+
+    @action(detail=True, methods=['post'])
+    def regrade(self, request, pk=None):
+        """
+        Recorrige a prova com o gabarito atual (após reimportar o gabarito).
+
+        Atualiza is_correct das respostas e refaz resultados e conquistas de
+        descritores de todas as aplicações da prova.
+        """
+        exam = self.get_object()
+        summary = regrade_exam(exam.id)
+
+        return Response({
+            'success': True,
+            'message': f"Prova {exam.exam_code} recorrigida: {summary['results']} resultado(s) atualizado(s)",
+            **summary
+        })
+
+    @action(detail=True, methods=['post'])
+    def irt(self, request, pk=None):
+        """
+        Calibra os itens da prova pela TRI e estima a proficiência dos alunos.
+
+        Body (opcional): model ("2pl" ou "3pl", padrão "2pl"), scale_mean e
+        scale_sd (escala das notas, padrão 250 e 50). Grava os parâmetros nas
+        questões e theta, erro padrão e nota na escala nos resultados. Prova
+        com poucas respostas ou calibração que não converge retorna 422.
+        """
+        exam = self.get_object()
+        model = request.data.get('model', '2pl')
+        if model not in IRT_MODELS:
+            return Response(
+                {'error': f"model deve ser um de: {', '.join(IRT_MODELS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            scale = {
+                name: float(request.data[name])
+                for name in ('scale_mean', 'scale_sd') if name in request.data
+            }
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'scale_mean e scale_sd devem ser números'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            check_scale(**scale)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            summary = estimate_exam_proficiency(exam.id, model=model, **scale)
+        except ProficiencyError as e:
+            return Response({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response({
+            'success': True,
+            'message': f"Proficiência estimada para {summary['results']} resultado(s) da prova {exam.exam_code}",
+            **summary
+        })
+
     @action(detail=True, methods=['post'])
     def upload_file(self, request, pk=None):
         """
@@ -704,11 +594,14 @@ class TbExamsViewSet(viewsets.ModelViewSet):
         - pontos: Pontos da questão (ex: 1.0, 1.5)
         - dificuldade: Dificuldade (easy, medium, hard)
         - enunciado: Texto da questão (opcional)
-        """
-        import csv
-        import io
-        from decimal import Decimal
 
+        Em arquivos Excel, o campo opcional "sheet" escolhe a planilha (nome ou
+        posição a partir de 1); sem ele é usada a planilha ativa. Com
+        background=1 o arquivo vai para a fila de importações e a resposta
+        (202) traz o job_id para acompanhar em /api/import-jobs/{id}/. Com
+        dry_run=1 o arquivo é só validado: a resposta (200) traz o que seria
+        importado e os erros, sem gravar nada.
+        """
         file = request.FILES.get('file')
         if not file:
             return Response({'error': 'Nenhum arquivo enviado'}, status=status.HTTP_400_BAD_REQUEST)
@@ -722,192 +615,21 @@ class TbExamsViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Processa arquivo
-            if file_extension == 'csv':
-                 # Try multiple encodings to handle different file formats
-                file_content = file.read()
-                decoded_file = None
-                encodings_to_try = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
- 
-                for encoding in encodings_to_try:
-                    try:
-                        decoded_file = file_content.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                if decoded_file is None:
-                    return Response(
-                        {'error': 'Erro ao processar arquivo: codificação não suportada. Por favor, salve o arquivo como UTF-8.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                reader = csv.DictReader(io.StringIO(decoded_file))
-                rows = list(reader)
-            else:
-                try:
-                    import openpyxl
-                    workbook = openpyxl.load_workbook(file)
-                    sheet = workbook.active
-                    headers = [cell.value for cell in sheet[1]]
-                    rows = []
-                    for row in sheet.iter_rows(min_row=2, values_only=True):
-                        rows.append(dict(zip(headers, row)))
-                except ImportError:
-                    return Response(
-                        {'error': 'Biblioteca openpyxl não instalada. Use CSV.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            if not rows:
-                return Response({'error': 'Arquivo vazio'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Agrupa questões por código de prova
-            exams_data = {}
-            errors = []
-            descriptors_not_found = set()
-
-            for idx, row in enumerate(rows, start=2):
-                try:
-                    codigo_prova = str(row.get('codigo_prova', '')).strip()
-                    nome_prova = str(row.get('nome_prova', '')).strip()
-                    disciplina = str(row.get('disciplina', '')).strip()
-                    ano_escolar = row.get('ano_escolar')
-                    numero_questao = row.get('numero_questao')
-                    resposta_correta = str(row.get('resposta_correta', '')).strip().upper()
-                    codigo_descritor = str(row.get('codigo_descritor', '')).strip()
-                    pontos = row.get('pontos', 1.0)
-                    dificuldade = str(row.get('dificuldade', 'medium')).strip().lower()
-                    enunciado = str(row.get('enunciado', '')).strip()
-
-                    # Validações
-                    if not codigo_prova:
-                        errors.append(f"Linha {idx}: codigo_prova obrigatório")
-                        continue
-                    if not nome_prova:
-                        errors.append(f"Linha {idx}: nome_prova obrigatório")
-                        continue
-                    if not numero_questao:
-                        errors.append(f"Linha {idx}: numero_questao obrigatório")
-                        continue
-                    if not resposta_correta or resposta_correta not in ['A', 'B', 'C', 'D', 'E']:
-                        errors.append(f"Linha {idx}: resposta_correta deve ser A, B, C, D ou E")
-                        continue
-
-                    # Converte tipos
-                    try:
-                        numero_questao = int(numero_questao)
-                        pontos = Decimal(str(pontos))
-                        if ano_escolar:
-                            ano_escolar = str(ano_escolar).strip()
-                    except (ValueError, TypeError) as e:
-                        errors.append(f"Linha {idx}: Erro de conversão - {str(e)}")
-                        continue
-
-                    # Valida descritor
-                    descriptor = None
-                    if codigo_descritor:
-                        try:
-                            descriptor = TbDescriptorsCatalog.objects.get(descriptor_code=codigo_descritor)
-                        except TbDescriptorsCatalog.DoesNotExist:
-                            descriptors_not_found.add(codigo_descritor)
-
-                    # Agrupa por prova
-                    if codigo_prova not in exams_data:
-                        exams_data[codigo_prova] = {
-                            'nome_prova': nome_prova,
-                            'disciplina': disciplina,
-                            'ano_escolar': ano_escolar,
-                            'questions': []
-                        }
-
-                    exams_data[codigo_prova]['questions'].append({
-                        'numero_questao': numero_questao,
-                        'resposta_correta': resposta_correta,
-                        'descriptor': descriptor,
-                        'pontos': pontos,
-                        'dificuldade': dificuldade,
-                        'enunciado': enunciado
-                    })
-
-                except Exception as e:
-                    errors.append(f"Linha {idx}: {str(e)}")
-                    continue
-
-            # Cria provas e questões
-            created_exams = []
-            with transaction.atomic():
-                for codigo_prova, exam_data in exams_data.items():
-                    # Verifica se prova já existe
-                    exam, created = TbExams.objects.get_or_create(
-                        exam_code=codigo_prova,
-                        defaults={
-                            'exam_name': exam_data['nome_prova'],
-                            'subject': exam_data['disciplina'],
-                            'school_year': exam_data['ano_escolar'],
-                            'total_questions': len(exam_data['questions'])
-                        }
-                    )
-
-                    if not created:
-                        # Atualiza informações da prova se já existe
-                        exam.exam_name = exam_data['nome_prova']
-                        exam.subject = exam_data['disciplina']
-                        exam.school_year = exam_data['ano_escolar']
-                        exam.total_questions = len(exam_data['questions'])
-                        exam.save()
-
-                        # Remove alternativas e questões antigas
-
-                        questions_to_delete = TbQuestions.objects.filter(id_exam=exam)
-
-                        for question in questions_to_delete:
-
-                            TbAlternatives.objects.filter(id_question=question).delete()
-
-                        questions_to_delete.delete()
-
-                    # Cria questões
-                    for q_data in exam_data['questions']:
-                        question = TbQuestions.objects.create(
-                            id_exam=exam,
-                            question_number=q_data['numero_questao'],
-                            question_text=q_data['enunciado'] or f"Questão {q_data['numero_questao']}",
-                            question_type='multiple_choice',
-                            correct_answer=q_data['resposta_correta'],
-                            difficulty_level=q_data['dificuldade'],
-                            points=q_data['pontos'],
-                            id_descriptor=q_data['descriptor']
-                        )
-
-                        # Cria alternativas genéricas (A, B, C, D, E)
-                        for i, letter in enumerate(['A', 'B', 'C', 'D', 'E'], start=1):
-                            TbAlternatives.objects.create(
-                                id_question=question,
-                                alternative_order=i,
-                                alternative_text=f"Alternativa {letter}",
-                                is_correct=(letter == q_data['resposta_correta'])
-                            )
-
-                    created_exams.append({
-                        'codigo': codigo_prova,
-                        'nome': exam_data['nome_prova'],
-                        'questoes': len(exam_data['questions']),
-                        'criada': created
-                    })
-
-            response_data = {
-                'success': True,
-                'message': f'{len(created_exams)} prova(s) importada(s)',
-                'exams': created_exams,
-                'errors': errors if errors else None
+            params = {
+                'sheet': request.data.get('sheet'),
+                'dry_run': request_flag(request, 'dry_run')
             }
+            if request_flag(request, 'background'):
+                return enqueue_import_response(request, 'answer_key', file, params)
 
-            if descriptors_not_found:
-                response_data['warning'] = 'Alguns descritores não foram encontrados'
-                response_data['descriptors_not_found'] = list(descriptors_not_found)
-
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            response_data = add_error_report_url(request, run_answer_key_import(file, **params))
+            return Response(
+                response_data,
+                status=status.HTTP_200_OK if params['dry_run'] else status.HTTP_201_CREATED
+            )
 
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {'error': f'Erro ao processar arquivo: {str(e)}'},
@@ -1037,11 +759,22 @@ class TbExamApplicationsViewSet(viewsets.ModelViewSet):
         codigo_prova,id_turma,matricula_aluno,q1,q2,q3,q4,q5
         PROVA2024_MAT_5,1,12345,A,C,B,D,A
         PROVA2024_MAT_5,1,67890,B,C,A,D,
-        """
-        import csv
-        import io
-        from datetime import datetime
 
+        Em arquivos Excel, o campo opcional "sheet" escolhe a planilha (nome ou
+        posição a partir de 1); sem ele é usada a planilha ativa. Com
+        background=1 o arquivo vai para a fila de importações e a resposta
+        (202) traz o job_id para acompanhar em /api/import-jobs/{id}/. Com
+        dry_run=1 o arquivo é só validado: a resposta (200) traz o que seria
+        importado e os erros, sem gravar nada.
+
+        Para rodadas com milhões de respostas, copy=1 usa o pipeline de alto
+        volume: o arquivo é carregado com COPY em uma tabela temporária e a
+        correção é feita no banco, em uma única transação.
+
+        workers=N distribui as aplicações (prova + turma) entre N processos,
+        cada um gravando em transação e conexão próprias; o formato da
+        resposta é o mesmo.
+        """
         file = request.FILES.get('file')
         if not file:
             return Response({'error': 'Nenhum arquivo enviado'}, status=status.HTTP_400_BAD_REQUEST)
@@ -1054,276 +787,41 @@ class TbExamApplicationsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            # Processa arquivo
-            if file_extension == 'csv':
-                # Try multiple encodings to handle different file formats
-                file_content = file.read()
-                decoded_file = None
-                encodings_to_try = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-
-                for encoding in encodings_to_try:
-                    try:
-                        decoded_file = file_content.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-
-                if decoded_file is None:
-                    return Response(
-                        {'error': 'Erro ao processar arquivo: codificação não suportada. Por favor, salve o arquivo como UTF-8.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                reader = csv.DictReader(io.StringIO(decoded_file))
-                rows = list(reader)
-            else:
-                try:
-                    import openpyxl
-                    workbook = openpyxl.load_workbook(file)
-                    sheet = workbook.active
-                    headers = [cell.value for cell in sheet[1]]
-                    rows = []
-                    for row in sheet.iter_rows(min_row=2, values_only=True):
-                        rows.append(dict(zip(headers, row)))
-                except ImportError:
-                    return Response(
-                        {'error': 'Biblioteca openpyxl não instalada. Use CSV.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            if not rows:
-                return Response({'error': 'Arquivo vazio'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Agrupa por código de prova e turma
-            applications_data = {}
-            errors = []
-            students_not_found = set()
-            exams_not_found = set()
-
-            for idx, row in enumerate(rows, start=2):
-                try:
-                    codigo_prova = str(row.get('codigo_prova', '')).strip()
-                    id_turma = row.get('id_turma')
-                    matricula_aluno = row.get('matricula_aluno')
-
-                    # Validações básicas
-                    if not codigo_prova:
-                        errors.append(f"Linha {idx}: codigo_prova obrigatório")
-                        continue
-                    if not id_turma:
-                        errors.append(f"Linha {idx}: id_turma obrigatório")
-                        continue
-                    if not matricula_aluno:
-                        errors.append(f"Linha {idx}: matricula_aluno obrigatório")
-                        continue
-
-                    # Converte tipos
-                    try:
-                        id_turma = int(id_turma)
-                        matricula_aluno = int(matricula_aluno)
-                    except (ValueError, TypeError):
-                        errors.append(f"Linha {idx}: id_turma e matricula_aluno devem ser números")
-                        continue
-
-                    # Busca prova
-                    try:
-                        exam = TbExams.objects.get(exam_code=codigo_prova)
-                    except TbExams.DoesNotExist:
-                        exams_not_found.add(codigo_prova)
-                        errors.append(f"Linha {idx}: Prova '{codigo_prova}' não encontrada")
-                        continue
-
-                    # Busca turma
-                    try:
-                        class_obj = TbClass.objects.get(id=id_turma)
-                    except TbClass.DoesNotExist:
-                        errors.append(f"Linha {idx}: Turma ID {id_turma} não encontrada")
-                        continue
-
-                    # Busca aluno
-                    try:
-                        student = TbStudents.objects.get(
-                            student_serial=matricula_aluno,
-                            id_class=class_obj
-                        )
-                    except TbStudents.DoesNotExist:
-                        students_not_found.add(matricula_aluno)
-                        errors.append(f"Linha {idx}: Aluno matrícula {matricula_aluno} não encontrado na turma")
-                        continue
-
-                    # Extrai respostas (q1, q2, q3...)
-                    answers = {}
-                    for key, value in row.items():
-                        if key.startswith('q') and key[1:].isdigit():
-                            question_number = int(key[1:])
-                            answer_value = str(value).strip().upper() if value else ''
-                            if answer_value and answer_value not in ['A', 'B', 'C', 'D', 'E']:
-                                errors.append(f"Linha {idx}, {key}: Resposta deve ser A, B, C, D, E ou vazio")
-                                continue
-                            answers[question_number] = answer_value
-
-                    if not answers:
-                        errors.append(f"Linha {idx}: Nenhuma resposta encontrada (colunas q1, q2, q3...)")
-                        continue
-
-                    # Agrupa por aplicação (prova + turma)
-                    app_key = (codigo_prova, id_turma)
-                    if app_key not in applications_data:
-                        applications_data[app_key] = {
-                            'exam': exam,
-                            'class': class_obj,
-                            'students_answers': []
-                        }
-
-                    applications_data[app_key]['students_answers'].append({
-                        'student': student,
-                        'answers': answers
-                    })
-
-                except Exception as e:
-                    errors.append(f"Linha {idx}: {str(e)}")
-                    continue
-
-            # Processa aplicações e respostas
-            processed_students = 0
-            created_applications = []
-
-            with transaction.atomic():
-                for (codigo_prova, id_turma), app_data in applications_data.items():
-                    exam = app_data['exam']
-                    class_obj = app_data['class']
-
-                    # Cria ou busca aplicação
-                    application, created = TbExamApplications.objects.get_or_create(
-                        id_exam=exam,
-                        id_class=class_obj,
-                        defaults={
-                            'application_date': datetime.now().date(),
-                            'status': 'completed',
-                            'fiscal_year': datetime.now().year
-                        }
-                    )
-
-                    if created:
-                        created_applications.append({
-                            'exam': exam.exam_name,
-                            'class': class_obj.class_name
-                        })
+        # Processos paralelos (opcional)
+        workers = request.data.get('workers') or request.query_params.get('workers')
+        if workers:
+            try:
+                workers = int(workers)
+            except (ValueError, TypeError):
+                return Response(
+                    {'error': 'workers deve ser um número inteiro'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-                    # Busca questões da prova
-                    questions = TbQuestions.objects.filter(id_exam=exam).select_related('id_descriptor')
-                    questions_dict = {q.question_number: q for q in questions}
-
-                    # Processa respostas de cada aluno
-                    for student_data in app_data['students_answers']:
-                        student = student_data['student']
-                        answers = student_data['answers']
-
-                        # Verifica se aluno já fez a prova
-                        if TbStudentAnswers.objects.filter(
-                            id_student=student,
-                            id_exam_application=application
-                        ).exists():
-                            errors.append(
-                                f"Aluno {student.student_name} (mat: {student.student_serial}) "
-                                f"já tem respostas para esta prova"
-                            )
-                            continue
-
-                        # Cria respostas
-                        student_answers = []
-                        for q_number, answer_letter in answers.items():
-                            if q_number not in questions_dict:
-                                continue
-
-                            question = questions_dict[q_number]
-
-                            # Busca alternativa selecionada
-                            selected_alternative = None
-                            is_correct = False
-
-                            if answer_letter:  # Se não está em branco
-                                # Converte letra para número (A=1, B=2, etc)
-                                alternative_order = ord(answer_letter) - ord('A') + 1
-                                try:
-                                    selected_alternative = TbAlternatives.objects.get(
-                                        id_question=question,
-                                        alternative_order=alternative_order
-                                    )
-                                    is_correct = selected_alternative.is_correct
-                                except TbAlternatives.DoesNotExist:
-                                    pass
-
-                            # Cria resposta do aluno
-                            student_answer = TbStudentAnswers.objects.create(
-                                id_student=student,
-                                id_exam_application=application,
-                                id_question=question,
-                                id_selected_alternative=selected_alternative,
-                                answer_text=answer_letter,
-                                is_correct=is_correct
-                            )
-                            student_answers.append(student_answer)
-
-                        # Calcula resultado
-                        if student_answers:
-                            self._calculate_result_and_descriptors(student, application, student_answers)
-                            processed_students += 1
-
-            response_data = {
-                'success': True,
-                'message': f'Respostas de {processed_students} aluno(s) importadas com sucesso',
-                'processed_students': processed_students,
-                'created_applications': created_applications,
-                'errors': errors if errors else None
+        try:
+            params = {
+                'sheet': request.data.get('sheet'),
+                'copy': request_flag(request, 'copy'),
+                'dry_run': request_flag(request, 'dry_run'),
+                'workers': workers or None
             }
+            if request_flag(request, 'background'):
+                return enqueue_import_response(request, 'student_answers', file, params)
 
-            if students_not_found:
-                response_data['students_not_found'] = list(students_not_found)
-
-            if exams_not_found:
-                response_data['exams_not_found'] = list(exams_not_found)
-
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            response_data = add_error_report_url(request, run_student_answers_import(file, **params))
+            return Response(
+                response_data,
+                status=status.HTTP_200_OK if params['dry_run'] else status.HTTP_201_CREATED
+            )
 
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {'error': f'Erro ao processar arquivo: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _calculate_result_and_descriptors(self, student, application, answers):
-        """Calcula resultado e atribui descritores conquistados"""
-        # Calcula pontuação
-        total_score = sum([ans.id_question.points for ans in answers if ans.is_correct])
-        max_score = sum([ans.id_question.points for ans in answers])
-        correct_count = sum([1 for ans in answers if ans.is_correct])
-        wrong_count = sum([1 for ans in answers if not ans.is_correct and ans.answer_text])
-        blank_count = sum([1 for ans in answers if not ans.answer_text])
-
-        # Cria resultado
-        TbExamResults.objects.update_or_create(
-            id_student=student,
-            id_exam_application=application,
-            defaults={
-                'total_score': total_score,
-                'max_score': max_score,
-                'correct_answers': correct_count,
-                'wrong_answers': wrong_count,
-                'blank_answers': blank_count
-            }
-        )
-
-        # Atribui descritores das questões corretas
-        for answer in answers:
-            if answer.is_correct and answer.id_question.id_descriptor:
-                TbStudentDescriptorAchievements.objects.get_or_create(
-                    id_student=student,
-                    id_descriptor=answer.id_question.id_descriptor,
-                    defaults={'id_exam_application': application}
-                )
-
 
 class TbAssessmentMetadataViewSet(viewsets.ModelViewSet):
     """Metadados de Avaliações"""
@@ -1342,6 +840,20 @@ class TbStudentAnswersViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id_student', 'id_exam_application', 'id_question', 'is_correct']
 
+    # Resultado, conquistas e progresso do aluno são ajustados pelos sinais
+    # de TbStudentAnswers (api.signals), na mesma transação da resposta
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """Lançamento em lote de respostas"""
@@ -1366,47 +878,52 @@ class TbStudentAnswersViewSet(viewsets.ModelViewSet):
                 'error': 'Este aluno já realizou esta prova'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        created_answers = []
+        # Gabarito compilado da prova, do cache (api.answer_keys); a correção
+        # é vetorizada
+        exam_id = TbExamApplications.objects.values_list('id_exam_id', flat=True).get(id=id_exam_application)
+        key = get_answer_key(exam_id)
+
         errors = []
+        sheet = {}
+        for answer in answers:
+            question_id = answer_question_id(answer)
+            if question_id not in key.question_columns:
+                errors.append(f"Questão {answer.get('id_question')} não encontrada")
+                continue
+            alternative_id, error = answer_alternative_id(key, question_id, answer)
+            if error:
+                errors.append(error)
+                continue
+            sheet[question_id] = {**answer, 'id_selected_alternative': alternative_id}
+
+        result = key.grade(key.encode_alternatives([
+            {question_id: answer.get('id_selected_alternative') for question_id, answer in sheet.items()}
+        ]))
+
+        created_answers = [
+            TbStudentAnswers(
+                id_student_id=id_student,
+                id_exam_application_id=id_exam_application,
+                id_question_id=question_id,
+                id_selected_alternative_id=answer.get('id_selected_alternative'),
+                answer_text=answer.get('answer_text', ''),
+                is_correct=bool(result.correct[0, key.question_columns[question_id]])
+            )
+            for question_id, answer in sheet.items()
+        ]
 
         try:
             with transaction.atomic():
-                for answer in answers:
-                    try:
-                        question = TbQuestions.objects.get(id=answer['id_question'])
-                        selected_alt_id = answer.get('id_selected_alternative')
-
-                        # Verificar se a resposta está correta
-                        is_correct = False
-                        if selected_alt_id:
-                            # Buscar pela alternativa marcada como correta
-                            correct_alt = TbAlternatives.objects.filter(
-                                id_question=question,
-                                is_correct=True
-                            ).first()
-
-                            if correct_alt:
-                                is_correct = int(selected_alt_id) == correct_alt.id
-
-                        student_answer = TbStudentAnswers.objects.create(
-                            id_student_id=id_student,
-                            id_exam_application_id=id_exam_application,
-                            id_question_id=answer['id_question'],
-                            id_selected_alternative_id=selected_alt_id,
-                            answer_text=answer.get('answer_text', ''),
-                            is_correct=is_correct
-                        )
-                        created_answers.append(student_answer)
-                    except TbQuestions.DoesNotExist:
-                        errors.append(f"Questão {answer.get('id_question')} não encontrada")
-                        continue
-                    except Exception as e:
-                        errors.append(f"Erro na questão {answer.get('id_question')}: {str(e)}")
-                        continue
-
-                # Calcular e criar resultado automático
+                TbStudentAnswers.objects.bulk_create(created_answers)
+
+                # Resultado, descritores e progresso calculados das respostas
+                # gravadas (api.scoring)
                 if created_answers:
-                    self._calculate_exam_result(id_student, id_exam_application)
+                    pairs = [(id_student, id_exam_application)]
+                    upsert_results(pairs=pairs)
+                    insert_achievements(pairs=pairs)
+                    upsert_learning_progress(pairs=pairs)
+                    invalidate_answer_data([exam_id])
 
         except Exception as e:
             return Response({
@@ -1419,37 +936,209 @@ class TbStudentAnswersViewSet(viewsets.ModelViewSet):
             'total_answers': len(created_answers),
             'errors': errors if errors else None
         }, status=status.HTTP_201_CREATED)
-    
-    def _calculate_exam_result(self, id_student, id_exam_application):
-        """Calcula resultado automático baseado nas respostas"""
-        answers = TbStudentAnswers.objects.filter(
-            id_student_id=id_student,
-            id_exam_application_id=id_exam_application
-        ).select_related('id_question')
-        
-        total_score = sum([
-            ans.id_question.points for ans in answers if ans.is_correct
-        ])
-        
-        max_score = sum([ans.id_question.points for ans in answers])
-        
-        correct_answers = answers.filter(is_correct=True).count()
-        wrong_answers = answers.filter(is_correct=False).count()
-        blank_answers = 0
-        
-        # Criar ou atualizar resultado
-        TbExamResults.objects.update_or_create(
-            id_student_id=id_student,
-            id_exam_application_id=id_exam_application,
-            defaults={
-                'total_score': total_score,
-                'max_score': max_score,
-                'correct_answers': correct_answers,
-                'wrong_answers': wrong_answers,
-                'blank_answers': blank_answers
-            }
+
+
+    @action(detail=False, methods=['post'])
+    def bulk_create_class(self, request):
+        """
+        Lançamento da folha de respostas de uma turma em uma única requisição.
+
+        Alunos, respostas já existentes e questões são validados com consultas
+        por conjunto; as folhas são corrigidas juntas (matriz alunos ×
+        questões) e respostas, resultados e descritores conquistados são
+        gravados em lote. Alunos recusados (de outra turma, inexistentes ou
+        que já fizeram a prova) aparecem em "errors".
+        """
+        serializer = ClassSheetAnswersSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        application = TbExamApplications.objects.get(id=validated_data['id_exam_application'])
+        sheets = validated_data['students']
+        key = get_answer_key(application.id_exam_id)
+
+        student_ids = {sheet['id_student'] for sheet in sheets}
+        students = TbStudents.objects.in_bulk(student_ids)
+        answered = set(
+            TbStudentAnswers.objects.filter(
+                id_exam_application=application,
+                id_student_id__in=student_ids
+            ).values_list('id_student_id', flat=True).distinct()
         )
 
+        errors = []
+        graded_students = []
+        graded_sheets = []  # {id da questão: resposta enviada} por aluno aceito
+        for sheet in sheets:
+            student = students.get(sheet['id_student'])
+            if student is None:
+                errors.append(f"Aluno {sheet['id_student']} não encontrado")
+                continue
+            if student.id_class_id != application.id_class_id:
+                errors.append(
+                    f"Aluno {student.student_name} (mat: {student.student_serial}) não pertence à turma da aplicação"
+                )
+                continue
+            if student.id_student in answered:
+                errors.append(
+                    f"Aluno {student.student_name} (mat: {student.student_serial}) já realizou esta prova"
+                )
+                continue
+
+            student_answers = {}
+            for answer in sheet['answers']:
+                question_id = answer_question_id(answer)
+                if question_id not in key.question_columns:
+                    errors.append(
+                        f"Aluno {student.student_name}: questão {answer.get('id_question')} não encontrada"
+                    )
+                    continue
+                alternative_id, error = answer_alternative_id(key, question_id, answer)
+                if error:
+                    errors.append(f"Aluno {student.student_name}: {error[0].lower()}{error[1:]}")
+                    continue
+                student_answers[question_id] = {**answer, 'id_selected_alternative': alternative_id}
+
+            # Aluno repetido na folha: vale a primeira ocorrência
+            answered.add(student.id_student)
+            if student_answers:
+                graded_students.append(student)
+                graded_sheets.append(student_answers)
+
+        result = key.grade(key.encode_alternatives([
+            {question_id: answer.get('id_selected_alternative') for question_id, answer in student_answers.items()}
+            for student_answers in graded_sheets
+        ]))
+        graded = GradedApplication(application, graded_students, result)
+
+        created_answers = [
+            TbStudentAnswers(
+                id_student=student,
+                id_exam_application=application,
+                id_question_id=question_id,
+                id_selected_alternative_id=answer.get('id_selected_alternative'),
+                answer_text=answer.get('answer_text', ''),
+                is_correct=bool(result.correct[row, key.question_columns[question_id]])
+            )
+            for row, (student, student_answers) in enumerate(zip(graded_students, graded_sheets))
+            for question_id, answer in student_answers.items()
+        ]
+
+        try:
+            with transaction.atomic():
+                TbStudentAnswers.objects.bulk_create(created_answers, batch_size=IMPORT_INSERT_BATCH_SIZE)
+                save_results_and_descriptors(graded)
+                if graded_students:
+                    upsert_learning_progress(application_ids=[application.id])
+                    invalidate_answer_data([application.id_exam_id])
+
+        except Exception as e:
+            return Response({
+                'error': f'Erro ao processar respostas: {str(e)}',
+                'details': errors
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'message': f'Respostas de {len(graded)} aluno(s) registradas com sucesso',
+            'processed_students': len(graded),
+            'total_answers': len(created_answers),
+            'errors': errors if errors else None
+        }, status=status.HTTP_201_CREATED)
+
+
+class ExamSessionViewSet(viewsets.ViewSet):
+    """
+    Prova online: salvamento automático das respostas e entrega.
+
+    As respostas salvas ficam num buffer (api.autosave) e são movidas em lote
+    para as respostas dos alunos; na entrega a prova é corrigida e o
+    resultado calculado.
+    """
+
+    def _session_answers(self, request):
+        """Valida o corpo e as respostas contra o gabarito da prova"""
+        serializer = ExamSessionAnswersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        exam_id = TbExamApplications.objects.filter(
+            id=data['id_exam_application']
+        ).values_list('id_exam_id', flat=True).first()
+        if exam_id is None:
+            raise Http404('Aplicação de exame não encontrada')
+        key = get_answer_key(exam_id)
+
+        answers = []
+        errors = []
+        for answer in data['answers']:
+            question_id = answer_question_id(answer)
+            if question_id not in key.question_columns:
+                errors.append(f"Questão {answer.get('id_question')} não encontrada")
+                continue
+            alternative_id, error = answer_alternative_id(key, question_id, answer)
+            if error:
+                errors.append(error)
+                continue
+            answers.append({
+                'id_question': question_id,
+                'id_selected_alternative': alternative_id,
+                'answer_text': answer.get('answer_text', ''),
+            })
+
+        return data['id_student'], data['id_exam_application'], answers, errors
+
+    @action(detail=False, methods=['post'])
+    def autosave(self, request):
+        """
+        Salva respostas durante a prova (uma ou mais questões por chamada).
+
+        Cada questão guarda só a última alternativa salva; as respostas vão
+        para o buffer e não geram resultado até a entrega. Depois da entrega
+        responde 409.
+        """
+        id_student, id_exam_application, answers, errors = self._session_answers(request)
+        saved = save_answers(id_student, id_exam_application, answers)
+        if answers and not saved:
+            return Response({
+                'error': 'Este aluno já entregou esta prova'
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'saved': saved,
+            'errors': errors if errors else None
+        }, status=status.HTTP_400_BAD_REQUEST if errors and not saved else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def submit(self, request):
+        """
+        Entrega a prova: grava as respostas salvas (e as enviadas junto),
+        corrige e calcula resultado, descritores e progresso do aluno.
+        """
+        id_student, id_exam_application, answers, errors = self._session_answers(request)
+
+        if not TbStudents.objects.filter(id_student=id_student).exists():
+            return Response({'error': 'Aluno não encontrado'}, status=status.HTTP_400_BAD_REQUEST)
+        if TbExamResults.objects.filter(
+            id_student_id=id_student, id_exam_application_id=id_exam_application
+        ).exists():
+            return Response({
+                'error': 'Este aluno já realizou esta prova'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        total_answers = submit_session(id_student, id_exam_application, answers)
+        result = TbExamResults.objects.filter(
+            id_student_id=id_student, id_exam_application_id=id_exam_application
+        ).select_related('id_student', 'id_exam_application__id_exam').first()
+
+        return Response({
+            'message': 'Prova entregue com sucesso',
+            'total_answers': total_answers,
+            'result': TbExamResultsSerializer(result).data if result else None,
+            'errors': errors if errors else None
+        }, status=status.HTTP_201_CREATED)
+
 
 class TbExamResultsViewSet(viewsets.ModelViewSet):
     """Resultados dos Exames"""
@@ -2240,3 +1929,56 @@ class DashboardSecretariaViewSet(viewsets.ViewSet):
 
         serializer = TbAlertSerializer(alerts, many=True)
         return Response(serializer.data)
+
+
+# ============================================
+# VIEWSETS DE IMPORTAÇÕES EM SEGUNDO PLANO
+# ============================================
+
+class TbImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Acompanhamento das importações enviadas com background=1"""
+    queryset = TbImportJob.objects.all()
+    serializer_class = TbImportJobSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['import_type', 'status']
+    ordering_fields = ['created_at', 'finished_at']
+
+
+class _EchoBuffer:
+    """Destino do csv.writer que apenas devolve a linha formatada"""
+
+    def write(self, value):
+        return value
+
+
+class ImportErrorReportViewSet(viewsets.ViewSet):
+    """Relatório completo de erros de uma importação, em CSV"""
+
+    def retrieve(self, request, pk=None):
+        """
+        Transmite o relatório linha a linha (StreamingHttpResponse), sem
+        montar o arquivo inteiro em memória.
+        """
+        try:
+            report_id = uuid.UUID(str(pk))
+        except ValueError:
+            raise Http404
+
+        errors = TbImportError.objects.filter(report_id=report_id).order_by('position')
+        first = errors.values('import_type').first()
+        if first is None:
+            raise Http404
+
+        writer = csv.writer(_EchoBuffer())
+
+        def rows():
+            # BOM para o Excel reconhecer o UTF-8 (acentos)
+            yield '\ufeff' + writer.writerow(['linha', 'coluna', 'codigo', 'mensagem'])
+            for row in errors.values_list('row_number', 'column_name', 'code', 'message').iterator(chunk_size=2000):
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="erros_{first["import_type"]}_{report_id}.csv"'
+        )
+        return response
@@ -0,0 +1,42 @@
+# Migration to create the tb_import_job table (background import queue)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_add_exam_file_column'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbImportJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('import_type', models.CharField(choices=[('students', 'Alunos'), ('answer_key', 'Gabarito'), ('student_answers', 'Respostas dos Alunos')], max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em processamento'), ('completed', 'Concluido'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('file_path', models.CharField(max_length=500)),
+                ('file_name', models.CharField(max_length=255)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('total_rows', models.IntegerField(blank=True, null=True)),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Importacao',
+                'verbose_name_plural': 'Importacoes',
+                'db_table': 'tb_import_job',
+                'ordering': ['-created_at'],
+                'managed': True,
+                'indexes': [models.Index(fields=['status', 'created_at'], name='idx_import_job_status')],
+            },
+        ),
+    ]
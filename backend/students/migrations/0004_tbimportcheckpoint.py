@@ -0,0 +1,31 @@
+# Migration to create the tb_import_checkpoint table (resumable imports)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_tbimportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('file_hash', models.CharField(max_length=64)),
+                ('import_type', models.CharField(max_length=30)),
+                ('chunk_key', models.CharField(max_length=100)),
+                ('rows', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Importacao',
+                'verbose_name_plural': 'Checkpoints de Importacao',
+                'db_table': 'tb_import_checkpoint',
+                'managed': True,
+                'unique_together': {('file_hash', 'import_type', 'chunk_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Migration to create the tb_import_error table (import error reports)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_tbimportcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbImportError',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('report_id', models.UUIDField()),
+                ('import_type', models.CharField(max_length=30)),
+                ('position', models.IntegerField()),
+                ('row_number', models.IntegerField(blank=True, null=True)),
+                ('column_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('code', models.CharField(max_length=30)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Erro de Importacao',
+                'verbose_name_plural': 'Erros de Importacao',
+                'db_table': 'tb_import_error',
+                'ordering': ['report_id', 'position'],
+                'managed': True,
+                'indexes': [
+                    models.Index(fields=['report_id', 'position'], name='idx_import_error_report'),
+                    models.Index(fields=['created_at'], name='idx_import_error_created'),
+                ],
+            },
+        ),
+    ]
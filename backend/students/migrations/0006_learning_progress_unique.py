@@ -0,0 +1,32 @@
+# Migration to add a unique index to tb_student_learning_progress, used by
+# the upsert of the learning progress derived from the answers
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_tbimporterror'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            # Remove duplicadas (mantém a linha mais recente) e cria o índice
+            sql="""
+                DELETE FROM tb_student_learning_progress lp
+                USING tb_student_learning_progress newer
+                WHERE newer.id_student = lp.id_student
+                  AND newer.id_descriptor = lp.id_descriptor
+                  AND newer.id_exam_application = lp.id_exam_application
+                  AND newer.id > lp.id;
+
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_student_progress_application
+                ON tb_student_learning_progress (id_student, id_descriptor, id_exam_application);
+            """,
+            # Reverse migration (remove index)
+            reverse_sql="""
+                DROP INDEX IF EXISTS uq_student_progress_application;
+            """
+        ),
+    ]
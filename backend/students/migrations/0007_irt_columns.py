@@ -0,0 +1,40 @@
+# Migration to add IRT item parameters to tb_questions and proficiency
+# estimates to tb_exam_results
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_learning_progress_unique'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            # Add columns
+            sql="""
+                ALTER TABLE tb_questions
+                ADD COLUMN IF NOT EXISTS irt_discrimination DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS irt_difficulty DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS irt_guessing DOUBLE PRECISION;
+
+                ALTER TABLE tb_exam_results
+                ADD COLUMN IF NOT EXISTS theta DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS theta_se DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS scale_score NUMERIC(6, 2);
+            """,
+            # Reverse migration (remove columns)
+            reverse_sql="""
+                ALTER TABLE tb_questions
+                DROP COLUMN IF EXISTS irt_discrimination,
+                DROP COLUMN IF EXISTS irt_difficulty,
+                DROP COLUMN IF EXISTS irt_guessing;
+
+                ALTER TABLE tb_exam_results
+                DROP COLUMN IF EXISTS theta,
+                DROP COLUMN IF EXISTS theta_se,
+                DROP COLUMN IF EXISTS scale_score;
+            """
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Migration to create the tb_answer_autosave table (online exam autosave
+# buffer). The table is UNLOGGED: saves skip the WAL and the buffer is lost
+# on a crash, which only drops answers not yet flushed to tb_student_answers
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_irt_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbAnswerAutosave',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('id_student', models.IntegerField()),
+                ('id_exam_application', models.IntegerField()),
+                ('id_question', models.IntegerField()),
+                ('id_selected_alternative', models.IntegerField(blank=True, null=True)),
+                ('answer_text', models.TextField(blank=True, null=True)),
+                ('saved_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Resposta Salva',
+                'verbose_name_plural': 'Respostas Salvas',
+                'db_table': 'tb_answer_autosave',
+                'managed': True,
+                'unique_together': {('id_student', 'id_exam_application', 'id_question')},
+                'indexes': [
+                    models.Index(fields=['saved_at'], name='idx_answer_autosave_saved'),
+                ],
+            },
+        ),
+        migrations.RunSQL(
+            sql="ALTER TABLE tb_answer_autosave SET UNLOGGED;",
+            reverse_sql="ALTER TABLE tb_answer_autosave SET LOGGED;",
+        ),
+    ]
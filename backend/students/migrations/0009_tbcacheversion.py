@@ -0,0 +1,28 @@
+# Migration to create the tb_cache_version table (versions of answer keys
+# and answer data, shared by every process through the database)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_tbanswerautosave'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbCacheVersion',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.UUIDField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Versao de Cache',
+                'verbose_name_plural': 'Versoes de Cache',
+                'db_table': 'tb_cache_version',
+                'managed': True,
+            },
+        ),
+    ]
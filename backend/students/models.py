@@ -273,6 +273,10 @@ class TbQuestions(models.Model):
         blank=True,
         null=True
     )
+    # Parâmetros da TRI calibrados pelas respostas (api.irt)
+    irt_discrimination = models.FloatField(blank=True, null=True)
+    irt_difficulty = models.FloatField(blank=True, null=True)
+    irt_guessing = models.FloatField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -419,6 +423,10 @@ class TbExamResults(models.Model):
     correct_answers = models.IntegerField(blank=True, null=True)
     wrong_answers = models.IntegerField(blank=True, null=True)
     blank_answers = models.IntegerField(blank=True, null=True)
+    # Proficiência pela TRI (api.irt): EAP, erro padrão e nota na escala
+    theta = models.FloatField(blank=True, null=True)
+    theta_se = models.FloatField(blank=True, null=True)
+    scale_score = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
     # completion_time_minutes = models.IntegerField(blank=True, null=True)
     started_at = models.DateTimeField(blank=True, null=True)
     finished_at = models.DateTimeField(blank=True, null=True)
@@ -951,4 +959,156 @@ class TbAlert(models.Model):
 
     def __str__(self):
         escola = self.id_school.school if self.id_school else "Municipal"
-        return f"[{self.severidade}] {self.titulo} - {escola}"
\ No newline at end of file
+        return f"[{self.severidade}] {self.titulo} - {escola}"
+
+# ============================================
+# MODELOS DE PROCESSAMENTO EM SEGUNDO PLANO
+# ============================================
+
+class TbImportJob(models.Model):
+    """Fila de importações (alunos, gabaritos e respostas) processadas pelo worker"""
+    id = models.AutoField(primary_key=True)
+    import_type = models.CharField(max_length=30, choices=[
+        ('students', 'Alunos'),
+        ('answer_key', 'Gabarito'),
+        ('student_answers', 'Respostas dos Alunos')
+    ])
+    status = models.CharField(max_length=20, choices=[
+        ('pending', 'Pendente'),
+        ('running', 'Em processamento'),
+        ('completed', 'Concluido'),
+        ('failed', 'Falhou')
+    ], default='pending')
+    file_path = models.CharField(max_length=500)
+    file_name = models.CharField(max_length=255)
+    params = models.JSONField(default=dict, blank=True)
+
+    total_rows = models.IntegerField(blank=True, null=True)
+    processed_rows = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+
+    result = models.JSONField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'tb_import_job'
+        verbose_name = 'Importacao'
+        verbose_name_plural = 'Importacoes'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='idx_import_job_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_import_type_display()} #{self.id} ({self.status})"
+
+
+class TbImportCheckpoint(models.Model):
+    """
+    Blocos já gravados de uma importação, identificada pelo hash do arquivo.
+
+    Reenviar o mesmo arquivo depois de uma falha pula os blocos registrados
+    aqui e retoma a partir do primeiro que não foi confirmado.
+    """
+    id = models.AutoField(primary_key=True)
+    file_hash = models.CharField(max_length=64)
+    import_type = models.CharField(max_length=30)
+    chunk_key = models.CharField(max_length=100)
+    rows = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = 'tb_import_checkpoint'
+        verbose_name = 'Checkpoint de Importacao'
+        verbose_name_plural = 'Checkpoints de Importacao'
+        unique_together = [['file_hash', 'import_type', 'chunk_key']]
+
+    def __str__(self):
+        return f"{self.import_type} {self.file_hash[:12]} - {self.chunk_key}"
+
+
+class TbImportError(models.Model):
+    """Relatório completo de erros de uma importação (linha, coluna, código, mensagem)"""
+    id = models.BigAutoField(primary_key=True)
+    report_id = models.UUIDField()
+    import_type = models.CharField(max_length=30)
+    position = models.IntegerField()
+    row_number = models.IntegerField(blank=True, null=True)
+    column_name = models.CharField(max_length=100, blank=True, null=True)
+    code = models.CharField(max_length=30)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = 'tb_import_error'
+        verbose_name = 'Erro de Importacao'
+        verbose_name_plural = 'Erros de Importacao'
+        ordering = ['report_id', 'position']
+        indexes = [
+            models.Index(fields=['report_id', 'position'], name='idx_import_error_report'),
+            models.Index(fields=['created_at'], name='idx_import_error_created'),
+        ]
+
+    def __str__(self):
+        return self.message
+
+
+class TbAnswerAutosave(models.Model):
+    """
+    Buffer das respostas salvas durante a prova online (api.autosave).
+
+    Tabela UNLOGGED (migração 0008), com uma linha por aluno, aplicação e
+    questão: cada novo salvamento sobrescreve o anterior. As linhas são
+    movidas em lote para tb_student_answers e somem do buffer. Ids sem chave
+    estrangeira para não pesar nos salvamentos; a validação fica na API.
+    """
+    id = models.BigAutoField(primary_key=True)
+    id_student = models.IntegerField()
+    id_exam_application = models.IntegerField()
+    id_question = models.IntegerField()
+    id_selected_alternative = models.IntegerField(blank=True, null=True)
+    answer_text = models.TextField(blank=True, null=True)
+    saved_at = models.DateTimeField()
+
+    class Meta:
+        managed = True
+        db_table = 'tb_answer_autosave'
+        verbose_name = 'Resposta Salva'
+        verbose_name_plural = 'Respostas Salvas'
+        unique_together = [['id_student', 'id_exam_application', 'id_question']]
+        indexes = [
+            models.Index(fields=['saved_at'], name='idx_answer_autosave_saved'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_student}/{self.id_exam_application}/{self.id_question}"
+
+
+class TbCacheVersion(models.Model):
+    """
+    Versão dos dados de que dependem os caches por processo (api.versions).
+
+    Ex.: "answer_key:12" muda quando questões ou alternativas da prova 12
+    mudam; "answer_data:12" quando respostas da prova são gravadas.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.UUIDField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        managed = True
+        db_table = 'tb_cache_version'
+        verbose_name = 'Versao de Cache'
+        verbose_name_plural = 'Versoes de Cache'
+
+    def __str__(self):
+        return f"{self.name} ({self.version})"
@@ -1483,6 +1483,8 @@ const ImportStudents = ({ onImportSuccess }) => {
           created: data.created,
           updated: data.updated,
           errors: data.errors,
+          error_count: data.error_count,
+          error_report_url: data.error_report_url,
           missing_classes: data.missing_classes,
           available_classes: data.available_classes,
           suggestion: data.suggestion,
@@ -1733,13 +1735,21 @@ Pedro Oliveira,12347,5º Ano B,2025-01-15,Matriculado`;
               {result.errors && result.errors.length > 0 && (
                 <div className="mt-3 p-3 bg-yellow-50 border border-yellow-200 rounded">
                   <p className="font-semibold text-yellow-900 mb-2">
-                    Avisos ({result.errors.length}):
+                    Avisos ({result.error_count ?? result.errors.length}):
                   </p>
                   <ul className="text-xs text-yellow-800 space-y-1 max-h-40 overflow-y-auto">
                     {result.errors.map((error, idx) => (
                       <li key={idx}>{error}</li>
                     ))}
                   </ul>
+                  {result.error_report_url && (
+                    <a
+                      href={result.error_report_url}
+                      className="inline-block mt-2 text-xs font-medium text-yellow-900 underline"
+                    >
+                      Baixar relatório completo de erros (CSV)
+                    </a>
+                  )}
 
                   {result.suggestion && (
                     <div className="mt-3 p-2 bg-yellow-100 border border-yellow-300 rounded">
@@ -498,7 +498,7 @@ PROVA2024_MAT_5,1,11111,A,C,B,D,E,C,B,A,D,C`;
                         {answerKeyResult.errors && answerKeyResult.errors.length > 0 && (
                           <div className="mt-3">
                             <p className="text-sm font-medium text-red-800 mb-2">
-                              Erros encontrados:
+                              Erros encontrados ({answerKeyResult.error_count ?? answerKeyResult.errors.length}):
                             </p>
                             <div className="bg-white rounded p-3 max-h-40 overflow-y-auto">
                               {answerKeyResult.errors.map((error, idx) => (
@@ -507,6 +507,14 @@ PROVA2024_MAT_5,1,11111,A,C,B,D,E,C,B,A,D,C`;
                                 </p>
                               ))}
                             </div>
+                            {answerKeyResult.error_report_url && (
+                              <a
+                                href={answerKeyResult.error_report_url}
+                                className="inline-block mt-2 text-xs font-medium text-red-700 underline"
+                              >
+                                Baixar relatório completo de erros (CSV)
+                              </a>
+                            )}
                           </div>
                         )}
                       </div>
@@ -669,7 +677,7 @@ PROVA2024_MAT_5,1,11111,A,C,B,D,E,C,B,A,D,C`;
                         {answersResult.errors && answersResult.errors.length > 0 && (
                           <div className="mt-3">
                             <p className="text-sm font-medium text-orange-800 mb-2">
-                              ⚠️ Avisos e erros:
+                              ⚠️ Avisos e erros ({answersResult.error_count ?? answersResult.errors.length}):
                             </p>
                             <div className="bg-white rounded p-3 max-h-40 overflow-y-auto">
                               {answersResult.errors.map((error, idx) => (
@@ -678,6 +686,14 @@ PROVA2024_MAT_5,1,11111,A,C,B,D,E,C,B,A,D,C`;
                                 </p>
                               ))}
                             </div>
+                            {answersResult.error_report_url && (
+                              <a
+                                href={answersResult.error_report_url}
+                                className="inline-block mt-2 text-xs font-medium text-orange-700 underline"
+                              >
+                                Baixar relatório completo de erros (CSV)
+                              </a>
+                            )}
                           </div>
                         )}
                       </div>
@@ -15,6 +15,8 @@ import {
   Filter,
   Download,
   Eye,
+  Save,
+  ClipboardList,
 } from "lucide-react";
 
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || "http://127.0.0.1:8000/api";
@@ -31,6 +33,11 @@ const StudentAnswers = () => {
   const [filterStudent, setFilterStudent] = useState("");
   const [filterCorrect, setFilterCorrect] = useState("all");
   const [selectedStudent, setSelectedStudent] = useState(null);
+  const [showSheet, setShowSheet] = useState(false);
+  const [sheet, setSheet] = useState({});
+  const [savingSheet, setSavingSheet] = useState(false);
+  const [sheetResult, setSheetResult] = useState(null);
+  const [reloadAnswers, setReloadAnswers] = useState(0);
 
   // Carregar aplicações de provas
   useEffect(() => {
@@ -99,7 +106,7 @@ const StudentAnswers = () => {
     };
 
     loadAnswersAndData();
-  }, [selectedApplication]);
+  }, [selectedApplication, reloadAnswers]);
 
   // Agrupar respostas por aluno
   const getStudentGroups = () => {
@@ -157,6 +164,156 @@ const StudentAnswers = () => {
     };
   };
 
+  // Alunos da turma da aplicação que ainda não têm respostas lançadas
+  const getPendingStudents = () => {
+    const answered = getStudentGroups();
+    return students
+      .filter((s) => s.id_class === selectedApplication.id_class && !answered[s.id_student])
+      .sort((a, b) => (a.student_name || "").localeCompare(b.student_name || ""));
+  };
+
+  // Marcar a alternativa de um aluno na folha da turma
+  const setSheetAnswer = (studentId, questionId, alternativeId) => {
+    setSheet((current) => ({
+      ...current,
+      [studentId]: { ...current[studentId], [questionId]: alternativeId },
+    }));
+  };
+
+  // Enviar a folha inteira da turma numa única requisição (bulk_create_class)
+  const saveClassSheet = async () => {
+    const sheetStudents = Object.entries(sheet)
+      .map(([studentId, answers]) => ({
+        id_student: parseInt(studentId),
+        answers: Object.entries(answers)
+          .filter(([, alternativeId]) => alternativeId)
+          .map(([questionId, alternativeId]) => ({
+            id_question: parseInt(questionId),
+            id_selected_alternative: parseInt(alternativeId),
+          })),
+      }))
+      .filter((s) => s.answers.length > 0);
+
+    if (sheetStudents.length === 0) {
+      setSheetResult({ error: "Marque as respostas de ao menos um aluno" });
+      return;
+    }
+
+    try {
+      setSavingSheet(true);
+      const response = await fetch(`${API_BASE_URL}/student-answers/bulk_create_class/`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          id_exam_application: selectedApplication.id,
+          students: sheetStudents,
+        }),
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || Object.values(data).flat().join(" ") || "Erro ao salvar a folha");
+      }
+      setSheetResult({ message: data.message, errors: data.errors || [] });
+      setSheet({});
+      setReloadAnswers((n) => n + 1);
+    } catch (err) {
+      console.error("Erro:", err);
+      setSheetResult({ error: err.message });
+    } finally {
+      setSavingSheet(false);
+    }
+  };
+
+  // Renderizar folha de respostas da turma (alunos × questões)
+  const renderClassSheet = () => {
+    const pendingStudents = getPendingStudents();
+    const sortedQuestions = [...questions].sort(
+      (a, b) => (a.question_number || 0) - (b.question_number || 0)
+    );
+
+    return (
+      <div className="bg-white p-6 rounded-lg shadow-md mb-6">
+        <div className="flex items-center justify-between mb-4">
+          <div className="flex items-center gap-2">
+            <ClipboardList className="w-6 h-6 text-blue-600" />
+            <h3 className="text-xl font-bold text-gray-800">Folha de Respostas da Turma</h3>
+          </div>
+          <button
+            onClick={saveClassSheet}
+            disabled={savingSheet || pendingStudents.length === 0}
+            className="flex items-center gap-2 bg-blue-600 text-white px-4 py-2 rounded hover:bg-blue-700 disabled:opacity-50"
+          >
+            <Save className="w-5 h-5" />
+            <span>{savingSheet ? "Salvando..." : "Salvar folha"}</span>
+          </button>
+        </div>
+
+        {sheetResult && (
+          <div
+            className={`p-3 mb-4 rounded ${
+              sheetResult.error ? "bg-red-50 text-red-700" : "bg-green-50 text-green-700"
+            }`}
+          >
+            <p>{sheetResult.error || sheetResult.message}</p>
+            {sheetResult.errors?.length > 0 && (
+              <ul className="mt-2 list-disc list-inside text-sm text-red-700">
+                {sheetResult.errors.map((message, index) => (
+                  <li key={index}>{message}</li>
+                ))}
+              </ul>
+            )}
+          </div>
+        )}
+
+        {pendingStudents.length === 0 ? (
+          <p className="text-gray-500 text-center py-4">
+            Todos os alunos da turma já têm respostas lançadas
+          </p>
+        ) : (
+          <div className="overflow-x-auto">
+            <table className="min-w-full text-sm">
+              <thead>
+                <tr className="border-b">
+                  <th className="text-left py-2 pr-4">Aluno</th>
+                  {sortedQuestions.map((question) => (
+                    <th key={question.id} className="px-1 py-2 text-center">
+                      Q{question.question_number}
+                    </th>
+                  ))}
+                </tr>
+              </thead>
+              <tbody>
+                {pendingStudents.map((student) => (
+                  <tr key={student.id_student} className="border-b">
+                    <td className="py-2 pr-4 whitespace-nowrap">{student.student_name}</td>
+                    {sortedQuestions.map((question) => (
+                      <td key={question.id} className="px-1 py-1 text-center">
+                        <select
+                          value={sheet[student.id_student]?.[question.id] || ""}
+                          onChange={(e) =>
+                            setSheetAnswer(student.id_student, question.id, e.target.value)
+                          }
+                          className="border border-gray-300 rounded px-1 py-1"
+                        >
+                          <option value="">-</option>
+                          {(question.alternatives || []).map((alternative) => (
+                            <option key={alternative.id} value={alternative.id}>
+                              {alternative.alternative_letter}
+                            </option>
+                          ))}
+                        </select>
+                      </td>
+                    ))}
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        )}
+      </div>
+    );
+  };
+
   // Renderizar card de aplicação de prova
   const renderApplicationCard = (application) => (
     <div
@@ -509,6 +666,9 @@ const StudentAnswers = () => {
             onClick={() => {
               setSelectedApplication(null);
               setSelectedStudent(null);
+              setShowSheet(false);
+              setSheet({});
+              setSheetResult(null);
             }}
             className="flex items-center gap-2 text-blue-600 hover:text-blue-800 mb-4"
           >
@@ -518,12 +678,26 @@ const StudentAnswers = () => {
           <h1 className="text-4xl font-bold text-gray-800 mb-2">
             {selectedApplication.exam_title || `Prova #${selectedApplication.id_exam}`}
           </h1>
-          <p className="text-gray-600">
-            {selectedApplication.class_name} -{" "}
-            {new Date(selectedApplication.application_date).toLocaleDateString("pt-BR")}
-          </p>
+          <div className="flex items-center justify-between">
+            <p className="text-gray-600">
+              {selectedApplication.class_name} -{" "}
+              {new Date(selectedApplication.application_date).toLocaleDateString("pt-BR")}
+            </p>
+            <button
+              onClick={() => {
+                setShowSheet(!showSheet);
+                setSheetResult(null);
+              }}
+              className="flex items-center gap-2 text-blue-600 hover:text-blue-800"
+            >
+              <ClipboardList className="w-5 h-5" />
+              <span>{showSheet ? "Fechar folha da turma" : "Lançar folha da turma"}</span>
+            </button>
+          </div>
         </div>
 
+        {showSheet && !loading && renderClassSheet()}
+
         {loading ? (
           <div className="flex items-center justify-center py-12">
             <div className="animate-spin rounded-full h-16 w-16 border-b-4 border-blue-600"></div>
@@ -234,6 +234,26 @@ const TakeExam = () => {
 
       [questionId]: alternativeId,
     }));
+
+    // Salvamento automático (a entrega reenvia todas as respostas)
+
+    fetch(`${API_BASE_URL}/exam-sessions/autosave/`, {
+      method: "POST",
+
+      headers: {
+        "Content-Type": "application/json",
+      },
+
+      body: JSON.stringify({
+        id_student: studentId,
+
+        id_exam_application: selectedExam.id,
+
+        answers: [
+          { id_question: questionId, id_selected_alternative: alternativeId },
+        ],
+      }),
+    }).catch((err) => console.error("Erro ao salvar resposta:", err));
   };
 
   const goToNextQuestion = () => {
@@ -286,10 +306,10 @@ const TakeExam = () => {
         answers: answersArray,
       };
 
-      // Enviar respostas
+      // Entregar a prova (grava as respostas salvas e calcula o resultado)
 
       const response = await fetch(
-        `${API_BASE_URL}/student-answers/bulk_create/`,
+        `${API_BASE_URL}/exam-sessions/submit/`,
         {
           method: "POST",
 
@@ -309,13 +329,15 @@ const TakeExam = () => {
 
       const responseData = await response.json();
 
-      // Aguardar um momento para o backend processar os dados
-      await new Promise(resolve => setTimeout(resolve, 1000));
-
-      // Buscar resultado com retry
+      // A entrega já devolve o resultado calculado
       let attempts = 0;
       let resultFound = false;
 
+      if (responseData.result) {
+        setResult(responseData.result);
+        resultFound = true;
+      }
+
       while (attempts < 3 && !resultFound) {
         const resultResponse = await fetch(
           `${API_BASE_URL}/exam-results/?id_student=${studentId}&id_exam_application=${selectedExam.id}`